@@ -1,18 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
+import sys
 import json
 import time
 import re
+import pstats
 from datetime import datetime
-from typing import List, Any, Optional
+from typing import Dict, List, Any, Optional
 from contextlib import contextmanager
 
 import streamlit as st
 st.set_page_config(page_title="Scraper Dashboard", page_icon="", layout="wide", initial_sidebar_state="expanded")
 import pandas as pd
 
+# Helpers partagés avec le worker (scraper/, orchestration/ copiés dans l'image)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from scraper.utils.error_sink import get_error_rates
+from orchestration.stats_snapshot import COUNTERS_QUERY, build_snapshot
+
 # Liens de pages (chemins ASCII, sans emoji dans le nom de fichier)
 st.sidebar.page_link("pages/10_Mode_d_emploi.py", label="❓ Mode d’emploi / User Manual")
 st.sidebar.page_link("pages/20_Utilisation.py", label="📘 Utilisation / Usage")
@@ -134,6 +144,9 @@ DB_CONFIG = {
     'application_name': 'dashboard_streamlit'
 }
 
+# Logs et profils des jobs écrits par le worker (volume ./logs partagé)
+JOB_LOG_DIR = os.getenv("JOB_LOG_DIR", "logs/jobs")
+
 _db_pool = None
 
 @st.cache_resource
@@ -191,6 +204,83 @@ def execute_query(query: str, params: tuple = None, fetch: str = 'all'):
         st.error(f"Erreur base de données: {e}")
         return None
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Redis (agrégats publiés par le worker)
+# ──────────────────────────────────────────────────────────────────────────────
+
+@st.cache_resource
+def get_redis_client():
+    """Client Redis pointant sur la base du worker (et non REDIS_DB du dashboard)."""
+    try:
+        import redis
+        return redis.Redis(
+            host=os.getenv("REDIS_HOST", "redis"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            db=int(os.getenv("WORKER_REDIS_DB", "0")),
+            password=os.getenv("REDIS_PASSWORD") or None,
+            decode_responses=True,
+            socket_timeout=2,
+        )
+    except Exception:
+        return None
+
+def _redis_ns(key: str) -> str:
+    return f"{os.getenv('REDIS_NAMESPACE', 'scraperpro')}:{key}"
+
+def load_stats_snapshot() -> Dict[str, Any]:
+    """Snapshot publié par le scheduler (stats:snapshot), sinon lecture des compteurs (migration 003)."""
+    r = get_redis_client()
+    if r is not None:
+        try:
+            raw = r.get(_redis_ns("stats:snapshot"))
+            if raw:
+                return json.loads(raw)
+        except Exception:
+            pass
+    return build_snapshot(execute_query(COUNTERS_QUERY) or [])
+
+def load_job_live_stats(job_ids: List[int]) -> Dict[int, Dict[str, str]]:
+    """Stats live des jobs (hash job:<id>:stats publié par l'extension RedisStatsBridge du worker)."""
+    r = get_redis_client()
+    if r is None or not job_ids:
+        return {}
+    try:
+        pipe = r.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(_redis_ns(f"job:{job_id}:stats"))
+        results = pipe.execute()
+    except Exception:
+        return {}
+    return {job_id: stats for job_id, stats in zip(job_ids, results) if stats}
+
+def load_error_rates(minutes: int = 60) -> pd.DataFrame:
+    """Séries d'erreurs par minute et par catégorie (clés errors:minute:* du worker)."""
+    r = get_redis_client()
+    if r is None:
+        return pd.DataFrame([])
+    try:
+        series = get_error_rates(minutes, redis_client=r)
+    except Exception:
+        return pd.DataFrame([])
+    rows = [{k: v for k, v in point.items() if k != 'total'} for point in series]
+    return pd.DataFrame(rows).set_index('minute').fillna(0)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_jobs_daily(days: int = 30) -> pd.DataFrame:
+    """Jobs terminés / échoués par jour de création (mv_jobs_stats, rafraîchie par mv_refresher)."""
+    rows = execute_query("""
+      SELECT job_date,
+             SUM(completed_jobs) AS completed,
+             SUM(failed_jobs)    AS failed
+      FROM mv_jobs_stats
+      WHERE job_date >= CURRENT_DATE - %s
+      GROUP BY job_date
+      ORDER BY job_date
+    """, (int(days),)) or []
+    if not rows:
+        return pd.DataFrame([])
+    return pd.DataFrame(rows).set_index('job_date').astype(int)
+
 # ──────────────────────────────────────────────────────────────────────────────
 # i18n
 # ──────────────────────────────────────────────────────────────────────────────
@@ -220,6 +310,7 @@ TRANSLATIONS = {
         'match_mode_any': 'Au moins un mot-clé',
         'match_mode_all': 'Tous les mots-clés',
         'use_javascript': 'Utiliser JavaScript (Playwright)',
+        'profile_job': 'Profiler le crawl (cProfile)',
         'max_pages': 'Pages maximum par domaine',
         'priority': 'Priorité',
         'create_job_button': '🚀 LANCER LE SCRAPING',
@@ -266,6 +357,7 @@ TRANSLATIONS = {
         'match_mode_any': 'At least one keyword',
         'match_mode_all': 'All keywords',
         'use_javascript': 'Use JavaScript (Playwright)',
+        'profile_job': 'Profile the crawl (cProfile)',
         'max_pages': 'Max pages per domain',
         'priority': 'Priority',
         'create_job_button': '🚀 START SCRAPING',
@@ -409,18 +501,11 @@ def page_dashboard():
     st.title(t('dashboard'))
     col1, col2, col3, col4, col5 = st.columns(5)
     try:
-        m = execute_query("""
-            SELECT 
-              (SELECT COUNT(*) FROM queue  WHERE status='pending'     AND deleted_at IS NULL) AS pending_jobs,
-              (SELECT COUNT(*) FROM queue  WHERE status='in_progress' AND deleted_at IS NULL) AS active_jobs,
-              (SELECT COUNT(*) FROM queue  WHERE status='done' AND DATE(updated_at)=CURRENT_DATE AND deleted_at IS NULL) AS completed_jobs,
-              (SELECT COUNT(*) FROM contacts WHERE DATE(created_at)=CURRENT_DATE AND deleted_at IS NULL) AS total_contacts,
-              (SELECT COUNT(*) FROM proxies WHERE active=true) AS active_proxies
-        """, fetch='one') or {}
+        m = load_stats_snapshot()
         col1.metric(t('pending_jobs'),  m.get('pending_jobs', 0))
         col2.metric(t('active_jobs'),   m.get('active_jobs', 0))
-        col3.metric(t('completed_jobs'),m.get('completed_jobs', 0))
-        col4.metric(t('total_contacts'),m.get('total_contacts', 0))
+        col3.metric(t('completed_jobs'),m.get('completed_today', 0))
+        col4.metric(t('total_contacts'),m.get('contacts_today', 0))
         col5.metric(t('active_proxies'),m.get('active_proxies', 0))
         if m.get('active_proxies', 0) == 0:
             st.error(t('no_proxies_warning'))
@@ -430,6 +515,20 @@ def page_dashboard():
     except Exception as e:
         st.error(f"Erreur métriques: {e}")
 
+    st.subheader("Erreurs par minute (60 dernières minutes)")
+    errors_df = load_error_rates(60)
+    if not errors_df.empty and len(errors_df.columns) > 0 and errors_df.to_numpy().sum() > 0:
+        st.area_chart(errors_df)
+    else:
+        st.info("Aucune erreur enregistrée sur la dernière heure.")
+
+    st.subheader("Jobs par jour de création (30 derniers jours)")
+    jobs_df = load_jobs_daily(30)
+    if not jobs_df.empty:
+        st.bar_chart(jobs_df)
+    else:
+        st.info("Aucun job sur les 30 derniers jours.")
+
 def page_jobs():
     st.title(t('jobs_manager'))
     with st.expander(t('create_job'), expanded=True):
@@ -470,6 +569,8 @@ def page_jobs():
                 min_matches = st.number_input(t('min_matches'), min_value=1, max_value=20, value=1, step=1)
                 use_js = st.checkbox(t('use_javascript'), value=True)
                 max_pages = st.number_input(t('max_pages'), min_value=1, max_value=200, value=10, step=1)
+                profiling = st.checkbox(t('profile_job'), value=False,
+                                        help="Enregistre un profil cProfile du crawl, consultable ci-dessous")
 
             c1, c2 = st.columns(2)
             with c1:
@@ -504,12 +605,13 @@ def page_jobs():
                         INSERT INTO queue (
                           url, country_filter, lang_filter, custom_keywords,
                           match_mode, min_matches, use_js, max_pages_per_domain,
-                          status, created_by, created_at
-                        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,'pending',%s, NOW())
+                          profiling, status, created_by, created_at
+                        ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,'pending',%s, NOW())
                     """, (
                         u, c, (None if language=='auto' else language),
                         json.dumps(keywords),
                         match_mode, int(min_matches), bool(use_js), int(max_pages),
+                        bool(profiling),
                         st.session_state.get('username', 'dashboard')
                     ), fetch='none')
                     if ok:
@@ -546,8 +648,18 @@ def page_jobs():
                 return ', '.join(lst[:3]) + (f" (+{len(lst)-3})" if len(lst) > 3 else '') if lst else '—'
             df['keywords_display'] = df['custom_keywords'].apply(fmt_kw)
 
+            # Progression live des jobs en cours (Redis, sans requête SQL)
+            live = load_job_live_stats([int(i) for i in df.loc[df['status'] == 'in_progress', 'id']])
+            def live_value(job_id, field, cast):
+                stats = live.get(int(job_id))
+                return cast(stats.get(field, 0)) if stats else None
+            df['pages'] = df['id'].map(lambda i: live_value(i, 'pages', int))
+            df['pages_per_sec'] = df['id'].map(lambda i: live_value(i, 'pages_per_sec', float))
+            df['contacts_live'] = df['id'].map(lambda i: live_value(i, 'contacts_saved_total', int))
+
             st.dataframe(
-                df[["status_icon", "id", "url_short", "keywords_display", "match_mode", "status", "created_at"]],
+                df[["status_icon", "id", "url_short", "keywords_display", "match_mode", "status",
+                    "pages", "pages_per_sec", "contacts_live", "created_at"]],
                 hide_index=True,
                 use_container_width=True,
                 column_config={
@@ -557,6 +669,9 @@ def page_jobs():
                     "keywords_display": st.column_config.TextColumn("Mots-clés", width=240),
                     "match_mode": st.column_config.TextColumn("Mode", width=110),
                     "status": st.column_config.TextColumn("Statut", width=100),
+                    "pages": st.column_config.NumberColumn("Pages", width=70),
+                    "pages_per_sec": st.column_config.NumberColumn("Pages/s", width=70, format="%.2f"),
+                    "contacts_live": st.column_config.NumberColumn("Contacts", width=80),
                     "created_at": st.column_config.DatetimeColumn("Créé le", width=160)
                 }
             )
@@ -565,6 +680,78 @@ def page_jobs():
     except Exception as e:
         st.error(f"Erreur chargement jobs: {e}")
 
+    section_job_profiles()
+
+def section_job_profiles():
+    """Profilage à la demande: activation par job, résumé pstats et téléchargement du .prof"""
+    with st.expander("🔬 Profilage des jobs", expanded=False):
+        c1, c2 = st.columns([1, 2])
+        with c1:
+            job_id = st.number_input("ID du job", min_value=1, step=1, key="profile_job_id")
+            enable = st.toggle("Profiler les prochaines exécutions", value=True, key="profile_enable")
+            if st.button("Appliquer", key="profile_apply"):
+                ok = execute_query(
+                    "UPDATE queue SET profiling = %s, updated_at = NOW() WHERE id = %s AND deleted_at IS NULL",
+                    (bool(enable), int(job_id)), fetch='none'
+                )
+                if ok:
+                    st.success(f"Profilage {'activé' if enable else 'désactivé'} pour le job {int(job_id)}")
+        with c2:
+            st.caption("Le crawl tourne sous cProfile (option --profile de Scrapy) ; le profil est "
+                       "écrit dans logs/jobs/job_<id>.prof à la fin de l'exécution. Relancer un job "
+                       "terminé : repasser son statut à 'pending'.")
+
+        profiled = execute_query("""
+            SELECT id, url, status, profiling, profile_path, updated_at
+            FROM queue
+            WHERE profile_path IS NOT NULL AND deleted_at IS NULL
+            ORDER BY updated_at DESC
+            LIMIT 20
+        """) or []
+        if not profiled:
+            st.info("Aucun profil disponible.")
+            return
+
+        selected = st.selectbox(
+            "Profil", profiled, key="profile_selected",
+            format_func=lambda r: f"#{r['id']} • {str(r['url'])[:60]} • {r['updated_at']:%Y-%m-%d %H:%M}"
+        )
+        path = _resolve_profile_path(selected['profile_path'])
+        if not path:
+            st.warning(f"Fichier de profil introuvable: {selected['profile_path']}")
+            return
+
+        s1, s2 = st.columns(2)
+        with s1:
+            sort_key = st.selectbox("Tri", ['cumulative', 'tottime', 'ncalls'], key="profile_sort")
+        with s2:
+            limit = st.slider("Fonctions affichées", 10, 100, 40, step=10, key="profile_limit")
+
+        summary = load_profile_summary(path, os.path.getmtime(path), sort_key, limit)
+        st.code(summary or "Profil illisible", language=None)
+        with open(path, 'rb') as f:
+            st.download_button(
+                "⬇️ Télécharger le profil (.prof)", f.read(),
+                file_name=os.path.basename(path), mime="application/octet-stream",
+                help="À ouvrir avec snakeviz, tuna ou python -m pstats"
+            )
+
+def _resolve_profile_path(profile_path: str) -> Optional[str]:
+    """Chemin enregistré par le worker, sinon même nom sous logs/jobs (volume partagé)"""
+    candidates = [profile_path, os.path.join(JOB_LOG_DIR, os.path.basename(profile_path or ''))]
+    return next((p for p in candidates if p and os.path.isfile(p)), None)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_profile_summary(path: str, mtime: float, sort_key: str, limit: int) -> Optional[str]:
+    """Résumé pstats du profil (mtime dans la clé de cache: invalidé à chaque exécution)"""
+    try:
+        buffer = io.StringIO()
+        stats = pstats.Stats(path, stream=buffer)
+        stats.strip_dirs().sort_stats(sort_key).print_stats(limit)
+        return buffer.getvalue()
+    except Exception:
+        return None
+
 def page_proxies():
     st.title(t('proxy_management'))
     with st.expander(t('add_proxy'), expanded=True):
@@ -635,20 +822,73 @@ def page_proxies():
     except Exception as e:
         st.error(f"Erreur proxies: {e}")
 
+# Expression indexée (idx_contacts_search_trgm, migration 004): doit rester identique
+CONTACTS_SEARCH_EXPR = "(COALESCE(name, '') || ' ' || COALESCE(org, '') || ' ' || COALESCE(email, ''))"
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_contacts_header() -> Dict[str, Any]:
+    """
+    En-tête de l'explorateur, mis en cache 60 s: totaux et vérifiés depuis les compteurs
+    (snapshot, tous contacts), pays depuis mv_contacts_by_country (country non NULL).
+    """
+    snapshot = load_stats_snapshot()
+    stats = execute_query(
+        "SELECT COUNT(DISTINCT country) AS unique_countries FROM mv_contacts_by_country", fetch='one'
+    ) or {}
+    return {
+        'total_contacts': snapshot.get('total_contacts', 0),
+        'contacts_today': snapshot.get('contacts_today', 0),
+        'verified_contacts': snapshot.get('verified_contacts', 0),
+        'unique_countries': int(stats.get('unique_countries') or 0),
+    }
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_contact_countries() -> List[str]:
+    rows = execute_query("SELECT DISTINCT country FROM mv_contacts_by_country ORDER BY country") or []
+    return [r['country'] for r in rows]
+
+def fetch_contacts_page(search_text: str, country: Optional[str], cursor: Optional[tuple],
+                        page_size: int) -> List[Dict[str, Any]]:
+    """
+    Une page de contacts, triée par (created_at, id) décroissants
+
+    Pagination par clé (keyset): la page suivante part du dernier (created_at, id) lu,
+    sans OFFSET. La recherche texte passe par l'index trigram sur CONTACTS_SEARCH_EXPR.
+    Retourne page_size + 1 lignes au plus (la ligne en trop signale une page suivante).
+    """
+    where = ["deleted_at IS NULL"]
+    params: List[Any] = []
+    if search_text:
+        escaped = search_text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        where.append(f"{CONTACTS_SEARCH_EXPR} ILIKE %s")
+        params.append(f"%{escaped}%")
+    if country:
+        where.append("country = %s")
+        params.append(country)
+    if cursor:
+        where.append("(created_at, id) < (%s, %s)")
+        params += list(cursor)
+
+    sql = f"""
+      SELECT 
+        id, name, email, org, phone, country,
+        COALESCE(verified,false) AS verified, created_at,
+        CASE WHEN COALESCE(verified,false) THEN '✅' ELSE '⏳' END AS verified_icon
+      FROM contacts
+      WHERE {' AND '.join(where)}
+      ORDER BY created_at DESC, id DESC
+      LIMIT %s
+    """
+    params.append(page_size + 1)
+    return execute_query(sql, tuple(params)) or []
+
 def page_contacts():
     st.title(t('contacts_explorer'))
     try:
-        stats = execute_query("""
-          SELECT 
-            COUNT(*)                                            AS total_contacts,
-            COUNT(*) FILTER (WHERE DATE(created_at)=CURRENT_DATE) AS today_contacts,
-            COUNT(*) FILTER (WHERE verified=true)               AS verified_contacts,
-            COUNT(DISTINCT country)                             AS unique_countries
-          FROM contacts WHERE deleted_at IS NULL
-        """, fetch='one') or {}
+        stats = load_contacts_header()
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("📊 Total", f"{stats.get('total_contacts', 0):,}")
-        c2.metric("📈 Aujourd'hui", stats.get('today_contacts', 0))
+        c2.metric("📈 Aujourd'hui", stats.get('contacts_today', 0))
         c3.metric("✅ Vérifiés", stats.get('verified_contacts', 0))
         c4.metric("🌍 Pays", stats.get('unique_countries', 0))
     except Exception as e:
@@ -656,69 +896,58 @@ def page_contacts():
 
     st.divider()
 
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns([3, 2, 1])
     with col1:
-        search_text = st.text_input("🔍 Rechercher", placeholder="Nom, email, organisation…")
+        search_text = st.text_input("🔍 Rechercher", placeholder="Nom, email, organisation…").strip()
     with col2:
         try:
-            countries = execute_query("""
-              SELECT DISTINCT country 
-              FROM contacts 
-              WHERE country IS NOT NULL AND deleted_at IS NULL 
-              ORDER BY country
-            """) or []
-            options = ["Tous"] + [c['country'] for c in countries]
+            options = ["Tous"] + load_contact_countries()
             selected_country = st.selectbox("🌍 Pays", options)
         except Exception:
             selected_country = "Tous"
+    with col3:
+        page_size = st.selectbox("Par page", [50, 100, 250, 500], index=1)
+
+    # Pile des curseurs (created_at, id) des pages déjà vues; remise à zéro si les filtres changent
+    filters = (search_text, selected_country, page_size)
+    if st.session_state.get('contacts_filters') != filters:
+        st.session_state['contacts_filters'] = filters
+        st.session_state['contacts_cursors'] = [None]
+    cursors = st.session_state['contacts_cursors']
 
     try:
-        where = ["deleted_at IS NULL"]
-        params = []
-        if search_text:
-            where.append("(name ILIKE %s OR email ILIKE %s OR org ILIKE %s)")
-            like = f"%{search_text}%"
-            params += [like, like, like]
-        if selected_country != "Tous":
-            where.append("country = %s")
-            params.append(selected_country)
-
-        sql = f"""
-          SELECT 
-            name, email, org, phone, country,
-            COALESCE(verified,false) AS verified, created_at,
-            CASE WHEN COALESCE(verified,false) THEN '✅' ELSE '⏳' END AS verified_icon
-          FROM contacts
-          WHERE {' AND '.join(where)}
-          ORDER BY created_at DESC
-          LIMIT 500
-        """
-        rows = execute_query(sql, tuple(params)) or []
+        rows = fetch_contacts_page(
+            search_text,
+            None if selected_country == "Tous" else selected_country,
+            cursors[-1], page_size
+        )
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
         df = _to_dataframe(rows)
 
         a, b, c = st.columns(3)
         with a:
             if df is not None and not df.empty:
-                csv = df.to_csv(index=False)
+                csv = df.drop(columns=["id", "verified_icon"]).to_csv(index=False)
                 st.download_button(
-                    "⬇️ Export CSV", data=csv,
+                    "⬇️ Export CSV (page)", data=csv,
                     file_name=f"contacts_{datetime.now():%Y%m%d_%H%M%S}.csv",
                     mime="text/csv", use_container_width=True
                 )
             else:
-                st.button("⬇️ Export CSV", disabled=True, use_container_width=True)
+                st.button("⬇️ Export CSV (page)", disabled=True, use_container_width=True)
         with b:
             if df is not None and not df.empty:
                 emails = df['email'].dropna().tolist()
                 st.download_button(
-                    "⬇️ Export Emails", data="\n".join(emails),
+                    "⬇️ Export Emails (page)", data="\n".join(emails),
                     file_name=f"emails_{datetime.now():%Y%m%d_%H%M%S}.txt",
                     mime="text/plain", use_container_width=True
                 )
             else:
-                st.button("⬇️ Export Emails", disabled=True, use_container_width=True)
+                st.button("⬇️ Export Emails (page)", disabled=True, use_container_width=True)
         with c:
-            st.metric("Résultats", 0 if df is None else len(df))
+            st.metric(f"Page {len(cursors)}", 0 if df is None else len(df))
 
         if df is not None and not df.empty:
             st.dataframe(
@@ -736,6 +965,17 @@ def page_contacts():
             )
         else:
             st.info("🔍 Aucun contact trouvé avec ces critères.")
+
+        prev_col, _, next_col = st.columns([1, 4, 1])
+        with prev_col:
+            if st.button("⬅️ Précédent", disabled=len(cursors) <= 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with next_col:
+            if st.button("Suivant ➡️", disabled=not has_next, use_container_width=True):
+                last = rows[-1]
+                cursors.append((last['created_at'], last['id']))
+                st.rerun()
     except Exception as e:
         st.error(f"Erreur chargement contacts: {e}")
 
@@ -766,13 +1006,7 @@ def page_settings():
     with c2:
         st.info("**Statistiques système :**")
         try:
-            s = execute_query("""
-              SELECT 
-                (SELECT COUNT(*) FROM queue    WHERE deleted_at IS NULL) AS total_jobs,
-                (SELECT COUNT(*) FROM contacts WHERE deleted_at IS NULL) AS total_contacts,
-                (SELECT COUNT(*) FROM proxies) AS total_proxies,
-                (SELECT MAX(created_at) FROM queue WHERE deleted_at IS NULL) AS last_job_created
-            """, fetch='one') or {}
+            s = load_stats_snapshot()
             st.text(f"Jobs total: {s.get('total_jobs', 0)}")
             st.text(f"Contacts total: {s.get('total_contacts', 0)}")
             st.text(f"Proxies total: {s.get('total_proxies', 0)}")
@@ -0,0 +1,21 @@
+-- =================================================================
+-- MIGRATION 002 - Latences détaillées du prober de proxies
+-- Version: 2.2 - Connect / TTFB mesurés séparément par proxy_warmup
+-- =================================================================
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='proxies' AND column_name='connect_time_ms') THEN
+        ALTER TABLE proxies ADD COLUMN connect_time_ms INTEGER;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='proxies' AND column_name='ttfb_ms') THEN
+        ALTER TABLE proxies ADD COLUMN ttfb_ms INTEGER;
+    END IF;
+END $$;
+
+UPDATE settings SET value = '2.2', updated_at = NOW() WHERE key = 'database_version';
+
+COMMIT;
@@ -0,0 +1,213 @@
+-- =================================================================
+-- MIGRATION 003 - Compteurs de statistiques maintenus par triggers
+-- Version: 2.3 - Les stats scheduler/dashboard ne recomptent plus queue et contacts
+-- =================================================================
+
+BEGIN;
+
+-- Chaque compteur est réparti sur plusieurs lignes (shard): une ligne unique par
+-- compteur sérialiserait toutes les transactions qui insèrent des jobs ou des contacts
+-- sur son verrou. La valeur d'un compteur est la somme de ses shards (SUM ... GROUP BY name)
+
+-- Compteurs courants (jobs par statut, totaux contacts / proxies)
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name TEXT NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (name, shard)
+);
+
+-- Compteurs journaliers (jobs terminés / échoués, contacts créés)
+CREATE TABLE IF NOT EXISTS stats_daily_counters (
+    day DATE NOT NULL,
+    name TEXT NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (day, name, shard)
+);
+
+-- =================================================================
+-- FONCTIONS
+-- =================================================================
+
+-- Shard d'une écriture: tiré au hasard parmi 16
+CREATE OR REPLACE FUNCTION stats_shard()
+RETURNS SMALLINT AS $$
+    SELECT floor(random() * 16)::smallint;
+$$ LANGUAGE sql VOLATILE;
+
+CREATE OR REPLACE FUNCTION stats_bump(p_name TEXT, p_delta BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    IF p_delta = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO stats_counters (name, shard, value) VALUES (p_name, stats_shard(), p_delta)
+    ON CONFLICT (name, shard) DO UPDATE
+        SET value = stats_counters.value + EXCLUDED.value, updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stats_bump_daily(p_day DATE, p_name TEXT, p_delta BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    IF p_delta = 0 OR p_day IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO stats_daily_counters (day, name, shard, value) VALUES (p_day, p_name, stats_shard(), p_delta)
+    ON CONFLICT (day, name, shard) DO UPDATE
+        SET value = stats_daily_counters.value + EXCLUDED.value, updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- queue: jobs non supprimés par statut, et jobs done/failed du jour (par updated_at)
+CREATE OR REPLACE FUNCTION stats_queue_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Mise à jour sans effet sur les compteurs (progression, checkpoint...)
+    IF TG_OP = 'UPDATE'
+       AND OLD.status IS NOT DISTINCT FROM NEW.status
+       AND OLD.deleted_at IS NOT DISTINCT FROM NEW.deleted_at
+       AND (OLD.status NOT IN ('done', 'failed') OR OLD.updated_at::date IS NOT DISTINCT FROM NEW.updated_at::date) THEN
+        RETURN NULL;
+    END IF;
+
+    -- queue_total ne bouge que si la ligne apparaît ou disparaît (insertion, suppression,
+    -- deleted_at): un simple changement de statut ne touche que les compteurs par statut
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+        IF TG_OP = 'DELETE' OR NEW.deleted_at IS NOT NULL THEN
+            PERFORM stats_bump('queue_total', -1);
+        END IF;
+        PERFORM stats_bump('queue_' || OLD.status, -1);
+        IF OLD.status IN ('done', 'failed') THEN
+            PERFORM stats_bump_daily(OLD.updated_at::date, 'queue_' || OLD.status, -1);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.deleted_at IS NULL THEN
+        IF TG_OP = 'INSERT' OR OLD.deleted_at IS NOT NULL THEN
+            PERFORM stats_bump('queue_total', 1);
+        END IF;
+        PERFORM stats_bump('queue_' || NEW.status, 1);
+        IF NEW.status IN ('done', 'failed') THEN
+            PERFORM stats_bump_daily(NEW.updated_at::date, 'queue_' || NEW.status, 1);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- contacts: total non supprimé, vérifiés (tous pays, country NULL compris) et
+-- contacts créés par jour
+CREATE OR REPLACE FUNCTION stats_contacts_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Seul verified change: total et compteur journalier intacts
+    IF TG_OP = 'UPDATE'
+       AND OLD.deleted_at IS NULL AND NEW.deleted_at IS NULL
+       AND OLD.created_at::date IS NOT DISTINCT FROM NEW.created_at::date THEN
+        PERFORM stats_bump('contacts_verified',
+                           COALESCE(NEW.verified, false)::int - COALESCE(OLD.verified, false)::int);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+        PERFORM stats_bump('contacts_total', -1);
+        PERFORM stats_bump_daily(OLD.created_at::date, 'contacts_created', -1);
+        IF OLD.verified THEN
+            PERFORM stats_bump('contacts_verified', -1);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.deleted_at IS NULL THEN
+        PERFORM stats_bump('contacts_total', 1);
+        PERFORM stats_bump_daily(NEW.created_at::date, 'contacts_created', 1);
+        IF NEW.verified THEN
+            PERFORM stats_bump('contacts_verified', 1);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- proxies: total et actifs
+CREATE OR REPLACE FUNCTION stats_proxies_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stats_bump('proxies_total', -1);
+        IF OLD.active THEN
+            PERFORM stats_bump('proxies_active', -1);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stats_bump('proxies_total', 1);
+        IF NEW.active THEN
+            PERFORM stats_bump('proxies_active', 1);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recalcul complet (initialisation et correction d'une éventuelle dérive)
+CREATE OR REPLACE FUNCTION stats_counters_rebuild()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE stats_counters, stats_daily_counters IN EXCLUSIVE MODE;
+    DELETE FROM stats_counters;
+    DELETE FROM stats_daily_counters;
+
+    INSERT INTO stats_counters (name, value)
+    SELECT 'queue_' || status, COUNT(*) FROM queue WHERE deleted_at IS NULL GROUP BY status
+    UNION ALL
+    SELECT 'queue_total', COUNT(*) FROM queue WHERE deleted_at IS NULL
+    UNION ALL
+    SELECT 'contacts_total', COUNT(*) FROM contacts WHERE deleted_at IS NULL
+    UNION ALL
+    SELECT 'contacts_verified', COUNT(*) FROM contacts WHERE deleted_at IS NULL AND verified = true
+    UNION ALL
+    SELECT 'proxies_total', COUNT(*) FROM proxies
+    UNION ALL
+    SELECT 'proxies_active', COUNT(*) FROM proxies WHERE active = true;
+
+    INSERT INTO stats_daily_counters (day, name, value)
+    SELECT updated_at::date, 'queue_' || status, COUNT(*)
+      FROM queue
+     WHERE deleted_at IS NULL AND status IN ('done', 'failed') AND updated_at IS NOT NULL
+     GROUP BY 1, 2
+    UNION ALL
+    SELECT created_at::date, 'contacts_created', COUNT(*)
+      FROM contacts
+     WHERE deleted_at IS NULL AND created_at IS NOT NULL
+     GROUP BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =================================================================
+-- TRIGGERS (AFTER: updated_at déjà positionné par update_*_updated_at)
+-- =================================================================
+
+DROP TRIGGER IF EXISTS stats_queue_counters ON queue;
+CREATE TRIGGER stats_queue_counters AFTER INSERT OR DELETE OR UPDATE ON queue
+    FOR EACH ROW EXECUTE FUNCTION stats_queue_trigger();
+
+DROP TRIGGER IF EXISTS stats_contacts_counters ON contacts;
+CREATE TRIGGER stats_contacts_counters AFTER INSERT OR DELETE OR UPDATE OF deleted_at, created_at, verified ON contacts
+    FOR EACH ROW EXECUTE FUNCTION stats_contacts_trigger();
+
+DROP TRIGGER IF EXISTS stats_proxies_counters ON proxies;
+CREATE TRIGGER stats_proxies_counters AFTER INSERT OR DELETE OR UPDATE OF active ON proxies
+    FOR EACH ROW EXECUTE FUNCTION stats_proxies_trigger();
+
+SELECT stats_counters_rebuild();
+
+UPDATE settings SET value = '2.3', updated_at = NOW() WHERE key = 'database_version';
+
+COMMIT;
@@ -0,0 +1,27 @@
+-- =================================================================
+-- MIGRATION 004 - Index de l'explorateur de contacts
+-- Version: 2.4 - Pagination par clé (created_at, id) et recherche trigram
+--
+-- Index créés en CONCURRENTLY pour ne pas bloquer les insertions des spiders:
+-- ce fichier ne doit pas être exécuté dans une transaction (psql -f, sans -1).
+-- =================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Pagination: ORDER BY created_at DESC, id DESC + (created_at, id) < (curseur)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_created_id
+    ON contacts (created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Pagination filtrée par pays
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_country_created_id
+    ON contacts (country, created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Recherche sous-chaîne (ILIKE '%texte%') sur nom, organisation et email.
+-- L'expression doit rester identique à CONTACTS_SEARCH_EXPR (dashboard/app.py)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contacts_search_trgm
+    ON contacts USING gin ((COALESCE(name, '') || ' ' || COALESCE(org, '') || ' ' || COALESCE(email, '')) gin_trgm_ops)
+    WHERE deleted_at IS NULL;
+
+UPDATE settings SET value = '2.4', updated_at = NOW() WHERE key = 'database_version';
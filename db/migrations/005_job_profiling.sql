@@ -0,0 +1,25 @@
+-- =================================================================
+-- MIGRATION 005 - Profilage des jobs à la demande
+-- Version: 2.5 - Flag de profilage par job et chemin du profil cProfile produit
+-- =================================================================
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='queue' AND column_name='profiling') THEN
+        ALTER TABLE queue ADD COLUMN profiling BOOLEAN DEFAULT false;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='queue' AND column_name='profile_path') THEN
+        ALTER TABLE queue ADD COLUMN profile_path TEXT;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_queue_profile_path
+    ON queue (updated_at DESC)
+    WHERE profile_path IS NOT NULL AND deleted_at IS NULL;
+
+UPDATE settings SET value = '2.5', updated_at = NOW() WHERE key = 'database_version';
+
+COMMIT;
@@ -257,6 +257,21 @@ CREATE TRIGGER tr_contacts_refresh_mv
     FOR EACH STATEMENT
     EXECUTE FUNCTION trigger_refresh_mv_contacts();
 
+-- Même principe pour mv_jobs_stats (consommé par orchestration/mv_refresher.py)
+CREATE OR REPLACE FUNCTION trigger_refresh_mv_jobs()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('refresh_mv', 'jobs');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_queue_refresh_mv ON queue;
+CREATE TRIGGER tr_queue_refresh_mv
+    AFTER INSERT OR UPDATE OR DELETE ON queue
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION trigger_refresh_mv_jobs();
+
 -- ==========================================================================
 -- CONFIGURATION FINALE
 -- ==========================================================================
@@ -1,6 +1,3 @@
 
-from prometheus_client import Counter, Gauge
-
-SCRAPED_CONTACTS = Counter("scraper_scraped_contacts_total", "Total scraped contacts")
-PROXY_FAILURES = Counter("scraper_proxy_failures_total", "Total proxy failures", ["proxy_host"])
-ACTIVE_PROXIES = Gauge("scraper_active_proxies", "Number of active proxies")
+# Les métriques sont définies dans scraper/utils/metrics.py (image worker, mode multiprocessus)
+from scraper.utils.metrics import SCRAPED_CONTACTS, PROXY_FAILURES, ACTIVE_PROXIES  # noqa: F401
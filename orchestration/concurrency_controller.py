@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Contrôleur de concurrence adaptatif (AIMD)
+
+Ajuste le nombre de jobs simultanés du scheduler et le CONCURRENT_REQUESTS passé
+aux spiders : augmentation additive tant que taux d'erreur, échecs proxy, CPU et
+mémoire de l'hôte sont mesurés et sains et que tous les slots sont occupés, réduction
+multiplicative dès qu'un signal s'emballe, puis attente d'une fenêtre complète avant
+de réévaluer.
+Les décisions sont exportées en métriques Prometheus (si prometheus_client est présent).
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional, Any
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from prometheus_client import Counter, Gauge
+except ImportError:
+    Counter = Gauge = None
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+# Bornes
+MIN_JOBS = int(os.getenv("CONCURRENCY_MIN_JOBS", "1"))
+MAX_JOBS = int(os.getenv("CONCURRENCY_MAX_JOBS", "12"))
+MIN_REQUESTS = int(os.getenv("CONCURRENCY_MIN_REQUESTS", "4"))
+MAX_REQUESTS = int(os.getenv("CONCURRENCY_MAX_REQUESTS", "32"))
+REQUESTS_STEP = int(os.getenv("CONCURRENCY_REQUESTS_STEP", "2"))
+BACKOFF_FACTOR = _env_float("CONCURRENCY_BACKOFF_FACTOR", "0.5")
+
+# Seuils : en dessous de *_HEALTHY on augmente, au-dessus de *_SPIKE on réduit
+ERROR_RATIO_HEALTHY = _env_float("CONCURRENCY_ERROR_RATIO_HEALTHY", "0.10")
+ERROR_RATIO_SPIKE = _env_float("CONCURRENCY_ERROR_RATIO_SPIKE", "0.25")
+PROXY_RATIO_HEALTHY = _env_float("CONCURRENCY_PROXY_RATIO_HEALTHY", "0.05")
+PROXY_RATIO_SPIKE = _env_float("CONCURRENCY_PROXY_RATIO_SPIKE", "0.15")
+CPU_HEALTHY = _env_float("CONCURRENCY_CPU_HEALTHY", "70")
+CPU_SPIKE = _env_float("CONCURRENCY_CPU_SPIKE", "90")
+MEM_HEALTHY = _env_float("CONCURRENCY_MEM_HEALTHY", "75")
+MEM_SPIKE = _env_float("CONCURRENCY_MEM_SPIKE", "90")
+
+# Nombre minimal d'événements (pages + erreurs) pour juger un taux d'erreur
+MIN_SAMPLES = int(os.getenv("CONCURRENCY_MIN_SAMPLES", "20"))
+WINDOW_MINUTES = int(os.getenv("CONCURRENCY_WINDOW_MINUTES", "5"))
+# Après une réduction, la fenêtre contient encore les erreurs qui l'ont provoquée:
+# aucune décision tant qu'elle n'a pas été renouvelée
+DECREASE_HOLD_SECONDS = int(os.getenv("CONCURRENCY_DECREASE_HOLD_SECONDS", str(WINDOW_MINUTES * 60)))
+
+if Gauge is not None:
+    # livemax: en mode multiprocessus seul le scheduler écrit ces gauges
+    JOB_LIMIT = Gauge("scheduler_concurrency_jobs_limit", "Jobs simultanés autorisés par le contrôleur AIMD",
+                      multiprocess_mode='livemax')
+    REQUEST_LIMIT = Gauge("scheduler_concurrency_requests_limit", "CONCURRENT_REQUESTS passé aux spiders",
+                          multiprocess_mode='livemax')
+    DECISIONS = Counter("scheduler_concurrency_decisions_total", "Décisions du contrôleur AIMD", ["decision"])
+    SIGNAL = Gauge("scheduler_concurrency_signal", "Signaux observés par le contrôleur AIMD", ["signal"],
+                   multiprocess_mode='livemax')
+else:
+    JOB_LIMIT = REQUEST_LIMIT = DECISIONS = SIGNAL = None
+
+
+class AIMDController:
+    """
+    Contrôleur AIMD des limites de concurrence
+
+    observe_pages() est alimenté par la progression des jobs (lignes METRICS);
+    evaluate() lit les autres signaux et retourne la décision prise.
+    """
+
+    def __init__(self, jobs: int, requests: int):
+        self.jobs = self._clamp(jobs, MIN_JOBS, MAX_JOBS)
+        self.requests = self._clamp(requests, MIN_REQUESTS, MAX_REQUESTS)
+        self._pages: deque = deque()
+        self._lock = threading.Lock()
+        self.last_decision = 'hold'
+        self._hold_until = 0.0
+        self.last_signals: Dict[str, Optional[float]] = {}
+        self._export()
+
+    @staticmethod
+    def _clamp(value: int, low: int, high: int) -> int:
+        return max(low, min(high, int(value)))
+
+    def observe_pages(self, count: int):
+        """Pages crawlées depuis la dernière observation (dénominateur des taux d'erreur)"""
+        if count > 0:
+            with self._lock:
+                self._pages.append((time.time(), count))
+
+    def _pages_in_window(self) -> int:
+        cutoff = time.time() - WINDOW_MINUTES * 60
+        with self._lock:
+            while self._pages and self._pages[0][0] < cutoff:
+                self._pages.popleft()
+            return sum(n for _, n in self._pages)
+
+    def _collect(self, error_rates) -> Dict[str, Optional[float]]:
+        """Signaux de la fenêtre; None quand un signal n'est pas mesurable"""
+        if error_rates is None:
+            error_rates, known = [], False
+        else:
+            known = True
+        errors = sum(int(p.get('total', 0)) for p in error_rates)
+        proxy_errors = sum(int(p.get('proxy', 0)) for p in error_rates)
+        pages = self._pages_in_window()
+        samples = pages + errors
+
+        signals: Dict[str, Optional[float]] = {
+            'error_ratio': errors / samples if known and samples >= MIN_SAMPLES else None,
+            'proxy_ratio': proxy_errors / samples if known and samples >= MIN_SAMPLES else None,
+            'cpu_percent': None,
+            'mem_percent': None,
+        }
+        if psutil is not None:
+            signals['cpu_percent'] = psutil.cpu_percent(interval=None)
+            signals['mem_percent'] = psutil.virtual_memory().percent
+        return signals
+
+    def evaluate(self, error_rates, saturated: bool) -> str:
+        """
+        Calcule la nouvelle décision
+
+        Args:
+            error_rates: Agrégats d'erreurs par minute (error_sink.get_error_rates),
+                None si Redis est indisponible
+            saturated: Vrai si tous les slots de jobs sont occupés (sinon inutile d'augmenter)
+
+        Returns:
+            'increase', 'decrease' ou 'hold'
+        """
+        signals = self._collect(error_rates)
+        self.last_signals = signals
+
+        def over(name: str, threshold: float) -> bool:
+            return signals[name] is not None and signals[name] > threshold
+
+        # Un signal absent (échantillon trop petit, Redis ou psutil indisponible)
+        # n'autorise pas d'augmentation
+        def under(name: str, threshold: float) -> bool:
+            return signals[name] is not None and signals[name] < threshold
+
+        spike = (over('error_ratio', ERROR_RATIO_SPIKE) or over('proxy_ratio', PROXY_RATIO_SPIKE) or
+                 over('cpu_percent', CPU_SPIKE) or over('mem_percent', MEM_SPIKE))
+        healthy = (under('error_ratio', ERROR_RATIO_HEALTHY) and under('proxy_ratio', PROXY_RATIO_HEALTHY) and
+                   under('cpu_percent', CPU_HEALTHY) and under('mem_percent', MEM_HEALTHY))
+
+        previous = (self.jobs, self.requests)
+        if time.monotonic() < self._hold_until:
+            decision = 'hold'
+        elif spike:
+            decision = 'decrease'
+            self.jobs = self._clamp(int(self.jobs * BACKOFF_FACTOR), MIN_JOBS, MAX_JOBS)
+            self.requests = self._clamp(int(self.requests * BACKOFF_FACTOR), MIN_REQUESTS, MAX_REQUESTS)
+            self._hold_until = time.monotonic() + DECREASE_HOLD_SECONDS
+        elif healthy and saturated:
+            decision = 'increase'
+            self.jobs = self._clamp(self.jobs + 1, MIN_JOBS, MAX_JOBS)
+            self.requests = self._clamp(self.requests + REQUESTS_STEP, MIN_REQUESTS, MAX_REQUESTS)
+        else:
+            decision = 'hold'
+
+        if (self.jobs, self.requests) == previous and decision != 'hold':
+            decision = 'hold'  # déjà en butée
+
+        self.last_decision = decision
+        self._export()
+        if DECISIONS is not None:
+            DECISIONS.labels(decision=decision).inc()
+        if decision != 'hold':
+            logger.info(f"Concurrence ajustée ({decision}): jobs {previous[0]}->{self.jobs}, "
+                        f"requêtes {previous[1]}->{self.requests}, signaux={signals}")
+        return decision
+
+    def _export(self):
+        if JOB_LIMIT is None:
+            return
+        JOB_LIMIT.set(self.jobs)
+        REQUEST_LIMIT.set(self.requests)
+        for name, value in self.last_signals.items():
+            if value is not None:
+                SIGNAL.labels(signal=name).set(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'concurrency_jobs_limit': self.jobs,
+            'concurrency_requests_limit': self.requests,
+            'concurrency_last_decision': self.last_decision,
+            'concurrency_signals': dict(self.last_signals),
+        }
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+File équitable par domaine pour le scheduler
+
+Les jobs candidats sont regroupés par domaine enregistré (example.co.uk pour
+a.b.example.co.uk). Un plafond de jobs simultanés par domaine est appliqué, puis le
+prochain job est choisi par file équitable pondérée (start-time fair queuing) :
+chaque domaine reçoit une part de slots proportionnelle au poids de son job de tête,
+dérivé de la priorité (priorité 1 = part 10x plus grande que priorité 10).
+"""
+
+import os
+import logging
+import threading
+from urllib.parse import urlparse
+from typing import Dict, List, Optional, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS_PER_DOMAIN = int(os.getenv("MAX_JOBS_PER_DOMAIN", "1"))
+
+try:
+    import tldextract
+    # Liste des suffixes embarquée: pas d'accès réseau depuis le worker
+    _extract = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:
+    _extract = None
+
+
+# Host de queue.url côté SQL, sans www. (repli de registered_domain): permet de
+# plafonner et d'exclure des domaines dans la requête des candidats
+SQL_URL_HOST = (r"COALESCE(regexp_replace(substring(lower(url) from '^[a-z][a-z0-9+.-]*://(?:[^@/?#]*@)?([^/:?#]+)'), "
+                r"'^www\.', ''), lower(url))")
+
+# Vrai si le host appartient à l'un des domaines enregistrés du tableau %s
+SQL_HOST_IN_DOMAINS = ("EXISTS (SELECT 1 FROM unnest(%s::text[]) AS d "
+                       "WHERE host = d OR right(host, length(d) + 1) = '.' || d)")
+
+
+def registered_domain(url: str) -> str:
+    """Domaine enregistré de l'URL (repli sur le host sans www.)"""
+    host = (urlparse(url or '').hostname or '').lower()
+    if not host:
+        return ''
+    if _extract is not None:
+        try:
+            domain = _extract(host).registered_domain
+            if domain:
+                return domain
+        except Exception:
+            pass
+    return host[4:] if host.startswith('www.') else host
+
+
+def _job_cost(job: Dict[str, Any]) -> float:
+    """Coût virtuel d'un job: inversement proportionnel à son poids"""
+    try:
+        priority = int(job.get('priority') or 10)
+    except (TypeError, ValueError):
+        priority = 10
+    return max(1, priority) / 10.0
+
+
+class DomainFairQueue:
+    """
+    Sélection équitable des jobs entre domaines
+
+    Le temps virtuel de chaque domaine avance du coût de chaque job lancé; le domaine
+    éligible avec la plus petite étiquette de fin est servi en premier. Un domaine
+    inactif repart du temps virtuel courant (pas de rafale après une longue absence).
+    """
+
+    def __init__(self, max_per_domain: int = MAX_JOBS_PER_DOMAIN):
+        self.max_per_domain = max(1, int(max_per_domain))
+        self._vtime: Dict[str, float] = {}
+        self._clock = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def in_flight(urls: Iterable[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for url in urls:
+            domain = registered_domain(url)
+            counts[domain] = counts.get(domain, 0) + 1
+        return counts
+
+    def saturated(self, in_flight: Dict[str, int]) -> List[str]:
+        """Domaines déjà au plafond: exclus de la requête des candidats"""
+        return [domain for domain, count in in_flight.items() if domain and count >= self.max_per_domain]
+
+    def select(self, candidates: List[Dict[str, Any]], in_flight: Dict[str, int],
+               slots: int) -> List[Dict[str, Any]]:
+        """
+        Choisit jusqu'à `slots` jobs parmi les candidats
+
+        Args:
+            candidates: Jobs en attente, déjà triés par priorité / ancienneté
+            in_flight: Nombre de jobs en cours par domaine
+            slots: Nombre de slots libres
+        """
+        if slots <= 0 or not candidates:
+            return []
+
+        per_domain: Dict[str, List[Dict[str, Any]]] = {}
+        for job in candidates:
+            per_domain.setdefault(registered_domain(job.get('url')), []).append(job)
+
+        running = dict(in_flight)
+        selected: List[Dict[str, Any]] = []
+        with self._lock:
+            while len(selected) < slots:
+                best_domain: Optional[str] = None
+                best_finish = best_start = 0.0
+                for domain, jobs in per_domain.items():
+                    if not jobs or running.get(domain, 0) >= self.max_per_domain:
+                        continue
+                    start = max(self._vtime.get(domain, 0.0), self._clock)
+                    finish = start + _job_cost(jobs[0])
+                    if best_domain is None or finish < best_finish:
+                        best_domain, best_finish, best_start = domain, finish, start
+                if best_domain is None:
+                    break  # tous les domaines restants sont au plafond
+
+                selected.append(per_domain[best_domain].pop(0))
+                running[best_domain] = running.get(best_domain, 0) + 1
+                self._vtime[best_domain] = best_finish
+                self._clock = best_start
+
+            # Les domaines en retard sur l'horloge repartiraient de toute façon de _clock
+            for domain in [d for d, v in self._vtime.items() if v < self._clock]:
+                del self._vtime[domain]
+
+        skipped = len(candidates) - len(selected)
+        if skipped and len(selected) < slots:
+            logger.debug(f"{skipped} job(s) en attente bloqués par le plafond de {self.max_per_domain} job(s)/domaine")
+        return selected
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Traitement de la sortie des spiders, ligne par ligne
+
+Chaque ligne est écrite dans un fichier de log propre au job (rotation par taille),
+les lignes « METRICS {json} » émises par le spider mettent à jour la progression
+du job en direct, et seules les dernières lignes sont conservées en mémoire.
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = "METRICS "
+
+JOB_LOG_DIR = os.getenv("JOB_LOG_DIR", "logs/jobs")
+JOB_LOG_MAX_BYTES = int(os.getenv("JOB_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+JOB_LOG_BACKUP_COUNT = int(os.getenv("JOB_LOG_BACKUP_COUNT", "3"))
+
+
+class JobOutputHandler:
+    """
+    Callback on_line du JobSupervisor
+
+    Args:
+        job_id: ID du job
+        tail_lines: Nombre de lignes gardées en mémoire par flux
+        on_metrics: Appelé avec le dict de progression à chaque ligne METRICS
+    """
+
+    def __init__(self, job_id: int, tail_lines: int = 200,
+                 on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 log_dir: str = JOB_LOG_DIR):
+        self.job_id = job_id
+        self.on_metrics = on_metrics
+        self.progress: Dict[str, Any] = {}
+        self.lines = 0
+        self.tail_lines = tail_lines
+        self._tails = {'stdout': deque(maxlen=tail_lines), 'stderr': deque(maxlen=tail_lines)}
+        self._lock = threading.Lock()
+
+        # Écriture directe dans le handler (rotation comprise): pas de Logger nommé par
+        # job, que le registre de logging garderait jusqu'à la fin du processus
+        self.log_path: Optional[str] = None
+        self._handler: Optional[RotatingFileHandler] = None
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            self.log_path = os.path.join(log_dir, f"job_{job_id}.log")
+            self._handler = RotatingFileHandler(self.log_path, maxBytes=JOB_LOG_MAX_BYTES,
+                                                backupCount=JOB_LOG_BACKUP_COUNT, encoding='utf-8')
+            self._handler.setFormatter(logging.Formatter('%(message)s'))
+        except OSError as e:
+            logger.warning(f"Log fichier du job {job_id} indisponible: {e}")
+
+    def __call__(self, stream: str, line: str):
+        with self._lock:
+            self.lines += 1
+            self._tails.setdefault(stream, deque(maxlen=self.tail_lines)).append(line)
+        handler = self._handler
+        if handler is not None:
+            handler.handle(logging.makeLogRecord({'msg': f"[{stream}] {line}", 'levelno': logging.INFO,
+                                                  'levelname': 'INFO'}))
+
+        if line.startswith(METRICS_PREFIX):
+            self._handle_metrics(line[len(METRICS_PREFIX):])
+
+    def _handle_metrics(self, payload: str):
+        try:
+            metrics = json.loads(payload)
+        except ValueError:
+            return
+        if not isinstance(metrics, dict):
+            return
+        with self._lock:
+            self.progress.update(metrics)
+            snapshot = dict(self.progress)
+        if self.on_metrics:
+            try:
+                self.on_metrics(snapshot)
+            except Exception as e:
+                logger.debug(f"Mise à jour progression job {self.job_id} en erreur: {e}")
+
+    def tail(self, stream: str) -> str:
+        with self._lock:
+            return "\n".join(self._tails.get(stream, ()))
+
+    def close(self):
+        handler, self._handler = self._handler, None
+        if handler is not None:
+            handler.close()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Supervision des processus spider
+
+Le superviseur possède le Popen du job : il lit stdout/stderr au fil de l'eau,
+applique le timeout lui-même et, à l'expiration ou sur demande, envoie SIGTERM puis
+SIGKILL à tout le groupe de processus (Chromium compris). Il échantillonne aussi
+CPU et mémoire de l'arbre de processus pour la comptabilité par job.
+"""
+
+import os
+import time
+import signal
+import logging
+import threading
+import subprocess
+from typing import Callable, Dict, List, Optional, Any
+
+try:
+    import psutil
+except ImportError:  # comptabilité CPU/mémoire désactivée
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+KILL_GRACE_SECONDS = float(os.getenv("JOB_KILL_GRACE_SECONDS", "15"))
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("JOB_SAMPLE_INTERVAL_SECONDS", "5"))
+MAX_MEMORY_MB = int(os.getenv("JOB_MAX_MEMORY_MB", "0"))  # 0 = pas de limite
+
+LineCallback = Callable[[str, str], None]  # (stream, ligne)
+
+
+class JobSupervisor:
+    """
+    Surveille un processus spider démarré dans sa propre session (start_new_session=True)
+
+    Usage:
+        sup = JobSupervisor(job_id, process, timeout_seconds, on_line=callback)
+        sup.start(stdin_payload)
+        returncode = sup.wait()
+    """
+
+    def __init__(self, job_id: int, process: subprocess.Popen, timeout_seconds: float,
+                 on_line: Optional[LineCallback] = None,
+                 kill_grace_seconds: float = KILL_GRACE_SECONDS,
+                 max_memory_mb: int = MAX_MEMORY_MB):
+        self.job_id = job_id
+        self.process = process
+        self.timeout_seconds = timeout_seconds
+        self.on_line = on_line
+        self.kill_grace_seconds = kill_grace_seconds
+        self.max_memory_mb = max_memory_mb
+
+        self.started_at = time.time()
+        self.timed_out = False
+        self.terminated_reason: Optional[str] = None
+        self._terminate_lock = threading.Lock()
+        self._readers: List[threading.Thread] = []
+
+        # Comptabilité ressources (arbre de processus)
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self._cpu_by_pid: Dict[int, float] = {}
+
+    # ------------------------------------------------------------------
+    # Lecture des flux
+    # ------------------------------------------------------------------
+
+    def _pump(self, stream, name: str):
+        try:
+            for line in iter(stream.readline, ''):
+                if self.on_line:
+                    try:
+                        self.on_line(name, line.rstrip('\n'))
+                    except Exception as e:
+                        logger.debug(f"Callback sortie job {self.job_id} en erreur: {e}")
+        except (ValueError, OSError):
+            pass  # flux fermé pendant l'arrêt forcé
+        finally:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def start(self, stdin_payload: Optional[str] = None):
+        """Démarre la lecture des flux et transmet l'éventuel payload sur stdin"""
+        for stream, name in ((self.process.stdout, 'stdout'), (self.process.stderr, 'stderr')):
+            if stream is not None:
+                reader = threading.Thread(target=self._pump, args=(stream, name),
+                                          name=f"job-{self.job_id}-{name}", daemon=True)
+                reader.start()
+                self._readers.append(reader)
+
+        if self.process.stdin is not None:
+            try:
+                if stdin_payload:
+                    self.process.stdin.write(stdin_payload)
+                    self.process.stdin.flush()
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError) as e:
+                logger.warning(f"Job {self.job_id}: remise du job au processus impossible: {e}")
+
+    # ------------------------------------------------------------------
+    # Attente, timeout et comptabilité
+    # ------------------------------------------------------------------
+
+    def _sample(self):
+        if psutil is None:
+            return
+        try:
+            root = psutil.Process(self.process.pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        rss = 0
+        for proc in procs:
+            try:
+                with proc.oneshot():
+                    times = proc.cpu_times()
+                    self._cpu_by_pid[proc.pid] = times.user + times.system
+                    rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        # Les processus terminés gardent leur dernière mesure CPU
+        self.cpu_seconds = sum(self._cpu_by_pid.values())
+        rss_mb = rss / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+
+        if self.max_memory_mb and rss_mb > self.max_memory_mb:
+            self.terminate(f"mémoire {rss_mb:.0f}MB > {self.max_memory_mb}MB")
+
+    def wait(self) -> int:
+        """Attend la fin du processus en appliquant le timeout; retourne le code de sortie"""
+        deadline = self.started_at + self.timeout_seconds
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.timed_out = True
+                self.terminate(f"timeout après {int(self.timeout_seconds)}s")
+                break
+            try:
+                self.process.wait(timeout=min(SAMPLE_INTERVAL_SECONDS, remaining))
+                break
+            except subprocess.TimeoutExpired:
+                self._sample()
+
+        returncode = self.process.wait()
+        for reader in self._readers:
+            reader.join(timeout=5)
+        return returncode
+
+    # ------------------------------------------------------------------
+    # Arrêt forcé
+    # ------------------------------------------------------------------
+
+    def _signal_group(self, sig: int):
+        try:
+            os.killpg(os.getpgid(self.process.pid), sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        except Exception:
+            try:
+                self.process.send_signal(sig)
+            except Exception:
+                pass
+
+    def terminate(self, reason: str = "arrêt demandé"):
+        """
+        SIGTERM au groupe de processus, puis SIGKILL après le délai de grâce
+
+        Les descendants ayant quitté le groupe (ex: setsid) sont tués via psutil.
+        Idempotent : un seul appel effectif par job.
+        """
+        with self._terminate_lock:
+            if self.terminated_reason is not None or self.process.poll() is not None:
+                return
+            self.terminated_reason = reason
+
+        logger.warning(f"Job {self.job_id}: arrêt du processus {self.process.pid} ({reason})")
+
+        descendants = []
+        if psutil is not None:
+            try:
+                descendants = psutil.Process(self.process.pid).children(recursive=True)
+            except psutil.Error:
+                pass
+
+        self._signal_group(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=self.kill_grace_seconds)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Job {self.job_id}: SIGTERM ignoré, envoi de SIGKILL")
+            self._signal_group(signal.SIGKILL)
+
+        for proc in descendants:
+            try:
+                if proc.is_running():
+                    proc.kill()
+            except Exception:
+                pass
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            'cpu_seconds': round(self.cpu_seconds, 2),
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+            'wall_seconds': round(time.time() - self.started_at, 1),
+            'timed_out': self.timed_out,
+            'terminated_reason': self.terminated_reason,
+        }
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Consommateur du canal NOTIFY refresh_mv
+
+Les triggers de db/optimizations.sql notifient 'contacts' ou 'jobs' après chaque
+instruction modifiant contacts / queue. Les notifications sont regroupées (debounce)
+puis la vue matérialisée concernée est rafraîchie avec REFRESH MATERIALIZED VIEW
+CONCURRENTLY, au plus une fois par intervalle. Tourne en thread dans le scheduler ou
+en processus séparé: python -m orchestration.mv_refresher
+"""
+
+import os
+import sys
+import time
+import select
+import signal
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "db"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD", "scraper_admin"),
+    'connect_timeout': 30,
+    'application_name': 'mv_refresher'
+}
+
+CHANNEL = "refresh_mv"
+
+# Payload de notification -> vues à rafraîchir
+VIEWS_BY_PAYLOAD: Dict[str, tuple] = {
+    'contacts': ('mv_contacts_by_country',),
+    'jobs': ('mv_jobs_stats',),
+}
+
+# Attente sans nouvelle notification avant rafraîchissement
+DEBOUNCE_SECONDS = float(os.getenv("MV_REFRESH_DEBOUNCE_SECONDS", "10"))
+# Intervalle minimal entre deux rafraîchissements d'une même vue
+MIN_INTERVAL_SECONDS = float(os.getenv("MV_REFRESH_MIN_INTERVAL_SECONDS", "300"))
+# Délai maximal entre la première notification et le rafraîchissement (flux continu)
+MAX_DELAY_SECONDS = float(os.getenv("MV_REFRESH_MAX_DELAY_SECONDS", "900"))
+RECONNECT_DELAY_SECONDS = float(os.getenv("MV_REFRESH_RECONNECT_SECONDS", "30"))
+
+
+class MaterializedViewRefresher:
+    """
+    Écoute refresh_mv et rafraîchit les vues matérialisées de façon différée
+
+    Usage:
+        refresher = MaterializedViewRefresher()
+        refresher.start()   # thread de fond
+        ...
+        refresher.stop()
+    """
+
+    def __init__(self, db_config: Dict = None,
+                 debounce_seconds: float = DEBOUNCE_SECONDS,
+                 min_interval_seconds: float = MIN_INTERVAL_SECONDS,
+                 max_delay_seconds: float = MAX_DELAY_SECONDS):
+        self.db_config = db_config or DB_CONFIG
+        self.debounce_seconds = debounce_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Vue -> (première notification en attente, dernière notification)
+        self._pending: Dict[str, list] = {}
+        self._last_refresh: Dict[str, float] = {}
+        self.refresh_count = 0
+        self.notifications = 0
+
+    # ------------------------------------------------------------------
+    # Connexion
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_config)
+        conn.autocommit = True  # LISTEN et REFRESH CONCURRENTLY hors transaction
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        logger.info(f"Écoute du canal {CHANNEL} pour les vues matérialisées")
+        return conn
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Notifications et rafraîchissement
+    # ------------------------------------------------------------------
+
+    def mark(self, payloads: Iterable[str], now: float = None):
+        """Enregistre des notifications (payload inconnu ou vide = toutes les vues)"""
+        now = now or time.time()
+        for payload in payloads:
+            self.notifications += 1
+            views: Set[str] = set(VIEWS_BY_PAYLOAD.get(payload, ()))
+            if not views:
+                views = {v for group in VIEWS_BY_PAYLOAD.values() for v in group}
+            for view in views:
+                entry = self._pending.setdefault(view, [now, now])
+                entry[1] = now
+
+    def due_views(self, now: float = None) -> list:
+        """Vues dont le rafraîchissement peut partir maintenant"""
+        now = now or time.time()
+        due = []
+        for view, (first, last) in self._pending.items():
+            quiet = now - last >= self.debounce_seconds
+            overdue = now - first >= self.max_delay_seconds
+            allowed = now - self._last_refresh.get(view, 0) >= self.min_interval_seconds
+            if (quiet or overdue) and allowed:
+                due.append(view)
+        return due
+
+    def _next_wakeup(self, now: float) -> float:
+        """Délai de select() jusqu'à la prochaine échéance possible"""
+        if not self._pending:
+            return 60.0
+        delays = []
+        for view, (first, last) in self._pending.items():
+            ready = min(last + self.debounce_seconds, first + self.max_delay_seconds)
+            ready = max(ready, self._last_refresh.get(view, 0) + self.min_interval_seconds)
+            delays.append(ready - now)
+        return max(0.5, min(60.0, min(delays)))
+
+    def refresh(self, view: str):
+        started = time.time()
+        with self._conn.cursor() as cur:
+            cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+        self._last_refresh[view] = time.time()
+        self._pending.pop(view, None)
+        self.refresh_count += 1
+        logger.info(f"Vue {view} rafraîchie en {time.time() - started:.2f}s")
+
+    def _drain(self):
+        self._conn.poll()
+        payloads = []
+        while self._conn.notifies:
+            payloads.append(self._conn.notifies.pop(0).payload)
+        if payloads:
+            self.mark(payloads)
+
+    def run(self):
+        """Boucle d'écoute (bloquante) jusqu'à stop()"""
+        while not self._stop.is_set():
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                    # Rattrape les écritures faites pendant l'absence d'écoute
+                    self.mark([''])
+
+                now = time.time()
+                if select.select([self._conn], [], [], self._next_wakeup(now)) != ([], [], []):
+                    self._drain()
+
+                for view in self.due_views():
+                    self.refresh(view)
+                    self._drain()  # notifications reçues pendant le refresh
+
+            except Exception as e:
+                logger.warning(f"Consommateur refresh_mv en erreur, reconnexion dans "
+                               f"{RECONNECT_DELAY_SECONDS:.0f}s: {e}")
+                self._close()
+                self._stop.wait(RECONNECT_DELAY_SECONDS)
+
+        self._close()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="mv-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            'mv_refresh_count': self.refresh_count,
+            'mv_notifications': self.notifications,
+            'mv_pending_views': sorted(self._pending),
+        }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    refresher = MaterializedViewRefresher()
+
+    def _stop(signum, frame):
+        refresher._stop.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    refresher.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Politique de retry des jobs
+
+Le délai avant nouvelle tentative dépend de la stratégie du job (queue.retry_strategy :
+exponential, linear ou fixed), de la catégorie d'erreur (error_categorizer) et d'un
+plafond, avec une gigue pour éviter que des jobs échoués ensemble repartent ensemble.
+Un domaine qui échoue de façon répétée est mis en recul : ses jobs en attente ne sont
+plus sélectionnés tant que le recul court.
+"""
+
+import os
+import re
+import time
+import random
+import logging
+import threading
+from typing import Dict, List, Optional, Any
+
+from orchestration.fair_queue import registered_domain
+
+try:
+    from scraper.utils.error_categorizer import categorize, load_rules
+except ImportError:
+    categorize = load_rules = None
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY_MINUTES = float(os.getenv("RETRY_DELAY_MINUTES", "30"))
+RETRY_MAX_DELAY_MINUTES = float(os.getenv("RETRY_MAX_DELAY_MINUTES", "720"))
+RETRY_JITTER_RATIO = float(os.getenv("RETRY_JITTER_RATIO", "0.5"))
+DOMAIN_BACKOFF_THRESHOLD = int(os.getenv("DOMAIN_BACKOFF_THRESHOLD", "2"))
+DOMAIN_BACKOFF_BASE_MINUTES = float(os.getenv("DOMAIN_BACKOFF_BASE_MINUTES", "15"))
+DOMAIN_BACKOFF_MAX_MINUTES = float(os.getenv("DOMAIN_BACKOFF_MAX_MINUTES", "360"))
+# Un domaine sans recul en cours ni échec depuis ce délai est oublié
+DOMAIN_FAILURE_MEMORY_MINUTES = float(os.getenv("DOMAIN_FAILURE_MEMORY_MINUTES", "360"))
+ERROR_RULES_PATH = os.getenv("ERROR_RULES_PATH", "config/error_rules.json")
+
+STRATEGIES = ('exponential', 'linear', 'fixed')
+
+# Dernière exception d'un stderr de spider ("twisted...ConnectionRefusedError: ...")
+EXCEPTION_LINE_PATTERN = re.compile(r"^\s*[A-Za-z_][\w.]*(?:Error|Exception|Failure|Expired)\b")
+
+# Règles par défaut, surchargées par la section "retry" de config/error_rules.json
+#   retry: la catégorie est-elle retentée
+#   base_minutes: délai de la première tentative (None = RETRY_DELAY_MINUTES)
+#   max_attempts: plafond propre à la catégorie (None = queue.max_retries)
+#   domain_backoff: l'échec est-il imputable au domaine cible
+DEFAULT_RULES: Dict[str, Dict[str, Any]] = {
+    'timeout':   {'retry': True,  'base_minutes': 10, 'max_attempts': 1, 'domain_backoff': True},
+    'network':   {'retry': True,  'base_minutes': 5,  'max_attempts': None, 'domain_backoff': True},
+    'proxy':     {'retry': True,  'base_minutes': 2,  'max_attempts': None, 'domain_backoff': False},
+    'http_5xx':  {'retry': True,  'base_minutes': 15, 'max_attempts': None, 'domain_backoff': True},
+    'anti_bot':  {'retry': True,  'base_minutes': 60, 'max_attempts': 2, 'domain_backoff': True},
+    'http_4xx':  {'retry': False, 'base_minutes': None, 'max_attempts': 0, 'domain_backoff': False},
+    'unknown':   {'retry': True,  'base_minutes': None, 'max_attempts': None, 'domain_backoff': False},
+}
+
+
+def compute_delay(strategy: str, attempt: int, base_minutes: float,
+                  cap_minutes: float = RETRY_MAX_DELAY_MINUTES,
+                  jitter_ratio: float = RETRY_JITTER_RATIO) -> float:
+    """
+    Délai (minutes) avant la tentative n° `attempt` (1 = premier retry)
+
+    La gigue retire aléatoirement jusqu'à `jitter_ratio` du délai plafonné
+    (equal jitter pour 0.5): le délai reste borné par le plafond.
+    """
+    attempt = max(1, int(attempt))
+    if strategy == 'fixed':
+        delay = base_minutes
+    elif strategy == 'linear':
+        delay = base_minutes * attempt
+    else:
+        delay = base_minutes * (2 ** min(attempt - 1, 16))
+    delay = min(delay, cap_minutes)
+    if jitter_ratio > 0:
+        delay -= random.uniform(0, delay * min(jitter_ratio, 1.0))
+    return round(delay, 2)
+
+
+class RetryPolicy:
+    """
+    Décide si un job échoué est retenté et quand
+
+    Usage:
+        category = policy.categorize(result, progress)
+        decision = policy.decide(job, category, has_checkpoint=False)
+        if decision['retry']: ... next_retry_at = NOW() + decision['delay_minutes']
+    """
+
+    def __init__(self, rules_path: str = ERROR_RULES_PATH, time_scale: float = 1.0):
+        # Simulation accélérée: les reculs durent time_scale fois moins en temps réel,
+        # les durées exposées (minutes) restent en temps simulé
+        self.time_scale = time_scale
+        self.rules = {name: dict(rule) for name, rule in DEFAULT_RULES.items()}
+        overrides = {}
+        if load_rules is not None:
+            try:
+                overrides = load_rules(rules_path).get('retry', {})
+            except Exception as e:
+                logger.warning(f"Règles de retry illisibles ({rules_path}): {e}")
+        for category, rule in overrides.items():
+            self.rules.setdefault(category, dict(DEFAULT_RULES['unknown'])).update(rule)
+
+        # Recul par domaine: domaine -> (échecs consécutifs, fin du recul, dernier échec)
+        self._domains: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _match(self, message: str) -> str:
+        if categorize is None:
+            return 'timeout' if 'timeout' in (message or '').lower() else 'unknown'
+        return categorize(message=message or '')
+
+    @staticmethod
+    def _final_exception_line(text: str) -> str:
+        """Ligne de l'exception finale (à défaut la dernière ligne non vide)"""
+        lines = [line.strip() for line in (text or '').splitlines() if line.strip()]
+        for line in reversed(lines):
+            if EXCEPTION_LINE_PATTERN.match(line):
+                return line
+        return lines[-1] if lines else ''
+
+    def categorize(self, result: Dict[str, Any], progress: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Catégorie d'échec d'un run, d'après des données structurées
+
+        Le stderr d'un spider cite presque toujours "timeout" (DownloadTimeoutMiddleware...):
+        une recherche dans tout le message classerait n'importe quel échec en timeout.
+        Ordre: timeout du superviseur, arrêt forcé (signal), erreurs de crawl remontées
+        par les lignes METRICS quand aucune page n'a abouti, puis seulement la ligne de
+        l'exception finale.
+
+        Args:
+            result: Résultat de l'exécuteur (timed_out, returncode, stderr, error)
+            progress: Dernière progression METRICS du job (pages_crawled, error_categories)
+        """
+        if result.get('timed_out'):
+            return 'timeout'
+        returncode = result.get('returncode')
+        if returncode is not None and returncode < 0:
+            return 'unknown'
+
+        progress = progress or {}
+        categories = progress.get('error_categories') or {}
+        if categories and not progress.get('pages_crawled'):
+            return max(categories, key=categories.get)
+
+        line = self._final_exception_line(result.get('stderr') or result.get('error') or '')
+        return self._match(line)
+
+    def _rule(self, category: str) -> Dict[str, Any]:
+        return self.rules.get(category) or self.rules['unknown']
+
+    # ------------------------------------------------------------------
+    # Recul par domaine
+    # ------------------------------------------------------------------
+
+    def _prune(self, now: float):
+        """Oublie les domaines sortis de recul et sans échec récent (appelé sous _lock)"""
+        forget_before = now - DOMAIN_FAILURE_MEMORY_MINUTES * 60 / self.time_scale
+        for domain in [d for d, s in self._domains.items() if s['until'] <= now and s['last'] < forget_before]:
+            del self._domains[domain]
+
+    def record_failure(self, url: str, category: str) -> float:
+        """Comptabilise l'échec du domaine; retourne le recul restant en minutes"""
+        if not self._rule(category).get('domain_backoff'):
+            return self.domain_backoff_remaining(url)
+        domain = registered_domain(url)
+        if not domain:
+            return 0.0
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            state = self._domains.setdefault(domain, {'failures': 0, 'until': 0.0, 'last': now})
+            state['failures'] += 1
+            state['last'] = now
+            if state['failures'] >= DOMAIN_BACKOFF_THRESHOLD:
+                excess = state['failures'] - DOMAIN_BACKOFF_THRESHOLD
+                minutes = min(DOMAIN_BACKOFF_BASE_MINUTES * (2 ** min(excess, 16)), DOMAIN_BACKOFF_MAX_MINUTES)
+                state['until'] = max(state['until'], time.time() + minutes * 60 / self.time_scale)
+                logger.info(f"Domaine {domain} en recul {minutes:.0f} min ({int(state['failures'])} échecs consécutifs)")
+            return max(0.0, (state['until'] - time.time()) / 60 * self.time_scale)
+
+    def record_success(self, url: str):
+        domain = registered_domain(url)
+        with self._lock:
+            self._domains.pop(domain, None)
+
+    def domain_backoff_remaining(self, url: str) -> float:
+        domain = registered_domain(url)
+        with self._lock:
+            state = self._domains.get(domain)
+            if not state:
+                return 0.0
+            return max(0.0, (state['until'] - time.time()) / 60 * self.time_scale)
+
+    def blocked_domains(self) -> List[str]:
+        """Domaines en recul, exclus de la requête des candidats du scheduler"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            return [domain for domain, state in self._domains.items() if state['until'] > now]
+
+    # ------------------------------------------------------------------
+    # Décision
+    # ------------------------------------------------------------------
+
+    def decide(self, job: Dict[str, Any], category: str, has_checkpoint: bool = False) -> Dict[str, Any]:
+        """
+        Args:
+            job: Ligne queue (retry_count, max_retries, retry_strategy, url)
+            category: Catégorie d'échec du dernier run (categorize)
+            has_checkpoint: Un checkpoint permet de reprendre le crawl (lève le plafond
+                propre aux timeouts: la tentative suivante ne repart pas de zéro)
+
+        Returns:
+            {'retry', 'delay_minutes', 'category', 'attempt', 'reason'}
+        """
+        rule = self._rule(category)
+        attempt = int(job.get('retry_count') or 0) + 1
+        max_retries = int(job.get('max_retries') if job.get('max_retries') is not None else 3)
+
+        limit = max_retries
+        if rule.get('max_attempts') is not None and not (category == 'timeout' and has_checkpoint):
+            limit = min(limit, int(rule['max_attempts']))
+
+        domain_remaining = self.record_failure(job.get('url', ''), category)
+
+        decision = {'retry': False, 'delay_minutes': 0.0, 'category': category, 'attempt': attempt, 'reason': ''}
+        if not rule.get('retry'):
+            decision['reason'] = f"catégorie {category} non retentée"
+            return decision
+        if attempt > limit:
+            decision['reason'] = f"plafond atteint ({limit} retry pour {category})"
+            return decision
+
+        strategy = job.get('retry_strategy') or 'exponential'
+        if strategy not in STRATEGIES:
+            strategy = 'exponential'
+        base = rule.get('base_minutes')
+        delay = compute_delay(strategy, attempt, float(base if base is not None else RETRY_DELAY_MINUTES))
+
+        decision.update({
+            'retry': True,
+            'delay_minutes': max(delay, round(domain_remaining, 2)),
+            'reason': f"{strategy}, tentative {attempt}/{limit}",
+        })
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                'domains_in_backoff': sum(1 for s in self._domains.values() if s['until'] > now),
+            }
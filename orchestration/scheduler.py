@@ -11,10 +11,11 @@ import sys
 import json
 import time
 import logging
+import tempfile
 import subprocess
 import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from contextlib import contextmanager
 
 import psycopg2
@@ -22,6 +23,29 @@ from psycopg2.extras import RealDictCursor
 from psycopg2.extensions import connection as PGConnection  # pour annotations sûres
 import schedule
 
+from orchestration.worker_pool import WorkerPool, WarmWorker
+from orchestration.job_supervisor import JobSupervisor
+from orchestration.job_output import JobOutputHandler, JOB_LOG_DIR
+from orchestration.fair_queue import DomainFairQueue, SQL_URL_HOST, SQL_HOST_IN_DOMAINS
+from orchestration.concurrency_controller import AIMDController, WINDOW_MINUTES
+from orchestration.retry_policy import RetryPolicy
+from orchestration.stats_snapshot import StatsSnapshot
+from orchestration.mv_refresher import MaterializedViewRefresher
+
+from scraper.utils.metrics import (JOBS_TOTAL, JOBS_DURATION_SECONDS, JOBS_RUNNING, DB_QUERY_SECONDS,
+                                   query_type, mark_process_dead, start_metrics_server)
+from scraper.utils.checkpoint import has_checkpoint
+
+try:
+    from scraper.utils.error_sink import get_error_rates
+except ImportError:
+    get_error_rates = None
+
+try:
+    from scraper.utils.job_stats import read_job_stats, contacts_saved_total
+except ImportError:
+    read_job_stats = contacts_saved_total = None
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -40,8 +64,17 @@ class ScrapingScheduler:
     Gère l'exécution des spiders avec les nouveaux paramètres personnalisés
     """
 
-    def __init__(self):
-        """Initialize le scheduler avec la configuration base de données"""
+    def __init__(self, executor: Optional[Callable[[Dict], Dict[str, Any]]] = None,
+                 time_scale: float = 1.0):
+        """
+        Initialize le scheduler avec la configuration base de données
+
+        Args:
+            executor: Exécute un job et retourne le résultat (défaut: execute_spider);
+                remplacé par un exécuteur simulé dans orchestration/simulation.py
+            time_scale: Accélération du temps en simulation (délais de retry et reculs
+                de domaine divisés d'autant en temps réel)
+        """
 
         # Configuration base de données
         self.db_config = {
@@ -56,7 +89,40 @@ class ScrapingScheduler:
         # Configuration scheduler
         self.max_concurrent_jobs = int(os.getenv("MAX_CONCURRENT_JOBS", "3"))
         self.job_timeout = int(os.getenv("JOB_TIMEOUT_MINUTES", "60"))
-        self.retry_delay_minutes = int(os.getenv("RETRY_DELAY_MINUTES", "30"))
+        self.output_tail_lines = int(os.getenv("JOB_OUTPUT_TAIL_LINES", "200"))
+        self.progress_flush_seconds = float(os.getenv("JOB_PROGRESS_FLUSH_SECONDS", "30"))
+
+        # Répartition équitable des slots entre domaines (plafond par domaine)
+        self.fair_queue = DomainFairQueue()
+        self.candidate_window = int(os.getenv("FAIR_QUEUE_CANDIDATE_WINDOW", "200"))
+
+        # Retry selon queue.retry_strategy et la catégorie d'erreur, recul des domaines en échec
+        self.time_scale = time_scale
+        self.retry_policy = RetryPolicy(time_scale=time_scale)
+        self.executor = executor or self.execute_spider
+
+        # Stats lues depuis les compteurs maintenus par triggers, publiées dans Redis
+        self.stats_snapshot = StatsSnapshot(self.execute_query)
+
+        # Rafraîchissement différé des vues matérialisées (canal NOTIFY refresh_mv).
+        # Désactivable quand le consommateur tourne en processus séparé.
+        self.mv_refresher: Optional[MaterializedViewRefresher] = None
+        if os.getenv("MV_REFRESH_ENABLED", "true").lower() == "true":
+            self.mv_refresher = MaterializedViewRefresher(dict(self.db_config, application_name='mv_refresher'))
+
+        # Concurrence adaptative: jobs simultanés et CONCURRENT_REQUESTS des spiders
+        self.scrapy_concurrent_requests = int(os.getenv("SCRAPY_CONCURRENT_REQUESTS", "8"))
+        self.concurrency: Optional[AIMDController] = None
+        if os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "true").lower() == "true":
+            self.concurrency = AIMDController(self.max_concurrent_jobs, self.scrapy_concurrent_requests)
+            self.max_concurrent_jobs = self.concurrency.jobs
+            self.scrapy_concurrent_requests = self.concurrency.requests
+
+        # Workers pré-démarrés (imports scrapy/playwright déjà faits)
+        self.worker_pool: Optional[WorkerPool] = None
+        if os.getenv("WORKER_POOL_ENABLED", "true").lower() == "true":
+            # Session dédiée par job: le superviseur tue tout le groupe (Chromium compris)
+            self.worker_pool = WorkerPool(popen_kwargs={'start_new_session': True})
 
         # État du scheduler
         self.running_jobs: Dict[int, Dict[str, Any]] = {}
@@ -84,6 +150,7 @@ class ScrapingScheduler:
 
     def execute_query(self, query: str, params: tuple = None, fetch: str = 'all'):
         """Exécute une requête de manière sécurisée"""
+        started = time.perf_counter()
         try:
             with self.get_db_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -104,23 +171,40 @@ class ScrapingScheduler:
         except Exception as e:
             logger.error(f"Erreur requête base de données: {e}")
             return None
+        finally:
+            DB_QUERY_SECONDS.labels(query_type=query_type(query)).observe(time.perf_counter() - started)
 
     def get_pending_jobs(self) -> List[Dict]:
         """
         Récupère les jobs en attente de traitement
         MODIFIÉ: Inclut custom_keywords, match_mode, min_matches au lieu de theme
+
+        Une fenêtre de candidats est lue puis la file équitable choisit les jobs à
+        lancer, en respectant le plafond de jobs simultanés par domaine. La requête
+        écarte les domaines déjà au plafond ou en recul et ne garde que les max_per_domain premiers
+        jobs de chaque host: un domaine aux milliers d'URL ne remplit pas la fenêtre.
         """
-        query = """
-            SELECT 
-                id, url, country_filter, lang_filter, 
+        query = f"""
+            SELECT
+                id, url, country_filter, lang_filter,
                 custom_keywords, match_mode, min_matches,
-                use_js, max_pages_per_domain, priority, 
-                retry_count, max_retries, next_retry_at,
-                created_at, created_by
-            FROM queue 
-            WHERE status = 'pending' 
-              AND deleted_at IS NULL
-              AND (next_retry_at IS NULL OR next_retry_at <= NOW())
+                use_js, max_pages_per_domain, priority,
+                retry_count, max_retries, next_retry_at, retry_strategy,
+                created_at, created_by, checkpoint_data, profiling
+            FROM (
+                SELECT c.*,
+                       ROW_NUMBER() OVER (PARTITION BY host
+                                          ORDER BY priority ASC, retry_count ASC, created_at ASC) AS host_rank
+                FROM (
+                    SELECT queue.*, {SQL_URL_HOST} AS host
+                    FROM queue
+                    WHERE status = 'pending'
+                      AND deleted_at IS NULL
+                      AND (next_retry_at IS NULL OR next_retry_at <= NOW())
+                ) c
+                WHERE NOT {SQL_HOST_IN_DOMAINS}
+            ) ranked
+            WHERE host_rank <= %s
             ORDER BY priority ASC, retry_count ASC, created_at ASC
             LIMIT %s
         """
@@ -129,8 +213,21 @@ class ScrapingScheduler:
         if available_slots <= 0:
             return []
 
-        jobs = self.execute_query(query, (available_slots,))
-        return jobs or []
+        in_flight = DomainFairQueue.in_flight(
+            info['job'].get('url') for info in list(self.running_jobs.values())
+        )
+        # Filtrés en SQL, avant la fenêtre: des domaines en recul ne peuvent pas
+        # occuper tous les candidats et bloquer le démarrage des autres
+        excluded = self.fair_queue.saturated(in_flight) + self.retry_policy.blocked_domains()
+        candidates = self.execute_query(query, (
+            excluded,
+            self.fair_queue.max_per_domain,
+            max(self.candidate_window, available_slots),
+        ))
+        if not candidates:
+            return []
+
+        return self.fair_queue.select(candidates, in_flight, available_slots)
 
     def update_job_status(
         self,
@@ -138,9 +235,15 @@ class ScrapingScheduler:
         status: str,
         error_message: Optional[str] = None,
         execution_time: Optional[int] = None,
-        contacts_count: Optional[int] = None
+        contacts_count: Optional[int] = None,
+        retry_delay_minutes: Optional[float] = None
     ):
-        """Met à jour le statut d'un job"""
+        """
+        Met à jour le statut d'un job
+
+        retry_delay_minutes: avec status='pending', planifie une nouvelle tentative
+        (retry_count incrémenté, next_retry_at = maintenant + délai)
+        """
 
         update_fields = ["status = %s", "updated_at = NOW()"]
         params: List[Any] = [status]
@@ -158,12 +261,12 @@ class ScrapingScheduler:
             params.append(contacts_count)
 
         # Gestion des retry
-        if status == 'failed':
+        if status == 'pending' and retry_delay_minutes is not None:
             update_fields.extend([
                 "retry_count = retry_count + 1",
-                "next_retry_at = NOW() + INTERVAL '%s minutes'"
+                "next_retry_at = NOW() + make_interval(secs => %s)"
             ])
-            params.append(self.retry_delay_minutes)
+            params.append(float(retry_delay_minutes) * 60 / self.time_scale)
 
         params.append(job_id)
 
@@ -182,6 +285,7 @@ class ScrapingScheduler:
         """
         job_id = job['id']
         start_time = time.time()
+        spider_args: Dict[str, Any] = {}
 
         try:
             logger.info(f"Démarrage job {job_id}: {job['url']}")
@@ -196,7 +300,8 @@ class ScrapingScheduler:
                 'country_filter': job.get('country_filter') or '',
                 'lang_filter': job.get('lang_filter') or '',
                 'use_js': str(job.get('use_js', False)),
-                'max_pages_per_domain': job.get('max_pages_per_domain', 25)
+                'max_pages_per_domain': job.get('max_pages_per_domain', 25),
+                'concurrent_requests': self.scrapy_concurrent_requests
             }
 
             # Log des paramètres pour debug
@@ -207,26 +312,41 @@ class ScrapingScheduler:
             logger.info(f"  - Min matches: {spider_args['min_matches']}")
             logger.info(f"  - JavaScript: {spider_args['use_js']}")
 
+            # Reprise: le checkpoint d'une exécution interrompue est transmis
+            # via un fichier (la frontière peut dépasser la taille max d'un argument)
+            if has_checkpoint(job.get('checkpoint_data')):
+                checkpoint_file = self._write_checkpoint_file(job_id, job['checkpoint_data'])
+                if checkpoint_file:
+                    spider_args['checkpoint_file'] = checkpoint_file
+                    logger.info(f"Job {job_id} repris depuis checkpoint "
+                                f"({len(job['checkpoint_data'].get('frontier', []))} URL(s) en attente)")
+
+            # Profilage à la demande: cProfile du crawl via l'option --profile de Scrapy,
+            # fichier écrit à côté du log du job (chemin absolu, le spider tourne dans scraper/)
+            if job.get('profiling'):
+                spider_args['profile_file'] = os.path.abspath(
+                    os.path.join(JOB_LOG_DIR, f"job_{job_id}.prof")
+                )
+                logger.info(f"Job {job_id} - profilage cProfile activé")
+
             # Construction de la commande Scrapy
             cmd = self._build_scrapy_command(spider_args)
 
             logger.info(f"Exécution commande: {' '.join(cmd[:5])}... (tronqué)")
 
-            # Exécution du spider avec timeout
-            process = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=self.job_timeout * 60,
-                cwd=os.path.join(os.path.dirname(__file__), '..', 'scraper')
-            )
+            # Exécution du spider avec timeout (worker préchauffé si disponible)
+            process, usage = self._run_spider_process(job_id, cmd)
 
             execution_time = int(time.time() - start_time)
+            logger.info(
+                f"Job {job_id} - ressources: CPU {usage['cpu_seconds']}s, "
+                f"pic mémoire {usage['peak_rss_mb']}MB, durée {usage['wall_seconds']}s"
+            )
 
             # Analyser le résultat
             if process.returncode == 0:
-                # Compter les contacts extraits
-                contacts_count = self._count_extracted_contacts(job_id, process.stdout)
+                # Contacts sauvegardés, cumulés sur les tentatives (stats live Redis)
+                contacts_count = self._job_contacts_count(job_id)
 
                 logger.info(
                     f"Job {job_id} terminé avec succès - "
@@ -237,7 +357,8 @@ class ScrapingScheduler:
                     'success': True,
                     'execution_time': execution_time,
                     'contacts_count': contacts_count,
-                    'output': process.stdout
+                    'output': process.stdout,
+                    'resource_usage': usage
                 }
             else:
                 error_msg = f"Erreur spider (code {process.returncode}): {process.stderr}"
@@ -247,8 +368,10 @@ class ScrapingScheduler:
                     'success': False,
                     'execution_time': execution_time,
                     'error': error_msg,
+                    'returncode': process.returncode,
                     'output': process.stdout,
-                    'stderr': process.stderr
+                    'stderr': process.stderr,
+                    'resource_usage': usage
                 }
 
         except subprocess.TimeoutExpired:
@@ -258,7 +381,8 @@ class ScrapingScheduler:
             return {
                 'success': False,
                 'execution_time': self.job_timeout * 60,
-                'error': error_msg
+                'error': error_msg,
+                'timed_out': True
             }
 
         except Exception as e:
@@ -272,6 +396,106 @@ class ScrapingScheduler:
                 'error': error_msg
             }
 
+        finally:
+            if spider_args.get('checkpoint_file'):
+                try:
+                    os.unlink(spider_args['checkpoint_file'])
+                except OSError:
+                    pass
+            if spider_args.get('profile_file'):
+                self._record_job_profile(job_id, spider_args['profile_file'], start_time)
+
+    def _run_spider_process(self, job_id: int, cmd: List[str]):
+        """
+        Exécute la commande scrapy sous supervision (worker du pool ou nouveau processus)
+
+        La sortie est lue au fil de l'eau : écrite dans logs/jobs/job_<id>.log (rotation),
+        lignes METRICS appliquées à la progression du job, seules les dernières lignes
+        gardées en mémoire.
+
+        Returns:
+            (CompletedProcess avec la fin de stdout/stderr, consommation de ressources)
+        """
+        payload = None
+        if self.worker_pool:
+            process = self.worker_pool.acquire().process
+            payload = WarmWorker.job_payload(cmd)
+        else:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                cwd=os.path.join(os.path.dirname(__file__), '..', 'scraper'),
+                start_new_session=True
+            )
+
+        output = JobOutputHandler(
+            job_id, tail_lines=self.output_tail_lines,
+            on_metrics=lambda progress: self._on_job_progress(job_id, progress)
+        )
+        supervisor = JobSupervisor(job_id, process, self.job_timeout * 60, on_line=output)
+        if job_id in self.running_jobs:
+            self.running_jobs[job_id]['supervisor'] = supervisor
+
+        try:
+            supervisor.start(payload)
+            returncode = supervisor.wait()
+        finally:
+            output.close()
+            mark_process_dead(process.pid)
+        if output.progress:
+            self._on_job_progress(job_id, output.progress, force=True)
+        if supervisor.timed_out:
+            raise subprocess.TimeoutExpired(cmd, self.job_timeout * 60)
+
+        completed = subprocess.CompletedProcess(
+            cmd, returncode, output.tail('stdout'), output.tail('stderr')
+        )
+        usage = supervisor.usage()
+        usage['log_file'] = output.log_path
+        return completed, usage
+
+    def _on_job_progress(self, job_id: int, progress: Dict[str, Any], force: bool = False):
+        """Progression reçue du spider (lignes METRICS), persistée à intervalle borné"""
+        job_info = self.running_jobs.get(job_id)
+        if job_info is None:
+            return
+        job_info['progress'] = progress
+
+        if self.concurrency and progress.get('pages_crawled') is not None:
+            pages = int(progress['pages_crawled'])
+            self.concurrency.observe_pages(pages - job_info.get('pages_observed', 0))
+            job_info['pages_observed'] = pages
+
+        now = time.time()
+        if not force and now - job_info.get('progress_flushed_at', 0) < self.progress_flush_seconds:
+            return
+        job_info['progress_flushed_at'] = now
+        if progress.get('contacts_found') is not None:
+            self.execute_query(
+                "UPDATE queue SET contacts_extracted = %s, updated_at = NOW() WHERE id = %s",
+                (int(progress['contacts_found']), job_id),
+                fetch='none'
+            )
+
+    def _write_checkpoint_file(self, job_id: int, checkpoint_data: Dict[str, Any]) -> Optional[str]:
+        """Écrit le checkpoint dans un fichier temporaire lu par le spider"""
+        try:
+            with tempfile.NamedTemporaryFile('w', suffix='.json', prefix=f'checkpoint_{job_id}_',
+                                             delete=False, encoding='utf-8') as f:
+                json.dump(checkpoint_data, f)
+                return f.name
+        except Exception as e:
+            logger.warning(f"Impossible de transmettre le checkpoint du job {job_id}: {e}")
+            return None
+
+    def _job_has_checkpoint(self, job_id: int) -> bool:
+        """Relit le checkpoint écrit par le spider pendant l'exécution"""
+        row = self.execute_query("SELECT checkpoint_data FROM queue WHERE id = %s", (job_id,), fetch='one')
+        return bool(row) and has_checkpoint(row.get('checkpoint_data'))
+
     def _build_scrapy_command(self, args: Dict[str, Any]) -> List[str]:
         """
         Construit la commande Scrapy avec les arguments
@@ -295,31 +519,50 @@ class ScrapingScheduler:
         if args.get('lang_filter'):
             cmd.extend(['-a', f"lang_filter={args['lang_filter']}"])
 
+        if args.get('concurrent_requests'):
+            cmd.extend(['-s', f"CONCURRENT_REQUESTS={args['concurrent_requests']}"])
+
+        if args.get('checkpoint_file'):
+            cmd.extend(['-a', f"checkpoint_file={args['checkpoint_file']}"])
+
+        if args.get('profile_file'):
+            cmd.extend(['--profile', args['profile_file']])
+
         return cmd
 
-    def _count_extracted_contacts(self, job_id: int, spider_output: str) -> int:
+    def _record_job_profile(self, job_id: int, profile_file: str, started_at: float):
         """
-        Compte les contacts extraits pour un job
+        Associe au job le profil produit par cette exécution
+
+        Scrapy écrit le profil à l'arrêt du crawl (y compris sur SIGTERM); un processus
+        tué sans arrêt propre n'en laisse pas, ou laisse celui d'une exécution précédente.
         """
         try:
-            # Compter depuis la base de données (plus fiable)
-            result = self.execute_query(
-                "SELECT COUNT(*) as count FROM contacts WHERE query_id = %s",
-                (job_id,),
-                fetch='one'
-            )
-            return int(result['count']) if result and 'count' in result else 0
+            if os.path.getmtime(profile_file) < started_at:
+                logger.warning(f"Job {job_id} - aucun profil produit par cette exécution")
+                return
+        except OSError:
+            logger.warning(f"Job {job_id} - profil introuvable: {profile_file}")
+            return
+        self.execute_query(
+            "UPDATE queue SET profile_path = %s, updated_at = NOW() WHERE id = %s",
+            (profile_file, job_id),
+            fetch='none'
+        )
+        logger.info(f"Job {job_id} - profil enregistré: {profile_file}")
 
-        except Exception as e:
-            logger.error(f"Erreur comptage contacts pour job {job_id}: {e}")
+    def _job_contacts_count(self, job_id: int) -> int:
+        """
+        Contacts sauvegardés pour un job, lus dans le hash Redis du job
 
-            # Fallback: parser la sortie du spider
-            try:
-                import re
-                matches = re.findall(r'scraped (\d+) items', spider_output, re.IGNORECASE)
-                return int(matches[-1]) if matches else 0
-            except Exception:
-                return 0
+        Repli sur la dernière progression METRICS si Redis est indisponible.
+        """
+        if contacts_saved_total is not None:
+            total = contacts_saved_total(job_id)
+            if total is not None:
+                return total
+        progress = self.running_jobs.get(job_id, {}).get('progress', {})
+        return int(progress.get('contacts_found') or 0)
 
     def process_jobs(self):
         """
@@ -389,43 +632,60 @@ class ScrapingScheduler:
         }
 
         thread.start()
+        JOBS_RUNNING.set(len(self.running_jobs))
         logger.info(f"Job {job_id} lancé en thread ({len(self.running_jobs)} jobs actifs)")
 
     def _job_worker(self, job: Dict):
         """Worker thread pour exécuter un job"""
         job_id = job['id']
+        started = time.time()
+        outcome = 'failed'
 
         try:
-            # Exécuter le spider
-            result = self.execute_spider(job)
+            # Exécuter le spider (ou l'exécuteur de simulation)
+            result = self.executor(job)
+
+            # Job annulé (arrêt admin / scheduler): statut déjà positionné
+            if self.running_jobs.get(job_id, {}).get('cancelled'):
+                outcome = 'cancelled'
+                return
 
             # Mettre à jour le statut selon le résultat
             if result['success']:
+                outcome = 'done'
+                self.retry_policy.record_success(job.get('url'))
                 self.update_job_status(
                     job_id, 'done',
                     execution_time=result['execution_time'],
                     contacts_count=result.get('contacts_count', 0)
                 )
             else:
-                # Vérifier si on doit retry
-                should_retry = (
-                    job.get('retry_count', 0) < job.get('max_retries', 3) and
-                    'timeout' not in str(result.get('error', '')).lower()
+                # Vérifier si on doit retry (stratégie du job, catégorie d'erreur, plafonds).
+                # La catégorie vient du résultat (timeout superviseur, code de sortie) et
+                # de la dernière progression METRICS, pas d'une recherche dans le stderr.
+                # Un checkpoint lève le plafond des timeouts: le retry reprend la frontière
+                error_message = str(result.get('error', ''))
+                category = self.retry_policy.categorize(
+                    result, self.running_jobs.get(job_id, {}).get('progress')
+                )
+                decision = self.retry_policy.decide(
+                    job, category,
+                    has_checkpoint=self._job_has_checkpoint(job_id)
                 )
-
-                status = 'pending' if should_retry else 'failed'
 
                 self.update_job_status(
-                    job_id, status,
-                    error_message=str(result.get('error', '')),
-                    execution_time=result.get('execution_time')
+                    job_id, 'pending' if decision['retry'] else 'failed',
+                    error_message=error_message,
+                    execution_time=result.get('execution_time'),
+                    retry_delay_minutes=decision['delay_minutes'] if decision['retry'] else None
                 )
 
-                if should_retry:
-                    retry_count = job.get('retry_count', 0) + 1
-                    logger.info(f"Job {job_id} sera retenté (tentative {retry_count})")
+                if decision['retry']:
+                    outcome = 'retry'
+                    logger.info(f"Job {job_id} sera retenté dans {decision['delay_minutes']:.1f} min "
+                                f"({decision['category']}, {decision['reason']})")
                 else:
-                    logger.error(f"Job {job_id} définitivement échoué")
+                    logger.error(f"Job {job_id} définitivement échoué ({decision['category']}: {decision['reason']})")
 
         except Exception as e:
             logger.error(f"Erreur critique dans job worker {job_id}: {e}")
@@ -435,49 +695,58 @@ class ScrapingScheduler:
             # Nettoyer le job des jobs actifs
             if job_id in self.running_jobs:
                 del self.running_jobs[job_id]
+            JOBS_RUNNING.set(len(self.running_jobs))
+            JOBS_TOTAL.labels(status=outcome).inc()
+            JOBS_DURATION_SECONDS.labels(status=outcome).observe(time.time() - started)
 
             logger.info(f"Job {job_id} terminé ({len(self.running_jobs)} jobs actifs restants)")
 
     def _cleanup_expired_jobs(self):
-        """Nettoie les jobs expirés ou bloqués"""
+        """
+        Filet de sécurité pour les jobs dépassant le timeout
+
+        Le superviseur applique normalement le timeout lui-même. Si un job le dépasse
+        encore (délai de grâce compris), son groupe de processus est tué; le slot n'est
+        libéré qu'à la fin effective du processus, par le thread du job.
+        """
         current_time = time.time()
-        expired_jobs: List[int] = []
+        grace = self.job_timeout * 60 + 120
 
         for job_id, job_info in list(self.running_jobs.items()):
-            if current_time - job_info['start_time'] > self.job_timeout * 60:
-                expired_jobs.append(job_id)
-
-        for job_id in expired_jobs:
-            logger.warning(f"Job {job_id} expiré, nettoyage forcé")
-
-            # Note: Python ne permet pas de tuer un thread directement
-            # Le timeout du subprocess devrait gérer cela
-
-            # Marquer comme échoué
-            self.update_job_status(job_id, 'failed',
-                                   error_message="Job expiré par timeout scheduler")
-
-            # Retirer des jobs actifs
-            if job_id in self.running_jobs:
-                del self.running_jobs[job_id]
+            if current_time - job_info['start_time'] <= grace:
+                continue
+
+            supervisor: Optional[JobSupervisor] = job_info.get('supervisor')
+            if supervisor is not None:
+                logger.warning(f"Job {job_id} expiré, arrêt forcé du processus")
+                threading.Thread(target=supervisor.terminate,
+                                 args=("Job expiré par timeout scheduler",), daemon=True).start()
+            elif not job_info['thread'].is_alive():
+                # Thread terminé sans nettoyage (ne devrait pas arriver)
+                self.running_jobs.pop(job_id, None)
 
     def get_system_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques système"""
         try:
-            stats = self.execute_query("""
-                SELECT 
-                    (SELECT COUNT(*) FROM queue   WHERE status = 'pending'     AND deleted_at IS NULL)                                        AS pending_jobs,
-                    (SELECT COUNT(*) FROM queue   WHERE status = 'in_progress'  AND deleted_at IS NULL)                                        AS active_jobs,
-                    (SELECT COUNT(*) FROM queue   WHERE status = 'done'         AND DATE(updated_at) = CURRENT_DATE AND deleted_at IS NULL)   AS completed_today,
-                    (SELECT COUNT(*) FROM queue   WHERE status = 'failed'       AND DATE(updated_at) = CURRENT_DATE AND deleted_at IS NULL)   AS failed_today,
-                    (SELECT COUNT(*) FROM contacts WHERE DATE(created_at) = CURRENT_DATE AND deleted_at IS NULL)                               AS contacts_today
-            """, fetch='one')
+            stats = self.stats_snapshot.get()
 
             if stats:
                 stats = dict(stats)
                 stats['running_jobs'] = len(self.running_jobs)
                 stats['scheduler_status'] = 'paused' if self.scheduler_paused else 'running'
                 stats['max_concurrent_jobs'] = self.max_concurrent_jobs
+                running = list(self.running_jobs.items())
+                live = read_job_stats([job_id for job_id, _ in running]) if read_job_stats else {}
+                stats['jobs_progress'] = {
+                    job_id: {**info.get('progress', {}), **live.get(job_id, {})} for job_id, info in running
+                }
+                if self.worker_pool:
+                    stats.update(self.worker_pool.stats())
+                if self.concurrency:
+                    stats.update(self.concurrency.stats())
+                stats.update(self.retry_policy.stats())
+                if self.mv_refresher:
+                    stats.update(self.mv_refresher.stats())
                 return stats
 
         except Exception as e:
@@ -494,6 +763,22 @@ class ScrapingScheduler:
             'max_concurrent_jobs': self.max_concurrent_jobs
         }
 
+    def _adjust_concurrency(self):
+        """Tick du contrôleur AIMD: met à jour max_concurrent_jobs et CONCURRENT_REQUESTS"""
+        if not self.concurrency:
+            return
+        # None: taux d'erreur inconnu, le contrôleur n'augmente pas la concurrence
+        try:
+            error_rates = get_error_rates(WINDOW_MINUTES) if get_error_rates else None
+        except Exception as e:
+            logger.debug(f"Agrégats d'erreurs indisponibles pour le contrôleur: {e}")
+            error_rates = None
+
+        saturated = len(self.running_jobs) >= self.max_concurrent_jobs
+        self.concurrency.evaluate(error_rates, saturated=saturated)
+        self.max_concurrent_jobs = self.concurrency.jobs
+        self.scrapy_concurrent_requests = self.concurrency.requests
+
     def pause_scheduler(self):
         """Met en pause le scheduler"""
         self.scheduler_paused = True
@@ -513,14 +798,23 @@ class ScrapingScheduler:
         logger.info("Scheduler repris")
 
     def stop_all_jobs(self):
-        """Arrête tous les jobs en cours"""
+        """Arrête tous les jobs en cours (processus tués, statut failed)"""
         logger.info(f"Arrêt de {len(self.running_jobs)} job(s) en cours")
 
-        for job_id in list(self.running_jobs.keys()):
+        stoppers = []
+        for job_id, job_info in list(self.running_jobs.items()):
+            job_info['cancelled'] = True
             self.update_job_status(job_id, 'failed',
                                    error_message="Arrêté par l'administrateur")
+            supervisor: Optional[JobSupervisor] = job_info.get('supervisor')
+            if supervisor is not None:
+                t = threading.Thread(target=supervisor.terminate,
+                                     args=("Arrêté par l'administrateur",), daemon=True)
+                t.start()
+                stoppers.append(t)
 
-        self.running_jobs.clear()
+        for t in stoppers:
+            t.join(timeout=60)
 
     def run(self):
         """
@@ -529,10 +823,21 @@ class ScrapingScheduler:
         logger.info("Démarrage du scheduler")
         self.is_running = True
 
+        if self.worker_pool:
+            self.worker_pool.replenish()
+        if self.mv_refresher:
+            self.mv_refresher.start()
+        if os.getenv("METRICS_ENABLED", "true").lower() == "true":
+            start_metrics_server()
+
         # Programmer les tâches périodiques
         schedule.every(30).seconds.do(self.process_jobs)
         schedule.every(5).minutes.do(self._log_stats)
         schedule.every(1).hours.do(self._maintenance_cleanup)
+        schedule.every(int(os.getenv("STATS_SNAPSHOT_SECONDS", "30"))).seconds.do(self._publish_stats_snapshot)
+        schedule.every().day.at(os.getenv("STATS_REBUILD_AT", "03:30")).do(self._rebuild_stats_counters)
+        if self.concurrency:
+            schedule.every(int(os.getenv("CONCURRENCY_ADJUST_SECONDS", "60"))).seconds.do(self._adjust_concurrency)
 
         try:
             while self.is_running:
@@ -554,6 +859,26 @@ class ScrapingScheduler:
             f"{stats['running_jobs']}/{self.max_concurrent_jobs} actifs, "
             f"{stats['completed_today']} terminés aujourd'hui"
         )
+        if self.worker_pool:
+            pool = self.worker_pool.stats()
+            logger.info(
+                f"Pool workers: {pool['worker_pool_idle']}/{pool['worker_pool_size']} prêts, "
+                f"préchauffage moyen {pool['worker_warmup_avg_s']}s, "
+                f"attente moyenne {pool['worker_acquire_avg_ms']}ms"
+            )
+
+    def _publish_stats_snapshot(self):
+        """Relit les compteurs de stats et publie le snapshot dans Redis"""
+        try:
+            self.stats_snapshot.refresh()
+        except Exception as e:
+            logger.warning(f"Snapshot de stats non publié: {e}")
+
+    def _rebuild_stats_counters(self):
+        """Recalcul complet des compteurs de stats (corrige une éventuelle dérive)"""
+        if self.execute_query("SELECT stats_counters_rebuild()", fetch='none'):
+            logger.info("Compteurs de stats recalculés")
+            self._publish_stats_snapshot()
 
     def _maintenance_cleanup(self):
         """Tâches de maintenance périodiques"""
@@ -588,6 +913,11 @@ class ScrapingScheduler:
                 logger.warning(f"Arrêt forcé de {len(self.running_jobs)} job(s)")
                 self.stop_all_jobs()
 
+        if self.worker_pool:
+            self.worker_pool.shutdown()
+        if self.mv_refresher:
+            self.mv_refresher.stop()
+
         logger.info("Scheduler arrêté")
 
 
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Simulateur de débit du scheduler
+
+Le vrai ScrapingScheduler (sélection des jobs, file équitable, politique de retry,
+écritures en base) tourne contre un Postgres local, mais execute_spider est remplacé
+par un exécuteur simulé qui dort ou échoue selon une distribution. Le temps est
+accéléré (--speedup): durées d'exécution, délais de retry, reculs de domaine et
+intervalle de polling sont divisés d'autant en temps réel. Mesures: latence de file
+(éligibilité -> prise en charge), utilisation des slots, requêtes SQL par job.
+
+    python -m orchestration.simulation --jobs 10000 --speedup 600 --output sim.json
+
+Les jobs simulés sont créés avec created_by='simulation' puis supprimés; la simulation
+refuse de tourner si la file contient d'autres jobs actifs (base dédiée requise).
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+import statistics
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Pas de workers pré-démarrés ni de tâches de fond réelles pendant la simulation
+os.environ.setdefault("WORKER_POOL_ENABLED", "false")
+os.environ.setdefault("MV_REFRESH_ENABLED", "false")
+os.environ.setdefault("ADAPTIVE_CONCURRENCY_ENABLED", "false")
+
+from psycopg2.extras import execute_values
+
+from orchestration.scheduler import ScrapingScheduler
+from orchestration.fair_queue import registered_domain
+from scraper.utils.metrics import query_type
+
+logger = logging.getLogger(__name__)
+
+SIMULATION_OWNER = 'simulation'
+
+# Messages d'erreur par catégorie (reconnus par error_categorizer / config/error_rules.json)
+ERROR_MESSAGES = {
+    'network': "Erreur spider (code 1): twisted.internet.error.ConnectionRefusedError: Connection refused",
+    'proxy': "Erreur spider (code 1): Proxy tunnel failed",
+    'anti_bot': "Erreur spider (code 1): Captcha détecté",
+    'unknown': "Erreur spider (code 1): KeyError 'contacts'",
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile au rang le plus proche (None si aucune valeur)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class SimulatedExecutor:
+    """
+    Remplace execute_spider: durée log-normale, échecs et timeouts tirés au sort
+
+    Les domaines "difficiles" (bad_domain_ratio) échouent avec bad_failure_rate,
+    ce qui exerce le recul par domaine de la politique de retry.
+    """
+
+    def __init__(self, speedup: float, duration_median: float = 300.0, duration_sigma: float = 0.8,
+                 failure_rate: float = 0.05, timeout_rate: float = 0.01,
+                 bad_domain_ratio: float = 0.02, bad_failure_rate: float = 0.8,
+                 job_timeout_minutes: int = 60, seed: int = 42):
+        self.speedup = speedup
+        self.duration_mu = math.log(max(duration_median, 0.001))
+        self.duration_sigma = duration_sigma
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.bad_domain_ratio = bad_domain_ratio
+        self.bad_failure_rate = bad_failure_rate
+        self.job_timeout_minutes = job_timeout_minutes
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _bad_domain(self, url: str) -> bool:
+        return random.Random(f"{self.seed}:{registered_domain(url)}").random() < self.bad_domain_ratio
+
+    def __call__(self, job: Dict) -> Dict[str, Any]:
+        with self._lock:
+            draw = self._rng.random()
+            duration = min(self._rng.lognormvariate(self.duration_mu, self.duration_sigma),
+                           self.job_timeout_minutes * 60)
+            category = self._rng.choice(list(ERROR_MESSAGES))
+            contacts = self._rng.randint(0, 40)
+
+        failure_rate = self.bad_failure_rate if self._bad_domain(job.get('url', '')) else self.failure_rate
+        if draw < self.timeout_rate:
+            time.sleep(self.job_timeout_minutes * 60 / self.speedup)
+            return {'success': False, 'execution_time': self.job_timeout_minutes * 60,
+                    'error': f"Timeout après {self.job_timeout_minutes} minutes", 'timed_out': True}
+
+        time.sleep(duration / self.speedup)
+        if draw < self.timeout_rate + failure_rate:
+            return {'success': False, 'execution_time': int(duration), 'error': ERROR_MESSAGES[category]}
+        return {'success': True, 'execution_time': int(duration), 'contacts_count': contacts}
+
+
+class SimulatedScheduler(ScrapingScheduler):
+    """
+    ScrapingScheduler instrumenté: compte les requêtes SQL, relève l'instant
+    d'éligibilité et de prise en charge de chaque tentative et l'issue des jobs
+    """
+
+    def __init__(self, executor: SimulatedExecutor, speedup: float):
+        super().__init__(executor=executor, time_scale=speedup)
+        self._lock = threading.Lock()
+        self.queries: Dict[str, int] = {}
+        self.eligible_at: Dict[int, float] = {}
+        self.latencies: List[Dict[str, Any]] = []
+        self.outcomes: Dict[str, int] = {}
+        self.domain_peak: Dict[str, int] = {}
+        self.last_claim_at = 0.0
+
+    def execute_query(self, query: str, params: tuple = None, fetch: str = 'all'):
+        with self._lock:
+            kind = query_type(query)
+            self.queries[kind] = self.queries.get(kind, 0) + 1
+        return super().execute_query(query, params, fetch)
+
+    def _start_job_thread(self, job: Dict):
+        now = time.time()
+        with self._lock:
+            eligible = self.eligible_at.pop(job['id'], now)
+            domain = registered_domain(job['url'])
+            self.latencies.append({
+                'seconds': max(0.0, now - eligible) * self.time_scale,
+                'priority': job.get('priority'),
+                'domain': domain,
+                'attempt': int(job.get('retry_count') or 0),
+            })
+            self.last_claim_at = now
+            running = sum(1 for info in list(self.running_jobs.values())
+                          if registered_domain(info['job']['url']) == domain) + 1
+            self.domain_peak[domain] = max(self.domain_peak.get(domain, 0), running)
+        super()._start_job_thread(job)
+
+    def update_job_status(self, job_id: int, status: str, error_message: Optional[str] = None,
+                          execution_time: Optional[int] = None, contacts_count: Optional[int] = None,
+                          retry_delay_minutes: Optional[float] = None):
+        super().update_job_status(job_id, status, error_message, execution_time,
+                                  contacts_count, retry_delay_minutes)
+        with self._lock:
+            if status == 'pending' and retry_delay_minutes is not None:
+                self.eligible_at[job_id] = time.time() + retry_delay_minutes * 60 / self.time_scale
+                self.outcomes['retry'] = self.outcomes.get('retry', 0) + 1
+            elif status in ('done', 'failed'):
+                self.outcomes[status] = self.outcomes.get(status, 0) + 1
+
+    @property
+    def finished_jobs(self) -> int:
+        return self.outcomes.get('done', 0) + self.outcomes.get('failed', 0)
+
+
+# ---------------------------------------------------------------------------
+# File de jobs simulés
+# ---------------------------------------------------------------------------
+
+def seed_jobs(scheduler: SimulatedScheduler, count: int, domains: int, seed: int) -> List[int]:
+    """Insère `count` jobs en attente (priorités mêlées, quelques domaines très chargés)"""
+    rng = random.Random(seed)
+    priorities = [1] * 1 + [5] * 3 + [10] * 6
+    rows = []
+    for i in range(count):
+        domain = int(domains * rng.random() ** 3)
+        rows.append((
+            f"https://www.cabinet-sim-{domain}.fr/page/{i}",
+            json.dumps(['simulation']),
+            rng.choice(priorities),
+            rng.choice(['exponential', 'exponential', 'linear', 'fixed']),
+            SIMULATION_OWNER,
+        ))
+    with scheduler.get_db_connection() as conn, conn.cursor() as cur:
+        ids = execute_values(cur, """
+            INSERT INTO queue (url, custom_keywords, priority, retry_strategy, created_by, status, created_at)
+            VALUES %s RETURNING id
+        """, rows, template="(%s, %s, %s, %s, %s, 'pending', NOW())", page_size=1000, fetch=True)
+        conn.commit()
+    return [row[0] for row in ids]
+
+
+def foreign_active_jobs(scheduler: ScrapingScheduler) -> int:
+    row = scheduler.execute_query("""
+        SELECT COUNT(*) AS c FROM queue
+        WHERE status IN ('pending', 'in_progress') AND deleted_at IS NULL
+          AND created_by IS DISTINCT FROM %s
+    """, (SIMULATION_OWNER,), fetch='one')
+    return int(row['c']) if row else 0
+
+
+def delete_simulation_jobs(scheduler: ScrapingScheduler):
+    scheduler.execute_query("DELETE FROM queue WHERE created_by = %s", (SIMULATION_OWNER,), fetch='none')
+
+
+# ---------------------------------------------------------------------------
+# Boucle de simulation
+# ---------------------------------------------------------------------------
+
+def run_simulation(scheduler: SimulatedScheduler, job_count: int, poll_seconds: float,
+                   max_sim_minutes: float, sample_seconds: float = 0.02) -> Dict[str, Any]:
+    """Appelle process_jobs à l'intervalle de polling accéléré jusqu'à vidage de la file"""
+    speedup = scheduler.time_scale
+    started = time.time()
+    busy_area = slots_area = 0.0
+    # Utilisation mesurée jusqu'à la dernière prise en charge (file encore garnie)
+    backlog_areas = (0.0, 0.0)
+    last_claim_seen = 0.0
+    polls = 0
+    poll_real_seconds = 0.0
+    next_poll = started
+    last_sample = started
+
+    while scheduler.finished_jobs < job_count:
+        now = time.time()
+        if (now - started) * speedup > max_sim_minutes * 60:
+            logger.warning("Durée simulée maximale atteinte, arrêt de la simulation")
+            break
+
+        # Intégrale des slots occupés / disponibles (jusqu'à la dernière prise en charge)
+        elapsed = now - last_sample
+        busy_area += len(scheduler.running_jobs) * elapsed
+        slots_area += scheduler.max_concurrent_jobs * elapsed
+        last_sample = now
+        if scheduler.last_claim_at != last_claim_seen:
+            last_claim_seen = scheduler.last_claim_at
+            backlog_areas = (busy_area, slots_area)
+
+        if now >= next_poll:
+            poll_started = time.perf_counter()
+            scheduler.process_jobs()
+            poll_real_seconds += time.perf_counter() - poll_started
+            polls += 1
+            next_poll = now + poll_seconds / speedup
+        time.sleep(sample_seconds)
+
+    # Laisse les derniers threads terminer leur mise à jour de statut
+    deadline = time.time() + 10
+    while scheduler.running_jobs and time.time() < deadline:
+        time.sleep(0.05)
+
+    wall = time.time() - started
+    return {
+        'wall_seconds': round(wall, 2),
+        'simulated_minutes': round(wall * speedup / 60, 1),
+        'polls': polls,
+        'poll_real_ms_avg': round(poll_real_seconds / polls * 1000, 2) if polls else None,
+        'slot_utilisation': round(busy_area / slots_area, 4) if slots_area else None,
+        'slot_utilisation_with_backlog': round(backlog_areas[0] / backlog_areas[1], 4)
+        if backlog_areas[1] else None,
+    }
+
+
+def build_report(scheduler: SimulatedScheduler, loop: Dict[str, Any], job_count: int) -> Dict[str, Any]:
+    latencies = [entry['seconds'] for entry in scheduler.latencies]
+    first_attempts = [entry['seconds'] for entry in scheduler.latencies if entry['attempt'] == 0]
+
+    by_priority: Dict[Any, List[float]] = {}
+    by_domain: Dict[str, List[float]] = {}
+    for entry in scheduler.latencies:
+        by_priority.setdefault(entry['priority'], []).append(entry['seconds'])
+        by_domain.setdefault(entry['domain'], []).append(entry['seconds'])
+    domain_medians = [statistics.median(v) for v in by_domain.values()]
+
+    total_queries = sum(scheduler.queries.values())
+    finished = scheduler.finished_jobs
+    return {
+        **loop,
+        'jobs': job_count,
+        'finished_jobs': finished,
+        'outcomes': scheduler.outcomes,
+        'attempts': len(scheduler.latencies),
+        'throughput_jobs_per_sim_hour': round(finished / (loop['simulated_minutes'] / 60), 1)
+        if loop['simulated_minutes'] else None,
+        'queue_latency_sim_seconds': {
+            'p50': round(percentile(latencies, 50) or 0, 1),
+            'p95': round(percentile(latencies, 95) or 0, 1),
+            'max': round(max(latencies), 1) if latencies else None,
+            'first_attempt_p50': round(percentile(first_attempts, 50) or 0, 1),
+        },
+        'queue_latency_by_priority_p50': {
+            str(priority): round(percentile(values, 50), 1) for priority, values in sorted(by_priority.items())
+        },
+        'fairness': {
+            'domains': len(by_domain),
+            'domain_median_latency_min': round(min(domain_medians), 1) if domain_medians else None,
+            'domain_median_latency_max': round(max(domain_medians), 1) if domain_medians else None,
+            'max_running_per_domain': max(scheduler.domain_peak.values()) if scheduler.domain_peak else 0,
+        },
+        'db_queries': {
+            'total': total_queries,
+            'per_job': round(total_queries / finished, 2) if finished else None,
+            'per_poll': round(scheduler.queries.get('select', 0) / loop['polls'], 2) if loop['polls'] else None,
+            'by_type': scheduler.queries,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation de débit du scheduler (exécuteur factice)")
+    parser.add_argument('--jobs', type=int, default=10000)
+    parser.add_argument('--domains', type=int, default=300)
+    parser.add_argument('--speedup', type=float, default=600.0, help="Secondes simulées par seconde réelle")
+    parser.add_argument('--poll-seconds', type=float, default=30.0, help="Intervalle de process_jobs (simulé)")
+    parser.add_argument('--max-sim-hours', type=float, default=24 * 30)
+    parser.add_argument('--duration-median', type=float, default=300.0, help="Durée médiane d'un job (s simulées)")
+    parser.add_argument('--duration-sigma', type=float, default=0.8)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--timeout-rate', type=float, default=0.01)
+    parser.add_argument('--bad-domain-ratio', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    parser.add_argument('--keep', action='store_true', help="Conserver les jobs simulés en base")
+    parser.add_argument('--force', action='store_true', help="Tourner malgré d'autres jobs actifs en file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Le scheduler configure la journalisation en INFO à l'import: une ligne par job est trop bavard ici
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(args.seed)
+
+    executor = SimulatedExecutor(
+        args.speedup, duration_median=args.duration_median, duration_sigma=args.duration_sigma,
+        failure_rate=args.failure_rate, timeout_rate=args.timeout_rate,
+        bad_domain_ratio=args.bad_domain_ratio,
+        job_timeout_minutes=int(os.getenv("JOB_TIMEOUT_MINUTES", "60")), seed=args.seed
+    )
+    scheduler = SimulatedScheduler(executor, args.speedup)
+
+    foreign = foreign_active_jobs(scheduler)
+    if foreign and not args.force:
+        logger.error(f"{foreign} job(s) réel(s) actif(s) dans la file: utiliser une base dédiée (ou --force)")
+        return 1
+
+    delete_simulation_jobs(scheduler)
+    seeded_at = time.time()
+    scheduler.eligible_at = {job_id: seeded_at for job_id in seed_jobs(scheduler, args.jobs, args.domains, args.seed)}
+    scheduler.queries.clear()
+    print(f"{args.jobs} jobs simulés en file, {scheduler.max_concurrent_jobs} slots, "
+          f"accélération x{args.speedup:g}")
+
+    try:
+        loop = run_simulation(scheduler, args.jobs, args.poll_seconds, args.max_sim_hours * 60)
+    finally:
+        scheduler.stop_all_jobs()
+        if not args.keep:
+            delete_simulation_jobs(scheduler)
+
+    report = {
+        'benchmark': 'scheduler_simulation',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            **{k: v for k, v in vars(args).items() if k not in ('output', 'keep', 'force')},
+            'max_concurrent_jobs': scheduler.max_concurrent_jobs,
+            'candidate_window': scheduler.candidate_window,
+        },
+        'results': build_report(scheduler, loop, args.jobs),
+    }
+    print(json.dumps(report['results'], indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Snapshot des statistiques système
+
+Les compteurs sont maintenus par triggers (migration 003: stats_counters et
+stats_daily_counters); le scheduler les relit périodiquement et publie un snapshot
+JSON dans Redis. Scheduler et dashboard lisent ce snapshot au lieu de recompter
+queue et contacts. COUNTERS_QUERY et build_snapshot servent aussi au dashboard
+quand le snapshot n'est pas publié.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Optional, Any
+
+try:
+    from scraper.utils.redis_coordination import get_redis_client, _ns
+except ImportError:
+    get_redis_client = _ns = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "stats:snapshot"
+SNAPSHOT_TTL_SECONDS = int(os.getenv("STATS_SNAPSHOT_TTL_SECONDS", "120"))
+
+# Un compteur est réparti sur plusieurs lignes (shards, migration 003): somme par nom
+COUNTERS_QUERY = """
+    SELECT name, SUM(value) AS value FROM stats_counters GROUP BY name
+    UNION ALL
+    SELECT name || '_today', SUM(value) FROM stats_daily_counters WHERE day = CURRENT_DATE GROUP BY name
+    UNION ALL
+    SELECT 'last_job_created', EXTRACT(EPOCH FROM MAX(created_at))::bigint FROM queue WHERE deleted_at IS NULL
+"""
+
+# Nom du compteur -> clé exposée dans les stats
+FIELDS = {
+    'queue_pending': 'pending_jobs',
+    'queue_in_progress': 'active_jobs',
+    'queue_done_today': 'completed_today',
+    'queue_failed_today': 'failed_today',
+    'contacts_created_today': 'contacts_today',
+    'queue_total': 'total_jobs',
+    'contacts_total': 'total_contacts',
+    'contacts_verified': 'verified_contacts',
+    'proxies_total': 'total_proxies',
+    'proxies_active': 'active_proxies',
+}
+
+
+def build_snapshot(rows) -> Dict[str, Any]:
+    """Convertit les lignes (name, value) de COUNTERS_QUERY en snapshot"""
+    values = {row['name']: row['value'] for row in rows or []}
+    snapshot: Dict[str, Any] = {key: int(values.get(name) or 0) for name, key in FIELDS.items()}
+    last_created = values.get('last_job_created')
+    snapshot['last_job_created'] = (datetime.fromtimestamp(int(last_created)).isoformat(sep=' ', timespec='seconds')
+                                    if last_created else None)
+    snapshot['generated_at'] = time.time()
+    return snapshot
+
+
+class StatsSnapshot:
+    """
+    Lecture / publication du snapshot
+
+    Args:
+        query_fn: execute_query du scheduler (query, params, fetch) -> lignes
+    """
+
+    def __init__(self, query_fn: Callable[..., Any], ttl_seconds: int = SNAPSHOT_TTL_SECONDS):
+        self.query_fn = query_fn
+        self.ttl_seconds = ttl_seconds
+        self._redis = None
+        self._last: Optional[Dict[str, Any]] = None
+
+    def _client(self):
+        if self._redis is None and get_redis_client is not None:
+            try:
+                self._redis = get_redis_client()
+            except Exception as e:
+                logger.debug(f"Redis indisponible pour le snapshot de stats: {e}")
+        return self._redis
+
+    def refresh(self) -> Optional[Dict[str, Any]]:
+        """Relit les compteurs et publie le snapshot dans Redis"""
+        rows = self.query_fn(COUNTERS_QUERY)
+        if rows is None:
+            return self._last
+        snapshot = build_snapshot(rows)
+        self._last = snapshot
+
+        r = self._client()
+        if r is not None:
+            try:
+                r.set(_ns(SNAPSHOT_KEY), json.dumps(snapshot), ex=self.ttl_seconds)
+            except Exception as e:
+                logger.debug(f"Publication du snapshot de stats impossible: {e}")
+        return snapshot
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """Snapshot publié (Redis), sinon dernier snapshot local, sinon relecture des compteurs"""
+        r = self._client()
+        if r is not None:
+            try:
+                raw = r.get(_ns(SNAPSHOT_KEY))
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                logger.debug(f"Lecture du snapshot de stats impossible: {e}")
+        if self._last is not None and time.time() - self._last['generated_at'] < self.ttl_seconds:
+            return self._last
+        return self.refresh()
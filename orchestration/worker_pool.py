@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pool de workers pré-démarrés pour le scheduler
+
+Chaque worker est un processus Python qui a déjà importé scrapy, scrapy_playwright
+et les modules du projet, puis attend un job sur son stdin. Un worker n'exécute
+qu'un seul job (le reactor Twisted ne redémarre pas) : l'isolation par processus
+et le timeout par job sont conservés, seul le coût des imports sort du chemin critique.
+Le pool est réalimenté en tâche de fond après chaque remise de job.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import subprocess
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Ligne émise par le worker sur stdout quand les imports sont terminés
+READY_PREFIX = "WORKER_READY"
+
+SCRAPER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scraper'))
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class WarmWorker:
+    """Processus worker prêt (ou en cours de préchauffage)"""
+
+    def __init__(self, process: subprocess.Popen, spawned_at: float):
+        self.process = process
+        self.spawned_at = spawned_at
+        self.ready_at: Optional[float] = None
+
+    @property
+    def warmup_seconds(self) -> Optional[float]:
+        return None if self.ready_at is None else self.ready_at - self.spawned_at
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Lit la ligne READY émise par le worker (bloquant, borné par timeout)"""
+        result: Dict[str, Any] = {}
+
+        def _read():
+            result['line'] = self.process.stdout.readline()
+
+        reader = threading.Thread(target=_read, daemon=True)
+        reader.start()
+        reader.join(timeout)
+        line = result.get('line') or ''
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if line.startswith(READY_PREFIX):
+            self.ready_at = time.time()
+            return True
+        return False
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    @staticmethod
+    def job_payload(argv: List[str]) -> str:
+        """Message à écrire sur le stdin du worker pour lui remettre un job"""
+        return json.dumps({'argv': argv}) + "\n"
+
+
+class WorkerPool:
+    """
+    Pool de processus préchauffés
+
+    acquire() retourne un worker prêt s'il y en a un, sinon en démarre un à froid.
+    Les temps de préchauffage et d'attente sont exposés par stats().
+    """
+
+    def __init__(self, size: int = None, ready_timeout: float = None, popen_kwargs: Dict[str, Any] = None):
+        self.size = int(size if size is not None else os.getenv("WORKER_POOL_SIZE", "2"))
+        self.ready_timeout = float(ready_timeout if ready_timeout is not None
+                                   else os.getenv("WORKER_POOL_READY_TIMEOUT", "120"))
+        self.popen_kwargs = dict(popen_kwargs or {})
+        self._idle: deque = deque()
+        self._lock = threading.Lock()
+        self._spawning = 0
+        self._closed = False
+
+        # Mesures exposées (fenêtres glissantes)
+        self._warmups: deque = deque(maxlen=100)
+        self._acquire_waits: deque = deque(maxlen=100)
+        self.cold_starts = 0
+        self.warm_starts = 0
+
+    def _spawn(self) -> WarmWorker:
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(p for p in (PROJECT_ROOT, env.get('PYTHONPATH')) if p)
+        env.setdefault('SCRAPY_SETTINGS_MODULE', 'scraper.settings')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'orchestration.worker_pool', '--worker'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=SCRAPER_DIR,
+            env=env,
+            **self.popen_kwargs
+        )
+        return WarmWorker(process, time.time())
+
+    def _warm_one(self):
+        worker = None
+        try:
+            worker = self._spawn()
+            if worker.wait_ready(self.ready_timeout):
+                self._warmups.append(worker.warmup_seconds)
+                with self._lock:
+                    if not self._closed:
+                        self._idle.append(worker)
+                        worker = None
+            else:
+                logger.warning("Worker préchauffé non prêt dans le délai imparti, abandon")
+        except Exception as e:
+            logger.error(f"Erreur démarrage worker préchauffé: {e}")
+        finally:
+            with self._lock:
+                self._spawning -= 1
+            if worker is not None:
+                self._discard(worker)
+
+    def replenish(self):
+        """Démarre en tâche de fond les workers manquants"""
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.size - len(self._idle) - self._spawning
+            self._spawning += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self._warm_one, name="worker-warmup", daemon=True).start()
+
+    def acquire(self) -> WarmWorker:
+        """Retourne un worker prêt (préchauffé si possible, sinon démarré à froid)"""
+        start = time.time()
+        worker = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.popleft()
+                if candidate.alive():
+                    worker = candidate
+                    break
+                self._discard(candidate)
+
+        if worker is not None:
+            self.warm_starts += 1
+        else:
+            self.cold_starts += 1
+            worker = self._spawn()
+            if worker.wait_ready(self.ready_timeout):
+                self._warmups.append(worker.warmup_seconds)
+            else:
+                logger.warning("Worker démarré à froid sans signal READY, exécution quand même")
+
+        self._acquire_waits.append(time.time() - start)
+        self.replenish()
+        return worker
+
+    @staticmethod
+    def _discard(worker: WarmWorker):
+        try:
+            if worker.alive():
+                worker.process.kill()
+            worker.process.wait(timeout=5)
+        except Exception:
+            pass
+
+    def shutdown(self):
+        """Arrête les workers inactifs"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for worker in idle:
+            self._discard(worker)
+
+    def stats(self) -> Dict[str, Any]:
+        warmups = list(self._warmups)
+        waits = list(self._acquire_waits)
+        return {
+            'worker_pool_size': self.size,
+            'worker_pool_idle': len(self._idle),
+            'worker_pool_warm_starts': self.warm_starts,
+            'worker_pool_cold_starts': self.cold_starts,
+            'worker_warmup_avg_s': round(sum(warmups) / len(warmups), 3) if warmups else None,
+            'worker_acquire_avg_ms': round(1000 * sum(waits) / len(waits), 1) if waits else None,
+        }
+
+
+def _preload():
+    """Imports coûteux faits avant réception du job"""
+    import scrapy  # noqa: F401
+    from scrapy.utils.project import get_project_settings
+    from scrapy.utils.reactor import install_reactor
+
+    settings = get_project_settings()
+    reactor_path = settings.get('TWISTED_REACTOR')
+    if reactor_path:
+        install_reactor(reactor_path)
+
+    try:
+        import scrapy_playwright.handler  # noqa: F401
+    except ImportError:
+        pass
+
+    import scraper.pipelines  # noqa: F401
+    import scraper.middlewares  # noqa: F401
+    import scraper.extensions  # noqa: F401
+    import scraper.spiders.single_url  # noqa: F401
+
+
+def worker_main() -> int:
+    """Point d'entrée d'un worker : préchargement, READY, puis exécution d'un job"""
+    started = time.time()
+    _preload()
+    print(f"{READY_PREFIX} {time.time() - started:.3f}", flush=True)
+
+    line = sys.stdin.readline()
+    if not line:
+        return 0  # pool arrêté avant remise d'un job
+    job = json.loads(line)
+
+    from scrapy.cmdline import execute
+    try:
+        execute(job['argv'])
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+
+if __name__ == "__main__":
+    if '--worker' in sys.argv:
+        sys.exit(worker_main())
+    print("Usage: python -m orchestration.worker_pool --worker", file=sys.stderr)
+    sys.exit(2)
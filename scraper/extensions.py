@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Extensions Scrapy du projet
+
+RedisStatsBridge publie périodiquement les stats du crawler dans le hash Redis du job
+(scraper/utils/job_stats.py) : le scheduler et le dashboard lisent la progression live
+sans interroger la base ni attendre la fin du processus.
+"""
+
+import time
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+from scraper.utils.job_stats import start_run, publish
+
+logger = logging.getLogger(__name__)
+
+STATUS_PREFIX = "downloader/response_status_count/"
+
+
+class RedisStatsBridge:
+    """
+    Pousse pages/s, items/s, octets, codes HTTP et profondeur de file toutes les
+    STATS_BRIDGE_INTERVAL secondes, puis un état final à la fermeture du spider
+    """
+
+    def __init__(self, crawler, interval: float):
+        self.crawler = crawler
+        self.interval = interval
+        self.query_id = None
+        self.task = None
+        self.started_at = time.time()
+        self._last = {'time': self.started_at, 'pages': 0, 'items': 0, 'saved': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("STATS_BRIDGE_ENABLED", True):
+            raise NotConfigured
+        ext = cls(crawler, crawler.settings.getfloat("STATS_BRIDGE_INTERVAL", 5.0))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.query_id = getattr(spider, "query_id", None)
+        if self.query_id is None:
+            return
+        try:
+            start_run(self.query_id)
+        except Exception as e:
+            logger.warning(f"Stats live indisponibles pour le job {self.query_id}: {e}")
+            self.query_id = None
+            return
+        self.started_at = time.time()
+        self._last['time'] = self.started_at
+        self.task = task.LoopingCall(self.push)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        if self.query_id is not None:
+            self.push(final=True, reason=reason)
+
+    def _queue_depth(self):
+        try:
+            engine = self.crawler.engine
+        except Exception:
+            return None, None
+        try:
+            pending = len(engine.slot.scheduler)
+        except Exception:
+            pending = None
+        try:
+            inflight = len(engine.downloader.active)
+        except Exception:
+            inflight = None
+        return pending, inflight
+
+    def push(self, final: bool = False, reason: str = None):
+        stats = self.crawler.stats.get_stats()
+        now = time.time()
+        pages = int(stats.get('response_received_count', 0))
+        items = int(stats.get('item_scraped_count', 0))
+        saved = int(stats.get('contacts/saved', 0))
+        elapsed = max(now - self._last['time'], 1e-6)
+        queue_depth, inflight = self._queue_depth()
+
+        fields = {
+            'state': 'finished' if final else 'running',
+            'finish_reason': reason or '',
+            'started_at': round(self.started_at, 3),
+            'updated_at': round(now, 3),
+            'pages': pages,
+            'items': items,
+            'contacts_saved': saved,
+            'requests': int(stats.get('downloader/request_count', 0)),
+            'bytes': int(stats.get('downloader/response_bytes', 0)),
+            'errors': int(stats.get('log_count/ERROR', 0)),
+            'pages_per_sec': round((pages - self._last['pages']) / elapsed, 3),
+            'items_per_sec': round((items - self._last['items']) / elapsed, 3),
+            'queue_depth': queue_depth,
+            'inflight': inflight,
+        }
+        for key, value in stats.items():
+            if key.startswith(STATUS_PREFIX):
+                fields[f"status_{key[len(STATUS_PREFIX):]}"] = int(value)
+
+        try:
+            publish(self.query_id, fields, contacts_delta=saved - self._last['saved'])
+            self._last.update(time=now, pages=pages, items=items, saved=saved)
+        except Exception as e:
+            logger.debug(f"Publication des stats live du job {self.query_id} impossible: {e}")
@@ -13,3 +13,6 @@ class ContactItem(scrapy.Item):
     raw_text = scrapy.Field()
     query_id = scrapy.Field()
     seed_url = scrapy.Field()
+    confidence_score = scrapy.Field()
+    extraction_method = scrapy.Field()
+    created_at = scrapy.Field()
@@ -1,39 +1,99 @@
 # -*- coding: utf-8 -*-
+import time
 from typing import Optional
+from urllib.parse import urlparse, quote
+from scrapy import signals
+from scraper.utils.metrics import (PAGES_FETCHED, PAGE_FETCH_SECONDS, PROXY_FAILURES,
+                                   PROXY_SELECTION_SECONDS, timed)
 try:
-    from scraper.utils.proxy_selector import select_proxy, mark_proxy_result
+    from scraper.utils.proxy_selector import select_proxy, mark_proxy_result, prepare_job, release_job
+    from scraper.utils.proxy_failover import flush_state_sync
 except Exception:
-    def select_proxy(job_id: Optional[int] = None): return None
+    def select_proxy(job_id: Optional[int] = None, domain: Optional[str] = None): return None
     def mark_proxy_result(proxy_id: int, success: bool, error: Optional[str] = None): return None
+    def flush_state_sync(): return 0
+    def prepare_job(job_id: Optional[int] = None): return 0
+    def release_job(job_id: Optional[int] = None): return None
+
+# Statuts imputables au proxy (bannissement, auth proxy, rate limit). Un 5xx vient du
+# site cible: la réponse a bien transité par le proxy, elle ne compte pas contre lui
+PROXY_FAILURE_STATUSES = {403, 407, 429}
 
 class RotatingProxyMiddleware:
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls()
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_opened(self, spider):
+        # Filtres pays / tag du job résolus une seule fois
+        try:
+            size = prepare_job(getattr(spider, "query_id", None))
+            spider.logger.info(f"Segment proxy du job: {size} proxies")
+        except Exception: pass
+
+    def spider_closed(self, spider):
+        try: release_job(getattr(spider, "query_id", None))
+        except Exception: pass
+        # Écrire les derniers états du circuit breaker dans proxies avant la sortie
+        try: flush_state_sync()
+        except Exception: pass
+
     def process_request(self, request, spider):
+        request.meta.setdefault('__fetch_started', time.time())
         if request.meta.get("no_proxy"):
             return None
-        proxy = select_proxy(job_id=getattr(spider, "query_id", None))
+        with timed(PROXY_SELECTION_SECONDS):
+            proxy = select_proxy(job_id=getattr(spider, "query_id", None),
+                                 domain=urlparse(request.url).hostname)
         if not proxy:
             return None
         server = f"{proxy.get('scheme', 'http')}://{proxy['host']}:{proxy['port']}"
-        request.meta['proxy'] = server
+        auth = {}
+        if proxy.get('username'):
+            auth = {"username": proxy['username'], "password": proxy.get('password','')}
+            # HttpProxyMiddleware extrait les identifiants et pose Proxy-Authorization
+            request.meta['proxy'] = (f"{proxy.get('scheme', 'http')}://{quote(str(auth['username']), safe='')}:"
+                                     f"{quote(str(auth['password']), safe='')}@{proxy['host']}:{proxy['port']}")
+        else:
+            request.meta['proxy'] = server
         if request.meta.get('playwright'):
-            auth = {}
-            if proxy.get('username'):
-                auth = {"username": proxy['username'], "password": proxy.get('password','')}
             request.meta.setdefault('playwright_context_kwargs', {})
             request.meta['playwright_context_kwargs']['proxy'] = {"server": server, **auth}
+            if proxy.get('sticky'):
+                # Un contexte Playwright par proxy sticky: cookies, session TLS et
+                # connexions keep-alive conservés tant que l'affinité dure
+                request.meta.setdefault('playwright_context', f"sticky-proxy-{proxy['id']}")
         request.meta['__current_proxy_id'] = proxy['id']
+        request.meta['__current_proxy_host'] = proxy['host']
         return None
 
     def process_response(self, request, response, spider):
+        # download_latency (handler HTTP) sinon temps depuis l'entrée dans le middleware
+        latency = request.meta.get('download_latency')
+        if latency is None and request.meta.get('__fetch_started'):
+            latency = time.time() - request.meta['__fetch_started']
+        if latency is not None:
+            PAGE_FETCH_SECONDS.labels(renderer='playwright' if request.meta.get('playwright') else 'http').observe(latency)
+        PAGES_FETCHED.labels(status_class=f"{response.status // 100}xx").inc()
+
         pid = request.meta.get('__current_proxy_id')
         if pid is not None:
-            try: mark_proxy_result(pid, success=True)
+            success = response.status not in PROXY_FAILURE_STATUSES
+            if not success:
+                PROXY_FAILURES.labels(proxy_host=request.meta.get('__current_proxy_host', '')).inc()
+            try: mark_proxy_result(pid, success=success,
+                                   error=None if success else f"HTTP {response.status}")
             except Exception: pass
         return response
 
     def process_exception(self, request, exception, spider):
+        PAGES_FETCHED.labels(status_class='error').inc()
         pid = request.meta.get('__current_proxy_id')
         if pid is not None:
+            PROXY_FAILURES.labels(proxy_host=request.meta.get('__current_proxy_host', '')).inc()
             try: mark_proxy_result(pid, success=False, error=str(exception))
             except Exception: pass
         return None
@@ -8,6 +8,7 @@ Description: Pipeline PostgreSQL avec pool de connexions, gestion d'erreur robus
 
 import os
 import re
+import time
 import logging
 import psycopg2
 import psycopg2.pool
@@ -16,6 +17,8 @@ from contextlib import contextmanager
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from scraper.utils.metrics import SCRAPED_CONTACTS, PIPELINE_WRITE_SECONDS
+
 # Configuration logging
 logger = logging.getLogger(__name__)
 
@@ -326,8 +329,15 @@ class PostgresPipeline:
                     cleaned_item["url"] = None
             
             # Insertion en base avec gestion des doublons
-            if self._insert_contact(cleaned_item):
+            write_started = time.perf_counter()
+            saved = self._insert_contact(cleaned_item)
+            PIPELINE_WRITE_SECONDS.labels(outcome='saved' if saved else 'duplicate').observe(
+                time.perf_counter() - write_started)
+            if saved:
                 self.items_saved += 1
+                SCRAPED_CONTACTS.inc()
+                if getattr(spider, 'crawler', None) is not None:
+                    spider.crawler.stats.inc_value('contacts/saved')
                 logger.debug(f"Contact sauvegardé: {email}")
             else:
                 self.items_duplicates += 1
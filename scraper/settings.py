@@ -17,6 +17,13 @@ ITEM_PIPELINES = {
     "scraper.pipelines.PostgresPipeline": 300
 }
 
+# Stats live du job poussées dans Redis (hash job:<query_id>:stats)
+EXTENSIONS = {
+    "scraper.extensions.RedisStatsBridge": 500,
+}
+STATS_BRIDGE_ENABLED = os.getenv("STATS_BRIDGE_ENABLED", "true").lower() == "true"
+STATS_BRIDGE_INTERVAL = float(os.getenv("STATS_BRIDGE_INTERVAL", "5"))
+
 # Tunables from env
 CONCURRENT_REQUESTS = int(os.getenv("SCRAPY_CONCURRENT_REQUESTS", "8"))
 DOWNLOAD_DELAY = float(os.getenv("SCRAPY_DOWNLOAD_DELAY", "0.5"))
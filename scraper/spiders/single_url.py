@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import re
+import sys
 import json
+import time
 import logging
 from typing import List, Dict, Optional, Set, Any
 from urllib.parse import urljoin, urlparse, parse_qs
@@ -14,9 +17,21 @@ from scrapy.http import Response
 from scrapy.utils.project import get_project_settings
 from scrapy.exceptions import CloseSpider
 
+from scraper.utils.error_sink import ErrorSink
+from scraper.utils.checkpoint import CrawlCheckpointer, load_checkpoint_file, url_fingerprint
+from scraper.utils.metrics import EXTRACTION_SECONDS
+from scraper.utils.filters import page_lang_from_text
+from scraper.utils.phone_extractor import PhoneExtractor, nearest_by_offset
+from scraper.utils.email_decoder import collect_page_emails
+from scraper.utils.structured_data import extract_structured_contacts
+from scraper.items import ContactItem
+
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
+# Intervalle minimal entre deux lignes METRICS lues par le scheduler
+METRICS_INTERVAL_SECONDS = float(os.getenv("SPIDER_METRICS_INTERVAL_SECONDS", "5"))
+
 class SingleUrlSpider(scrapy.Spider):
     """
     Spider pour extraire les contacts depuis une URL unique avec mots-clés personnalisés
@@ -29,7 +44,8 @@ class SingleUrlSpider(scrapy.Spider):
     
     # Patterns de détection d'emails et téléphones
     EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-    PHONE_PATTERN = re.compile(r'(?:\+?[\d\s\-\(\)\.]{8,20})')
+    # Rayon (caractères) de recherche d'un téléphone autour d'un email
+    PHONE_EMAIL_RADIUS = 300
     
     # Mots de liaison à ignorer dans la recherche de noms
     STOP_WORDS = {
@@ -42,7 +58,7 @@ class SingleUrlSpider(scrapy.Spider):
     def __init__(self, url=None, query_id=None, custom_keywords=None, 
                  match_mode='any', min_matches=1, country_filter=None, 
                  lang_filter=None, use_js=False, max_pages_per_domain=25, 
-                 *args, **kwargs):
+                 checkpoint_file=None, *args, **kwargs):
         """
         Constructeur modifié pour accepter custom_keywords et match_mode
         
@@ -56,6 +72,7 @@ class SingleUrlSpider(scrapy.Spider):
             lang_filter: Filtre par langue
             use_js: Utiliser JavaScript pour le rendu
             max_pages_per_domain: Nombre max de pages par domaine
+            checkpoint_file: Checkpoint JSON d'une exécution précédente (reprise)
         """
         super().__init__(*args, **kwargs)
         
@@ -69,6 +86,7 @@ class SingleUrlSpider(scrapy.Spider):
         # Configuration des paramètres de scraping
         self.query_id = int(query_id) if query_id else None
         self.country_filter = country_filter
+        self.phone_extractor = PhoneExtractor(country_filter)
         self.lang_filter = lang_filter
         self.use_js = use_js == 'True' or use_js is True
         self.max_pages_per_domain = int(max_pages_per_domain)
@@ -86,7 +104,26 @@ class SingleUrlSpider(scrapy.Spider):
         # Statistiques et état
         self.pages_crawled = 0
         self.contacts_found = 0
-        self.visited_urls = set()
+        # Empreintes des URLs déjà planifiées, et URLs planifiées non encore traitées
+        self.visited_hashes: Set[str] = set()
+        self.frontier: Dict[str, None] = {}
+        
+        # Collecte des erreurs (insertion par lots dans error_events)
+        self.error_sink = ErrorSink(source='scraper', job_id=self.query_id)
+        
+        # Checkpoint périodique dans queue.checkpoint_data, reprise au retry
+        self.checkpointer = CrawlCheckpointer(self.query_id)
+        self._metrics_emitted_at = 0.0
+        self.resumed_frontier: List[str] = []
+        checkpoint = load_checkpoint_file(checkpoint_file)
+        if checkpoint:
+            counters = checkpoint.get('counters', {})
+            self.pages_crawled = int(counters.get('pages_crawled', 0))
+            self.contacts_found = int(counters.get('contacts_found', 0))
+            self.visited_hashes.update(checkpoint.get('visited', []))
+            self.resumed_frontier = list(checkpoint.get('frontier', []))
+            logger.info(f"Reprise depuis checkpoint: {self.pages_crawled} pages déjà faites, "
+                        f"{len(self.resumed_frontier)} URL(s) en attente")
         
         logger.info(f"Spider initialisé:")
         logger.info(f"  - URL: {url}")
@@ -189,8 +226,22 @@ class SingleUrlSpider(scrapy.Spider):
         }
 
     def start_requests(self):
-        """Génère les requêtes initiales"""
+        """Génère les requêtes initiales (ou la frontière du checkpoint en reprise)"""
+        if self.resumed_frontier:
+            for url in self.resumed_frontier:
+                self.frontier[url] = None
+                yield Request(
+                    url=url,
+                    callback=self.parse,
+                    errback=self.handle_error,
+                    meta={'dont_cache': True, 'checkpoint_url': url,
+                          'is_start_url': url in self.start_urls}
+                )
+            return
+        
         for url in self.start_urls:
+            self.visited_hashes.add(url_fingerprint(url))
+            self.frontier[url] = None
             yield Request(
                 url=url,
                 callback=self.parse,
@@ -198,16 +249,51 @@ class SingleUrlSpider(scrapy.Spider):
                 meta={
                     'dont_cache': True,
                     'download_timeout': 30,
-                    'is_start_url': True
+                    'is_start_url': True,
+                    'checkpoint_url': url
                 }
             )
 
+    def _emit_metrics(self, force: bool = False):
+        """Ligne METRICS {json} sur stdout, parsée en direct par le scheduler"""
+        now = time.monotonic()
+        if not force and now - self._metrics_emitted_at < METRICS_INTERVAL_SECONDS:
+            return
+        self._metrics_emitted_at = now
+        metrics = {
+            'pages_crawled': self.pages_crawled,
+            'contacts_found': self.contacts_found,
+            'frontier': len(self.frontier),
+            'visited': len(self.visited_hashes),
+            'errors': self.error_sink.recorded,
+            'error_categories': dict(self.error_sink.by_category),
+        }
+        sys.stdout.write(f"METRICS {json.dumps(metrics)}\n")
+        sys.stdout.flush()
+
+    def _checkpoint(self, force: bool = False):
+        """Sauvegarde l'état du crawl si l'intervalle est atteint"""
+        self.checkpointer.save(
+            frontier=self.frontier.keys(),
+            visited=self.visited_hashes,
+            counters={'pages_crawled': self.pages_crawled, 'contacts_found': self.contacts_found},
+            force=force
+        )
+
     def parse(self, response: Response):
         """
         Parse principal - extrait contacts et suit les liens
         """
+        self.frontier.pop(response.meta.get('checkpoint_url'), None)
+        
         if response.status != 200:
             logger.warning(f"Status {response.status} pour {response.url}")
+            self.error_sink.record(
+                status_code=response.status,
+                message=f"Status {response.status}",
+                url=response.url,
+                proxy_id=response.request.meta.get('__current_proxy_id') if response.request else None
+            )
             return
         
         self.pages_crawled += 1
@@ -215,6 +301,8 @@ class SingleUrlSpider(scrapy.Spider):
         
         logger.info(f"Parsing page {self.pages_crawled}/{self.max_pages_per_domain}: {current_url}")
         
+        extraction_started = time.perf_counter()
+
         # Extraire le contenu textuel de la page
         page_text = self._extract_page_text(response)
         
@@ -226,9 +314,11 @@ class SingleUrlSpider(scrapy.Spider):
             
             # Extraire les contacts de cette page
             contacts = self._extract_contacts_from_page(response, page_text, keyword_analysis)
+            EXTRACTION_SECONDS.observe(time.perf_counter() - extraction_started)
             for contact in contacts:
                 yield contact
         else:
+            EXTRACTION_SECONDS.observe(time.perf_counter() - extraction_started)
             logger.debug(f"Page ne correspond pas aux critères - "
                         f"Mots-clés trouvés: {keyword_analysis['found_keywords']}")
         
@@ -237,6 +327,9 @@ class SingleUrlSpider(scrapy.Spider):
             yield from self._follow_links(response)
         else:
             logger.info(f"Limite de pages atteinte: {self.max_pages_per_domain}")
+        
+        self._checkpoint()
+        self._emit_metrics()
 
     def _extract_page_text(self, response: Response) -> str:
         """
@@ -277,13 +370,31 @@ class SingleUrlSpider(scrapy.Spider):
         contacts = []
         
         try:
-            # Extraire emails
-            emails = set(self.EMAIL_PATTERN.findall(page_text))
+            page_html = self._response_html(response)
+            
+            # Extraire emails: texte visible, [at]/(dot), mailto, entités, Cloudflare
+            # (première position dans le texte, None si absent du texte visible)
+            emails = collect_page_emails(page_text, page_html, self.EMAIL_PATTERN)
+            
+            # Données structurées (JSON-LD, microdata, hCard): prioritaires sur l'heuristique
+            # pour les emails qu'elles décrivent; les autres emails suivent le chemin normal
+            structured = extract_structured_contacts(response, page_html, self.phone_extractor.normalize)
             
-            # Extraire téléphones (simple)
-            phones = set(self._clean_phone_numbers(
-                self.PHONE_PATTERN.findall(page_text)
-            ))
+            # Langue de la page: une détection pour tous les emails de la page
+            page_lang = self._detect_language(page_text) if emails or structured else None
+            
+            if structured:
+                contacts.extend(self._structured_contacts(response, page_text, structured, page_lang))
+                covered = {found['email'].lower() for found in structured}
+                emails = {email: position for email, position in emails.items()
+                          if email.lower() not in covered}
+            
+            # Téléphones E.164 avec position, associés aux emails par fusion des positions
+            phones = self.phone_extractor.extract(page_text) if emails else []
+            nearby_phones = nearest_by_offset(
+                sorted((position, email) for email, position in emails.items() if position is not None),
+                phones, self.PHONE_EMAIL_RADIUS
+            ) if phones else {}
             
             # Chercher des noms/organisations près des emails
             for email in emails:
@@ -292,7 +403,7 @@ class SingleUrlSpider(scrapy.Spider):
                     'url': response.url,
                     'query_id': self.query_id,
                     'seed_url': self.start_urls[0],
-                    'page_lang': self._detect_language(page_text),
+                    'page_lang': page_lang,
                     'raw_text': page_text[:1000],  # Échantillon du texte
                     'extraction_method': 'scrapy',
                     'confidence_score': self._calculate_confidence_score(
@@ -310,7 +421,7 @@ class SingleUrlSpider(scrapy.Spider):
                     contact_data['org'] = org
                 
                 # Ajouter téléphone si trouvé dans la proximité
-                nearby_phone = self._find_phone_near_email(email, page_text, phones)
+                nearby_phone = nearby_phones.get(email)
                 if nearby_phone:
                     contact_data['phone'] = nearby_phone
                 
@@ -328,6 +439,45 @@ class SingleUrlSpider(scrapy.Spider):
         
         return contacts
 
+    def _structured_contacts(self, response: Response, page_text: str,
+                             structured: List[Dict], page_lang: Optional[str]) -> List[ContactItem]:
+        """
+        Contacts issus des données structurées (confiance maximale)
+        """
+        contacts = []
+        for found in structured:
+            item = ContactItem(
+                email=found['email'],
+                url=response.url,
+                query_id=self.query_id,
+                seed_url=self.start_urls[0],
+                page_lang=page_lang,
+                raw_text=page_text[:1000],
+                extraction_method='structured_data',
+                confidence_score=1.0,
+                source='scraper',
+                created_at=datetime.now().isoformat(),
+            )
+            for field in ('name', 'org', 'phone'):
+                if found.get(field):
+                    item[field] = found[field]
+            if self.country_filter:
+                item['country'] = self.country_filter
+            
+            contacts.append(item)
+            self.contacts_found += 1
+            logger.info(f"Contact extrait (données structurées): {found['email']} - {found.get('name') or 'Sans nom'}")
+        return contacts
+
+    def _response_html(self, response: Response) -> str:
+        """
+        HTML brut de la réponse ('' pour les réponses non textuelles)
+        """
+        try:
+            return response.text
+        except AttributeError:
+            return ''
+
     def _calculate_confidence_score(self, email: str, page_text: str, 
                                   keyword_analysis: Dict) -> float:
         """
@@ -416,65 +566,11 @@ class SingleUrlSpider(scrapy.Spider):
         
         return True
 
-    def _clean_phone_numbers(self, raw_phones: List[str]) -> List[str]:
-        """
-        Nettoie et valide les numéros de téléphone
-        """
-        cleaned = []
-        for phone in raw_phones:
-            # Garder seulement les chiffres et quelques caractères
-            clean = re.sub(r'[^\d\+\-\(\)\s\.]', '', phone)
-            # Compter les chiffres
-            digit_count = len(re.findall(r'\d', clean))
-            # Valider longueur raisonnable
-            if 8 <= digit_count <= 15:
-                cleaned.append(clean.strip())
-        return cleaned
-
-    def _find_phone_near_email(self, email: str, text: str, phones: Set[str]) -> Optional[str]:
-        """
-        Cherche un téléphone proche d'un email
-        """
-        email_pos = text.lower().find(email.lower())
-        if email_pos == -1 or not phones:
-            return None
-        
-        # Chercher dans un rayon de 300 caractères
-        start = max(0, email_pos - 300)
-        end = min(len(text), email_pos + 300)
-        context = text[start:end]
-        
-        for phone in phones:
-            if phone in context:
-                return phone
-        
-        return None
-
     def _detect_language(self, text: str) -> Optional[str]:
         """
-        Détection simple de langue basée sur des mots communs
+        Détection de langue partagée avec filters (scraper/utils/lang_detect.py)
         """
-        if not text:
-            return None
-        
-        text_lower = text.lower()
-        
-        # Mots indicateurs par langue
-        lang_indicators = {
-            'fr': ['le', 'la', 'les', 'et', 'ou', 'avec', 'dans', 'pour'],
-            'en': ['the', 'and', 'or', 'with', 'in', 'for', 'this', 'that'],
-            'es': ['el', 'la', 'los', 'las', 'y', 'o', 'con', 'en'],
-            'de': ['der', 'die', 'das', 'und', 'oder', 'mit', 'in', 'für']
-        }
-        
-        scores = {}
-        for lang, words in lang_indicators.items():
-            scores[lang] = sum(1 for word in words if f' {word} ' in text_lower)
-        
-        if max(scores.values()) > 0:
-            return max(scores, key=scores.get)
-        
-        return None
+        return page_lang_from_text(text)
 
     def _follow_links(self, response: Response):
         """
@@ -506,17 +602,20 @@ class SingleUrlSpider(scrapy.Spider):
                 absolute_url = urljoin(response.url, url)
                 
                 # Filtres pour les liens
-                if (self._should_follow_link(absolute_url) and 
-                    absolute_url not in self.visited_urls):
+                if not self._should_follow_link(absolute_url):
+                    continue
+                fingerprint = url_fingerprint(absolute_url)
+                if fingerprint not in self.visited_hashes:
                     
-                    self.visited_urls.add(absolute_url)
+                    self.visited_hashes.add(fingerprint)
+                    self.frontier[absolute_url] = None
                     links_found += 1
                     
                     yield Request(
                         url=absolute_url,
                         callback=self.parse,
                         errback=self.handle_error,
-                        meta={'dont_cache': True}
+                        meta={'dont_cache': True, 'checkpoint_url': absolute_url}
                     )
 
     def _should_follow_link(self, url: str) -> bool:
@@ -550,15 +649,36 @@ class SingleUrlSpider(scrapy.Spider):
         Gestion des erreurs de requête
         """
         logger.error(f"Erreur requête {failure.request.url}: {failure.value}")
+        self.frontier.pop(failure.request.meta.get('checkpoint_url'), None)
+        
+        # Les réponses HTTP en erreur arrivent ici sous forme de HttpError
+        response = getattr(failure.value, 'response', None)
+        status_code = response.status if response is not None else None
+        
+        self.error_sink.record(
+            error=failure.value,
+            status_code=status_code,
+            url=failure.request.url,
+            proxy_id=failure.request.meta.get('__current_proxy_id'),
+            details={'error_type': failure.type.__name__ if failure.type else None}
+        )
+        self._emit_metrics()
 
     def closed(self, reason):
         """
         Appelé à la fermeture du spider
         """
         logger.info(f"Spider fermé: {reason}")
+        self.error_sink.close()
+        if reason == 'finished':
+            self.checkpointer.complete()
+        else:
+            # Arrêt anticipé (SIGTERM, timeout, CloseSpider): garder de quoi reprendre
+            self._checkpoint(force=True)
+        self._emit_metrics(force=True)
         logger.info(f"Statistiques finales:")
         logger.info(f"  - Pages visitées: {self.pages_crawled}")
         logger.info(f"  - Contacts trouvés: {self.contacts_found}")
-        logger.info(f"  - URLs visitées: {len(self.visited_urls)}")
+        logger.info(f"  - URLs visitées: {len(self.visited_hashes)}")
         logger.info(f"  - Mots-clés utilisés: {len(self.custom_keywords)}")
         logger.info(f"  - Mode correspondance: {self.match_mode}")
\ No newline at end of file
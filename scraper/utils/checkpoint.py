@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CHECKPOINT.PY - Reprise des crawls interrompus
+Description: Sauvegarde périodiquement dans queue.checkpoint_data la frontière du
+crawl (URLs en attente), l'ensemble des URLs visitées sous forme d'empreintes
+courtes et les compteurs du spider. Au retry, le scheduler repasse ce checkpoint
+au spider qui reprend là où il s'était arrêté.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Optional, Dict, Any, Iterable
+
+import psycopg2
+from psycopg2.extras import Json
+
+from .url_normalizer import normalize
+
+# Configuration logging
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "db"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD"),
+    'connect_timeout': int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "30")),
+    'application_name': 'checkpoint'
+}
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_INTERVAL_PAGES = int(os.getenv("CHECKPOINT_INTERVAL_PAGES", "10"))
+CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "60"))
+
+# Nom de la phase du spider single_url dans queue.phase_status
+CRAWL_PHASE = "crawl"
+
+def url_fingerprint(url: str) -> str:
+    """Empreinte de 64 bits (16 hex) de l'URL normalisée"""
+    return hashlib.sha1(normalize(url).encode('utf-8', errors='ignore')).hexdigest()[:16]
+
+def load_checkpoint_file(path: Optional[str]) -> Dict[str, Any]:
+    """Lit le checkpoint transmis par le scheduler (fichier JSON)"""
+    if not path:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != CHECKPOINT_VERSION:
+            logger.warning(f"Checkpoint ignoré (format inattendu): {path}")
+            return {}
+        return data
+    except Exception as e:
+        logger.warning(f"Lecture du checkpoint {path} impossible: {e}")
+        return {}
+
+def has_checkpoint(data: Any) -> bool:
+    """Vrai si checkpoint_data contient une frontière exploitable"""
+    return isinstance(data, dict) and data.get('version') == CHECKPOINT_VERSION and bool(data.get('frontier'))
+
+class CrawlCheckpointer:
+    """
+    Écrit l'état du crawl d'un job dans queue.checkpoint_data
+
+    save() ne fait rien tant que ni l'intervalle en pages ni l'intervalle en secondes
+    n'est atteint; force=True écrit immédiatement (fermeture du spider).
+    """
+
+    def __init__(self, job_id: Optional[int], interval_pages: int = CHECKPOINT_INTERVAL_PAGES,
+                 interval_seconds: float = CHECKPOINT_INTERVAL_SECONDS, enabled: bool = CHECKPOINT_ENABLED):
+        self.job_id = job_id
+        self.enabled = enabled and job_id is not None
+        self.interval_pages = max(1, int(interval_pages))
+        self.interval_seconds = float(interval_seconds)
+        self._last_pages = 0
+        self._last_save = time.monotonic()
+        self.saves = 0
+
+    def due(self, pages_crawled: int) -> bool:
+        return (pages_crawled - self._last_pages >= self.interval_pages or
+                time.monotonic() - self._last_save >= self.interval_seconds)
+
+    def save(self, frontier: Iterable[str], visited: Iterable[str], counters: Dict[str, int],
+             force: bool = False) -> bool:
+        if not self.enabled:
+            return False
+        pages = int(counters.get('pages_crawled', 0))
+        if not force and not self.due(pages):
+            return False
+
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'frontier': list(frontier),
+            'visited': sorted(visited),
+            'counters': counters,
+            'saved_at': time.time(),
+        }
+        ok = self._write(Json(data), 'in_progress')
+        if ok:
+            self._last_pages = pages
+            self._last_save = time.monotonic()
+            self.saves += 1
+            logger.debug(f"Checkpoint job {self.job_id}: {len(data['frontier'])} URL(s) en attente, "
+                         f"{len(data['visited'])} visitée(s)")
+        return ok
+
+    def complete(self) -> bool:
+        """Crawl terminé: vide le checkpoint pour qu'un relancement reparte de zéro"""
+        if not self.enabled:
+            return False
+        return self._write(Json({}), 'done')
+
+    def _write(self, checkpoint, phase_state: str) -> bool:
+        conn = None
+        try:
+            if not DB_CONFIG['password']:
+                return False
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE queue SET
+                        checkpoint_data = %s,
+                        phase_status = COALESCE(phase_status, '{}'::jsonb) || jsonb_build_object(%s, %s),
+                        updated_at = NOW()
+                    WHERE id = %s
+                """, (checkpoint, CRAWL_PHASE, phase_state, self.job_id))
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Écriture du checkpoint du job {self.job_id} impossible: {e}")
+            return False
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
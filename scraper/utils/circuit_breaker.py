@@ -1,16 +1,249 @@
 
+import os
 import time
-from typing import Optional
+import logging
+import threading
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from .redis_coordination import get_redis_client, _ns
 
-def is_open(key: str) -> bool:
-    r = get_redis_client()
-    return r.ttl(_ns(f"cb:{key}:open")) > 0
+logger = logging.getLogger(__name__)
+
+# Machine à états closed -> open -> half_open -> closed, stockée dans un hash Redis
+# cb:{key} (state, failures, open_until, probes, probe_deadline, successes, last_failure).
+# Chaque transition est un script Lua unique: lecture + écriture atomiques en un aller-retour.
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+DEFAULT_COOLDOWN_SECONDS = int(os.getenv("CIRCUIT_BREAKER_COOLDOWN_SECONDS", "600"))
+DEFAULT_PROBE_BUDGET = int(os.getenv("CIRCUIT_BREAKER_PROBE_BUDGET", "1"))
+DEFAULT_SUCCESS_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_SUCCESS_THRESHOLD", "2"))
+# Délai au-delà duquel une sonde sans résultat (requête perdue, process tué) est
+# considérée comme abandonnée: le budget de sondes est alors rendu
+DEFAULT_PROBE_TIMEOUT_SECONDS = int(os.getenv("CIRCUIT_BREAKER_PROBE_TIMEOUT_SECONDS", "120"))
+LOCAL_CACHE_MS = int(os.getenv("CIRCUIT_BREAKER_LOCAL_CACHE_MS", "300"))
+STATE_TTL_SECONDS = int(os.getenv("CIRCUIT_BREAKER_STATE_TTL", "86400"))
+
+# KEYS[1]=hash ; ARGV: now_ms, probe_budget, ttl, probe_timeout_ms
+# Retour: {allowed, state, open_until, changed}
+_ALLOW_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local now = tonumber(ARGV[1])
+if state == 'closed' then
+  return {1, 'closed', 0, 0}
+end
+if state == 'open' then
+  local open_until = tonumber(redis.call('HGET', KEYS[1], 'open_until') or '0')
+  if now < open_until then
+    return {0, 'open', open_until, 0}
+  end
+  redis.call('HSET', KEYS[1], 'state', 'half_open', 'probes', 1, 'successes', 0,
+             'probe_deadline', now + tonumber(ARGV[4]))
+  redis.call('EXPIRE', KEYS[1], ARGV[3])
+  return {1, 'half_open', 0, 1}
+end
+local probes = tonumber(redis.call('HGET', KEYS[1], 'probes') or '0')
+local deadline = tonumber(redis.call('HGET', KEYS[1], 'probe_deadline') or '0')
+if probes >= tonumber(ARGV[2]) and now >= deadline then
+  -- Sondes jamais rapportées: budget rendu
+  probes = 0
+end
+if probes < tonumber(ARGV[2]) then
+  redis.call('HSET', KEYS[1], 'probes', probes + 1, 'probe_deadline', now + tonumber(ARGV[4]))
+  return {1, 'half_open', 0, 0}
+end
+return {0, 'half_open', 0, 0}
+"""
+
+# KEYS[1]=hash ; ARGV: now_ms, failure_threshold, cooldown_ms, ttl
+# Retour: {state, failures, open_until, changed}
+_FAILURE_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local now = tonumber(ARGV[1])
+local open_until = now + tonumber(ARGV[3])
+redis.call('HSET', KEYS[1], 'last_failure', now)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+if state == 'open' then
+  local failures = tonumber(redis.call('HGET', KEYS[1], 'failures') or '0')
+  return {'open', failures, tonumber(redis.call('HGET', KEYS[1], 'open_until') or '0'), 0}
+end
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if state == 'half_open' or failures >= tonumber(ARGV[2]) then
+  redis.call('HSET', KEYS[1], 'state', 'open', 'open_until', open_until, 'probes', 0, 'successes', 0)
+  return {'open', failures, open_until, 1}
+end
+redis.call('HSET', KEYS[1], 'state', 'closed')
+return {'closed', failures, 0, 0}
+"""
+
+# KEYS[1]=hash ; ARGV: success_threshold
+# Retour: {state, changed}
+_SUCCESS_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'half_open' then
+  local successes = redis.call('HINCRBY', KEYS[1], 'successes', 1)
+  if successes >= tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[1])
+    return {'closed', 1}
+  end
+  redis.call('HINCRBY', KEYS[1], 'probes', -1)
+  return {'half_open', 0}
+end
+if state == 'closed' and redis.call('EXISTS', KEYS[1]) == 1 then
+  redis.call('HSET', KEYS[1], 'failures', 0)
+end
+return {state, 0}
+"""
+
+# KEYS[1]=hash ; ARGV: now_ms, cooldown_ms, ttl
+_FORCE_OPEN_LUA = """
+local previous = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local open_until = tonumber(ARGV[1]) + tonumber(ARGV[2])
+redis.call('HSET', KEYS[1], 'state', 'open', 'open_until', open_until, 'probes', 0, 'successes', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if previous == 'open' then
+  return {'open', open_until, 0}
+end
+return {'open', open_until, 1}
+"""
+
+_client = None
+_scripts: Dict[str, Any] = {}
+_client_lock = threading.Lock()
+
+# Cache local: key -> (expire_monotonic, state, open_until_ms)
+_local_cache: Dict[str, Tuple[float, str, float]] = {}
+
+# Clés fermées sans échec en attente de remise à zéro (dans ce process)
+_clean_keys: set = set()
+
+# Callbacks appelés à chaque transition: fn(key, state, info)
+_listeners: List[Callable[[str, str, Dict[str, Any]], None]] = []
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+def _state_key(key: str) -> str:
+    return _ns(f"cb:{key}")
+
+def _script(name: str):
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = get_redis_client()
+            _scripts['allow'] = _client.register_script(_ALLOW_LUA)
+            _scripts['failure'] = _client.register_script(_FAILURE_LUA)
+            _scripts['success'] = _client.register_script(_SUCCESS_LUA)
+            _scripts['force_open'] = _client.register_script(_FORCE_OPEN_LUA)
+        return _scripts[name]
+
+def _as_str(v) -> str:
+    return v.decode() if isinstance(v, bytes) else str(v)
+
+def _cache(key: str, state: str, open_until: float = 0.0):
+    _local_cache[key] = (time.monotonic() + LOCAL_CACHE_MS / 1000.0, state, float(open_until or 0))
+
+def _cached(key: str) -> Optional[Tuple[str, float]]:
+    entry = _local_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1], entry[2]
+    return None
+
+def _notify(key: str, state: str, info: Dict[str, Any]):
+    for listener in list(_listeners):
+        try:
+            listener(key, state, info)
+        except Exception as e:
+            logger.debug(f"Listener circuit breaker en erreur pour {key}: {e}")
+
+def register_listener(fn: Callable[[str, str, Dict[str, Any]], None]):
+    """Enregistre un callback appelé à chaque transition d'état"""
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+def allow(key: str, probe_budget: int = DEFAULT_PROBE_BUDGET,
+          probe_timeout_seconds: int = DEFAULT_PROBE_TIMEOUT_SECONDS) -> bool:
+    """
+    Demande l'autorisation d'envoyer une requête
+
+    closed -> autorisé ; open -> refusé jusqu'à la fin du cooldown puis passage
+    en half_open ; half_open -> autorisé tant que le budget de sondes n'est pas épuisé,
+    ou que la dernière sonde est restée sans résultat plus de probe_timeout_seconds.
+    """
+    cached = _cached(key)
+    if cached:
+        state, open_until = cached
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_OPEN and _now_ms() < open_until:
+            return False
+
+    allowed, state, open_until, changed = _script('allow')(
+        keys=[_state_key(key)], args=[_now_ms(), max(1, probe_budget), STATE_TTL_SECONDS,
+                                      max(1, probe_timeout_seconds) * 1000]
+    )
+    state = _as_str(state)
+    _cache(key, state, float(open_until))
+    if int(changed):
+        _notify(key, state, {})
+    return bool(int(allowed))
+
+def record_failure(key: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                   cooldown_seconds: int = DEFAULT_COOLDOWN_SECONDS) -> str:
+    """Enregistre un échec et retourne le nouvel état"""
+    now = _now_ms()
+    _clean_keys.discard(key)
+    state, failures, open_until, changed = _script('failure')(
+        keys=[_state_key(key)],
+        args=[now, max(1, failure_threshold), cooldown_seconds * 1000, STATE_TTL_SECONDS]
+    )
+    state = _as_str(state)
+    _cache(key, state, float(open_until))
+    _notify(key, state, {'failures': int(failures), 'last_failure_ms': now,
+                         'open_until_ms': float(open_until), 'changed': bool(int(changed))})
+    return state
+
+def record_success(key: str, success_threshold: int = DEFAULT_SUCCESS_THRESHOLD) -> str:
+    """Enregistre un succès et retourne le nouvel état"""
+    cached = _cached(key)
+    if cached and cached[0] == STATE_CLOSED and key in _clean_keys:
+        # Rien à remettre à zéro: évite un aller-retour Redis par réponse
+        return STATE_CLOSED
+
+    state, changed = _script('success')(keys=[_state_key(key)], args=[max(1, success_threshold)])
+    state = _as_str(state)
+    _cache(key, state)
+    if state == STATE_CLOSED:
+        _clean_keys.add(key)
+    if int(changed) or state == STATE_CLOSED:
+        _notify(key, state, {'failures': 0})
+    return state
 
 def open_cb(key: str, cooldown_seconds: int):
-    r = get_redis_client()
-    r.set(_ns(f"cb:{key}:open"), "1", ex=cooldown_seconds)
+    """Force l'ouverture du circuit pour cooldown_seconds"""
+    state, open_until, changed = _script('force_open')(
+        keys=[_state_key(key)], args=[_now_ms(), cooldown_seconds * 1000, STATE_TTL_SECONDS]
+    )
+    _clean_keys.discard(key)
+    _cache(key, STATE_OPEN, float(open_until))
+    if int(changed):
+        _notify(key, STATE_OPEN, {'open_until_ms': float(open_until)})
+
+def get_state(key: str) -> Dict[str, Any]:
+    """Lecture de l'état (cache local de quelques centaines de ms)"""
+    cached = _cached(key)
+    if cached:
+        return {'state': cached[0], 'open_until_ms': cached[1]}
+    r = get_redis_client() if _client is None else _client
+    raw = r.hmget(_state_key(key), 'state', 'open_until')
+    state = _as_str(raw[0]) if raw[0] else STATE_CLOSED
+    open_until = float(raw[1]) if raw[1] else 0.0
+    _cache(key, state, open_until)
+    return {'state': state, 'open_until_ms': open_until}
 
-def record_failure(key: str, failures: int, max_failures: int, cooldown_seconds: int):
-    if failures >= max_failures:
-        open_cb(key, cooldown_seconds)
+def is_open(key: str) -> bool:
+    """Vrai si le circuit refuse actuellement tout trafic (lecture seule, ne consomme pas de sonde)"""
+    info = get_state(key)
+    return info['state'] == STATE_OPEN and _now_ms() < info['open_until_ms']
@@ -1,5 +1,6 @@
 
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any
 
@@ -9,8 +10,13 @@ def load_rules(path: str = "config/error_rules.json") -> Dict[str, Any]:
         return {}
     return json.loads(p.read_text(encoding="utf-8"))
 
+@lru_cache(maxsize=8)
+def _cached_rules(path: str = "config/error_rules.json") -> Dict[str, Any]:
+    # categorize() est appelé à chaque erreur: ne pas relire le fichier à chaque fois
+    return load_rules(path)
+
 def categorize(error: Exception=None, status_code: int=None, message: str="") -> str:
-    rules = load_rules()
+    rules = _cached_rules()
     if status_code:
         if 500 <= status_code < 600:
             return "http_5xx"
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ERROR_SINK.PY - Collecte des erreurs de scraping
+Description: Catégorise les erreurs via error_categorizer, les bufferise et les
+insère par lots dans error_events. Maintient en parallèle des agrégats par minute
+dans Redis pour que le dashboard puisse tracer les taux d'erreur sans scanner la table.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+import psycopg2
+from psycopg2.extras import execute_values, Json
+
+from .error_categorizer import categorize
+from .redis_coordination import get_redis_client, _ns
+
+# Configuration logging
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "db"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD"),
+    'connect_timeout': int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "30")),
+    'application_name': 'error_sink'
+}
+
+# Paramètres de buffering et de rétention des agrégats
+ERROR_BATCH_SIZE = int(os.getenv("ERROR_SINK_BATCH_SIZE", "50"))
+ERROR_FLUSH_INTERVAL = float(os.getenv("ERROR_SINK_FLUSH_SECONDS", "10"))
+ERROR_AGG_RETENTION_MINUTES = int(os.getenv("ERROR_AGG_RETENTION_MINUTES", "1440"))
+
+# Longueur max d'un message stocké (les tracebacks Twisted peuvent être énormes)
+MAX_MESSAGE_LENGTH = 1000
+
+def _minute_bucket(ts: Optional[float] = None) -> int:
+    """Retourne le timestamp (secondes) tronqué à la minute"""
+    ts = time.time() if ts is None else ts
+    return int(ts // 60) * 60
+
+def _agg_key(bucket: int) -> str:
+    return _ns(f"errors:minute:{bucket}")
+
+class ErrorSink:
+    """
+    Buffer d'erreurs avec insertion par lots dans error_events
+
+    Chaque appel à record() catégorise l'erreur, incrémente l'agrégat Redis de la
+    minute courante (un seul aller-retour via pipeline) et ajoute la ligne au buffer.
+    Le buffer est vidé dès qu'il atteint batch_size ou que flush_interval est écoulé.
+    """
+
+    def __init__(self, source: str = "scraper", job_id: Optional[int] = None,
+                 batch_size: int = ERROR_BATCH_SIZE, flush_interval: float = ERROR_FLUSH_INTERVAL):
+        self.source = source
+        self.job_id = job_id
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self._buffer: List[tuple] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.recorded = 0
+        # Erreurs par catégorie (lignes METRICS du spider, catégorie d'un job échoué)
+        self.by_category: Dict[str, int] = {}
+        self.flushed = 0
+        self.dropped = 0
+
+    def record(self, error: Exception = None, status_code: Optional[int] = None, message: str = "",
+               url: Optional[str] = None, proxy_id: Optional[int] = None,
+               details: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Enregistre une erreur et retourne sa catégorie
+
+        Args:
+            error: Exception d'origine (optionnelle)
+            status_code: Code HTTP si l'erreur provient d'une réponse
+            message: Message libre complémentaire
+            url: URL concernée
+            proxy_id: ID du proxy utilisé pour la requête
+            details: Données additionnelles stockées en JSONB
+        """
+        category = categorize(error=error, status_code=status_code, message=message or "")
+
+        full_message = message or (f"{type(error).__name__}: {error}" if error else "")
+        payload = dict(details or {})
+        if self.job_id is not None:
+            payload.setdefault('job_id', self.job_id)
+        if error is not None:
+            payload.setdefault('exception', type(error).__name__)
+
+        row = (
+            self.source,
+            category,
+            full_message[:MAX_MESSAGE_LENGTH],
+            Json(payload),
+            proxy_id,
+            url[:2000] if url else None,
+            status_code,
+            datetime.now()
+        )
+
+        self._increment_aggregates(category)
+
+        with self._lock:
+            self._buffer.append(row)
+            self.recorded += 1
+            self.by_category[category] = self.by_category.get(category, 0) + 1
+            should_flush = (len(self._buffer) >= self.batch_size or
+                            time.monotonic() - self._last_flush >= self.flush_interval)
+
+        if should_flush:
+            self.flush()
+
+        return category
+
+    def _increment_aggregates(self, category: str):
+        """Incrémente les compteurs de la minute courante (best-effort)"""
+        try:
+            r = get_redis_client()
+            key = _agg_key(_minute_bucket())
+            pipe = r.pipeline(transaction=False)
+            pipe.hincrby(key, category, 1)
+            pipe.hincrby(key, "total", 1)
+            pipe.expire(key, ERROR_AGG_RETENTION_MINUTES * 60)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Agrégat erreurs Redis indisponible: {e}")
+
+    def flush(self) -> int:
+        """Insère le buffer dans error_events en une seule requête"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+
+        if not rows:
+            return 0
+
+        conn = None
+        try:
+            if not DB_CONFIG['password']:
+                logger.error("POSTGRES_PASSWORD non défini dans les variables d'environnement")
+                self.dropped += len(rows)
+                return 0
+
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO error_events
+                        (source, category, message, details, proxy_id, url, status_code, created_at)
+                    VALUES %s
+                """, rows, page_size=max(len(rows), 1))
+            conn.commit()
+            self.flushed += len(rows)
+            logger.debug(f"{len(rows)} erreur(s) insérée(s) dans error_events")
+            return len(rows)
+
+        except psycopg2.Error as e:
+            self.dropped += len(rows)
+            logger.warning(f"Erreur PostgreSQL insertion error_events ({len(rows)} lignes perdues): {e}")
+            return 0
+        except Exception as e:
+            self.dropped += len(rows)
+            logger.warning(f"Erreur insertion error_events ({len(rows)} lignes perdues): {e}")
+            return 0
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def close(self):
+        """Vide le buffer restant (à appeler à la fermeture du spider)"""
+        self.flush()
+        logger.info(f"Error sink fermé: {self.recorded} erreur(s) enregistrée(s), "
+                    f"{self.flushed} insérée(s), {self.dropped} perdue(s)")
+
+def get_error_rates(minutes: int = 60, redis_client=None) -> List[Dict[str, Any]]:
+    """
+    Lit les agrégats par minute des N dernières minutes
+
+    Returns:
+        Liste ordonnée de dicts {'minute': datetime, 'total': int, <catégorie>: int, ...}
+    """
+    r = redis_client or get_redis_client()
+    now_bucket = _minute_bucket()
+    buckets = [now_bucket - 60 * i for i in range(max(1, int(minutes)) - 1, -1, -1)]
+
+    pipe = r.pipeline(transaction=False)
+    for bucket in buckets:
+        pipe.hgetall(_agg_key(bucket))
+    results = pipe.execute()
+
+    series = []
+    for bucket, counts in zip(buckets, results):
+        point = {'minute': datetime.fromtimestamp(bucket), 'total': 0}
+        for category, value in (counts or {}).items():
+            if isinstance(category, bytes):
+                category = category.decode()
+            point[category] = int(value)
+        series.append(point)
+    return series
@@ -9,13 +9,20 @@ Version simplifiée - support des mots-clés personnalisés
 import json
 import os
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List
+
+from .lang_detect import LanguageDetector
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
 # Configuration des langues - chargement sécurisé
 LANGCFG = {}
+# Détecteur construit depuis les marqueurs de LANGCFG (reconstruit au rechargement)
+LANG_DETECTOR = LanguageDetector()
+
+# Racine du projet: le spider tourne depuis scraper/, pas depuis la racine
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 def load_language_config():
     """
@@ -25,6 +32,8 @@ def load_language_config():
     
     try:
         config_path = os.path.join(os.getcwd(), 'config', 'languages.json')
+        if not os.path.exists(config_path):
+            config_path = os.path.join(PROJECT_ROOT, 'config', 'languages.json')
         
         if os.path.exists(config_path):
             with open(config_path, 'r', encoding='utf-8') as f:
@@ -53,12 +62,22 @@ def load_language_config():
             }
         }
 
+    _build_detector()
+
+def _build_detector():
+    global LANG_DETECTOR
+    try:
+        LANG_DETECTOR = LanguageDetector(LANGCFG.get("language_markers", {}))
+    except Exception as e:
+        logger.error(f"Marqueurs de langue invalides, détecteur sans marqueurs: {e}")
+        LANG_DETECTOR = LanguageDetector()
+
 # Charger la configuration au démarrage du module
 load_language_config()
 
 def page_lang_from_text(text: str) -> Optional[str]:
     """
-    Détecte la langue d'un texte basé sur des marqueurs linguistiques
+    Détecte la langue d'un texte (mots outils, marqueurs configurés, n-grammes)
     
     Args:
         text: Le texte à analyser
@@ -66,38 +85,28 @@ def page_lang_from_text(text: str) -> Optional[str]:
     Returns:
         Code de langue (ex: 'fr', 'en') ou None si indéterminé
     """
-    if not text or not isinstance(text, str):
-        return None
-    
-    # Normaliser le texte pour la recherche
-    text_lower = text.lower()
-    
-    # Compter les occurrences de marqueurs par langue
-    language_scores = {}
-    
     try:
-        language_markers = LANGCFG.get("language_markers", {})
-        
-        for lang_code, markers in language_markers.items():
-            score = 0
-            for marker in markers:
-                if isinstance(marker, str):
-                    # Compter les occurrences du marqueur
-                    score += text_lower.count(marker.lower())
-            
-            if score > 0:
-                language_scores[lang_code] = score
-        
-        # Retourner la langue avec le score le plus élevé
-        if language_scores:
-            detected_lang = max(language_scores, key=language_scores.get)
-            logger.debug(f"Langue détectée: {detected_lang} (score: {language_scores[detected_lang]})")
-            return detected_lang
-        
+        return LANG_DETECTOR.detect(text)
     except Exception as e:
         logger.error(f"Erreur lors de la détection de langue: {e}")
+        return None
+
+def page_langs_from_texts(texts: Iterable[str]) -> List[Optional[str]]:
+    """
+    Détection de langue sur un lot de textes (même détecteur que page_lang_from_text)
     
-    return None
+    Args:
+        texts: Textes à analyser
+        
+    Returns:
+        Codes de langue (ou None) dans l'ordre des textes
+    """
+    texts = list(texts)
+    try:
+        return LANG_DETECTOR.detect_many(texts)
+    except Exception as e:
+        logger.error(f"Erreur lors de la détection de langue (lot): {e}")
+        return [None] * len(texts)
 
 def get_language_markers() -> Dict[str, Any]:
     """
@@ -208,6 +217,7 @@ def clean_extracted_text(text: str) -> str:
 # Export des fonctions principales
 __all__ = [
     'page_lang_from_text',
+    'page_langs_from_texts',
     'get_language_markers', 
     'is_language_supported',
     'reload_language_config',
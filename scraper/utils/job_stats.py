@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JOB_STATS.PY - Statistiques live des jobs dans Redis
+Description: Un hash Redis par query_id (job:<id>:stats), alimenté par l'extension
+Scrapy RedisStatsBridge pendant le crawl: débit pages/items, octets, histogramme des
+codes HTTP, profondeur de file. Le compteur contacts_saved_total est cumulé sur les
+tentatives successives du job; les autres champs sont ceux de l'exécution courante.
+"""
+
+import os
+import logging
+from typing import Dict, Iterable, Optional, Any
+
+from .redis_coordination import get_redis_client, _ns
+
+logger = logging.getLogger(__name__)
+
+JOB_STATS_TTL_SECONDS = int(os.getenv("JOB_STATS_TTL_SECONDS", str(7 * 24 * 3600)))
+CUMULATIVE_FIELD = "contacts_saved_total"
+
+
+def job_stats_key(query_id: Any) -> str:
+    return _ns(f"job:{query_id}:stats")
+
+
+def start_run(query_id: Any, redis_client=None):
+    """Efface les champs de l'exécution précédente en conservant le cumul des contacts"""
+    r = redis_client or get_redis_client()
+    key = job_stats_key(query_id)
+    total = r.hget(key, CUMULATIVE_FIELD)
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(key)
+    pipe.hset(key, CUMULATIVE_FIELD, int(total or 0))
+    pipe.expire(key, JOB_STATS_TTL_SECONDS)
+    pipe.execute()
+
+
+def publish(query_id: Any, fields: Dict[str, Any], contacts_delta: int = 0, redis_client=None):
+    """Écrit les champs de l'exécution courante et cumule les contacts sauvegardés"""
+    r = redis_client or get_redis_client()
+    key = job_stats_key(query_id)
+    pipe = r.pipeline(transaction=True)
+    pipe.hset(key, mapping={k: v for k, v in fields.items() if v is not None})
+    if contacts_delta:
+        pipe.hincrby(key, CUMULATIVE_FIELD, int(contacts_delta))
+    pipe.expire(key, JOB_STATS_TTL_SECONDS)
+    pipe.execute()
+
+
+def _number(value: str):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+
+
+def read_job_stats(query_ids: Iterable[Any], redis_client=None) -> Dict[int, Dict[str, Any]]:
+    """
+    Stats live de plusieurs jobs en un aller-retour Redis
+
+    Returns:
+        {query_id: {champ: valeur}} (jobs sans hash absents du résultat)
+    """
+    ids = [int(q) for q in query_ids]
+    if not ids:
+        return {}
+    try:
+        r = redis_client or get_redis_client()
+        pipe = r.pipeline(transaction=False)
+        for query_id in ids:
+            pipe.hgetall(job_stats_key(query_id))
+        results = pipe.execute()
+    except Exception as e:
+        logger.debug(f"Lecture des stats live impossible: {e}")
+        return {}
+    return {
+        query_id: {k: _number(v) for k, v in raw.items()}
+        for query_id, raw in zip(ids, results) if raw
+    }
+
+
+def contacts_saved_total(query_id: Any, redis_client=None) -> Optional[int]:
+    """Contacts sauvegardés par toutes les exécutions du job (None si inconnu)"""
+    stats = read_job_stats([query_id], redis_client).get(int(query_id))
+    if not stats or CUMULATIVE_FIELD not in stats:
+        return None
+    return int(stats[CUMULATIVE_FIELD])
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LANG_DETECT.PY - Détection de langue des pages
+Description: Le texte est tokenisé une seule fois; les occurrences (Counter) sont
+pondérées par une table token -> ((langue, poids), ...) précalculée à partir de mots
+outils intégrés et des marqueurs de config/languages.json (les marqueurs de plusieurs
+mots ne sont recherchés dans le texte que si tous leurs mots y figurent). Les textes
+courts ajoutent des trigrammes et caractères caractéristiques; les écritures non
+latines (arabe, chinois, japonais) sont reconnues par plage Unicode quand aucune
+langue latine ne ressort. detect_many() traite un lot de pages avec les mêmes tables.
+"""
+
+import re
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seuls les premiers caractères sont analysés: ~800 mots suffisent à départager les langues
+MAX_CHARS = 5000
+# En dessous de ce nombre de tokens, les n-grammes de caractères complètent le score
+SHORT_TEXT_TOKENS = 30
+MARKER_WEIGHT = 2.0
+NGRAM_WEIGHT = 0.5
+
+# Lettres latines après lower(): deux fois plus rapide que [^\W\d_] (classe Unicode);
+# les écritures non latines ne donnent aucun token et passent par SCRIPTS
+TOKEN_PATTERN = re.compile(r"[a-zß-öø-ÿœæ]+")
+
+# Mots outils fréquents: signal principal sur les pages de taille normale
+STOPWORDS: Dict[str, Tuple[str, ...]] = {
+    'fr': ('le', 'la', 'les', 'et', 'ou', 'avec', 'dans', 'pour', 'sur', 'par', 'des', 'du',
+           'une', 'est', 'nous', 'vous', 'qui', 'que', 'pas', 'au', 'aux', 'ce', 'cette', 'sont', 'en'),
+    'en': ('the', 'and', 'or', 'with', 'in', 'for', 'on', 'at', 'by', 'this', 'that', 'is',
+           'are', 'we', 'you', 'our', 'your', 'of', 'to', 'from', 'be', 'have', 'it', 'an'),
+    'es': ('el', 'la', 'los', 'las', 'y', 'o', 'con', 'en', 'para', 'por', 'del', 'una',
+           'es', 'que', 'nuestro', 'nosotros', 'su', 'al', 'lo', 'como', 'más', 'pero'),
+    'de': ('der', 'die', 'das', 'und', 'oder', 'mit', 'in', 'für', 'von', 'zu', 'ist', 'den',
+           'dem', 'ein', 'eine', 'wir', 'sie', 'nicht', 'auf', 'auch', 'sich', 'bei'),
+    'it': ('il', 'la', 'lo', 'gli', 'le', 'e', 'o', 'con', 'in', 'per', 'di', 'del', 'della',
+           'che', 'una', 'sono', 'non', 'siamo', 'nel', 'alla', 'anche', 'dei'),
+    'pt': ('o', 'a', 'os', 'as', 'e', 'ou', 'com', 'em', 'para', 'por', 'do', 'da', 'dos',
+           'das', 'uma', 'que', 'não', 'nos', 'na', 'no', 'são', 'mais'),
+    'nl': ('de', 'het', 'een', 'en', 'of', 'met', 'in', 'voor', 'op', 'van', 'is', 'zijn',
+           'wij', 'we', 'niet', 'ook', 'aan', 'bij', 'dat', 'die', 'ons', 'uw'),
+}
+
+# Trigrammes (espaces compris) et caractères distinctifs pour les textes courts
+NGRAMS: Dict[str, Tuple[str, ...]] = {
+    'fr': (' le', 'les', ' de', 'eau', 'aux', 'ais', 'ait', 'oir', 'eux', 'que', ' qu', 'ç', 'è', 'ê', 'à'),
+    'en': (' th', 'the', 'ing', 'ng ', 'and', 'ght', ' wh', 'ly ', 'ow '),
+    'es': (' el', 'los', 'las', 'ión', 'ado', 'ada', ' y ', 'del', 'ñ', '¿', '¡'),
+    'de': ('ich', 'sch', 'ein', 'der', 'die', 'und', 'cht', 'ung', ' zu', 'ß', 'ä', 'ö', 'ü'),
+    'it': (' il', 'che', 'ell', 'zio', 'gli', 'per', 'ato', 'ità', 'lla', 'ò', 'ì'),
+    'pt': ('ção', 'ões', ' do', ' da', 'ão ', 'nha', 'lho', 'ã', 'õ'),
+    'nl': ('een', 'ij ', 'aar', 'oor', ' he', 'het', 'van', ' ge', 'ijk'),
+}
+
+# Écritures non latines: (langue, motif)
+SCRIPTS: Tuple[Tuple[str, re.Pattern], ...] = (
+    ('ja', re.compile('[\u3040-\u30ff]')),   # hiragana / katakana (avant les idéogrammes)
+    ('zh', re.compile('[\u4e00-\u9fff]')),
+    ('ar', re.compile('[\u0600-\u06ff]')),
+)
+
+WeightTable = Dict[object, Tuple[Tuple[str, float], ...]]
+
+
+def _add(table: Dict[object, Dict[str, float]], key, lang: str, weight: float):
+    table.setdefault(key, {})
+    table[key][lang] = max(table[key].get(lang, 0.0), weight)
+
+
+def _freeze(table: Dict[object, Dict[str, float]]) -> WeightTable:
+    """Répartit le poids d'une clé partagée entre ses langues (la, de, in...)"""
+    return {
+        key: tuple((lang, weight / len(langs)) for lang, weight in langs.items())
+        for key, langs in table.items()
+    }
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text[:MAX_CHARS].lower())
+
+
+class LanguageDetector:
+    """
+    Détecteur à tables précalculées
+
+    Usage:
+        detector = LanguageDetector(markers)     # markers: {'fr': ['en français', ...]}
+        detector.detect(text)                    # 'fr' / None
+        detector.detect_many(texts)              # ['fr', 'en', None, ...]
+    """
+
+    def __init__(self, markers: Optional[Dict[str, Iterable[str]]] = None):
+        tokens: Dict[object, Dict[str, float]] = {}
+        phrases: Dict[object, Dict[str, float]] = {}
+        ngrams: Dict[object, Dict[str, float]] = {}
+
+        for lang, words in STOPWORDS.items():
+            for word in words:
+                _add(tokens, word, lang, 1.0)
+
+        for lang, lang_markers in (markers or {}).items():
+            for phrase in lang_markers:
+                if not isinstance(phrase, str):
+                    continue
+                words = tokenize(phrase)
+                if len(words) == 1:
+                    _add(tokens, words[0], lang, MARKER_WEIGHT)
+                elif len(words) > 1:
+                    _add(phrases, tuple(words), lang, MARKER_WEIGHT)
+
+        for lang, grams in NGRAMS.items():
+            for gram in grams:
+                _add(ngrams, gram, lang, NGRAM_WEIGHT)
+
+        self.token_weights = _freeze(tokens)
+        # Marqueurs de plusieurs mots: (mots, " expression ", poids)
+        self.phrases = [(words, f" {' '.join(words)} ", weights)
+                        for words, weights in _freeze(phrases).items()]
+        self.ngram_weights = _freeze(ngrams)
+        self.ngram_sizes = sorted({len(g) for g in self.ngram_weights})
+        self.languages = sorted(set(STOPWORDS) | set(markers or {}) | {lang for lang, _ in SCRIPTS})
+
+    @staticmethod
+    def _accumulate(scores: Dict[str, float], counts: Counter, table: WeightTable):
+        """Ajoute count * poids pour chaque clé connue (parcours du plus petit ensemble)"""
+        if len(counts) <= len(table):
+            pairs = ((n, table.get(key)) for key, n in counts.items())
+        else:
+            pairs = ((counts.get(key), weights) for key, weights in table.items())
+        for n, weights in pairs:
+            if n and weights:
+                for lang, weight in weights:
+                    scores[lang] = scores.get(lang, 0.0) + n * weight
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Score par langue (vide si rien de reconnu)"""
+        if not text or not isinstance(text, str):
+            return {}
+        words = tokenize(text)
+        scores: Dict[str, float] = {}
+
+        counts = Counter(words)
+        self._accumulate(scores, counts, self.token_weights)
+
+        joined = None
+        for phrase_words, phrase, weights in self.phrases:
+            # Recherche de l'expression seulement si tous ses mots sont présents
+            if all(word in counts for word in phrase_words):
+                joined = joined or f" {' '.join(words)} "
+                n = joined.count(phrase)
+                if n:
+                    for lang, weight in weights:
+                        scores[lang] = scores.get(lang, 0.0) + n * weight
+
+        if len(words) < SHORT_TEXT_TOKENS:
+            joined = joined or f" {' '.join(words)} "
+            grams = Counter()
+            for size in self.ngram_sizes:
+                grams.update(joined[i:i + size] for i in range(len(joined) - size + 1))
+            self._accumulate(scores, grams, self.ngram_weights)
+
+        if not scores:
+            sample = text[:MAX_CHARS]
+            for lang, pattern in SCRIPTS:
+                found = len(pattern.findall(sample))
+                if found:
+                    scores[lang] = float(found)
+                    break
+        return scores
+
+    def detect(self, text: str) -> Optional[str]:
+        """Langue au meilleur score, None si indéterminée"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        return max(scores, key=scores.get)
+
+    def detect_many(self, texts: Iterable[str]) -> List[Optional[str]]:
+        """
+        Détection sur un lot de textes, dans l'ordre de l'entrée
+
+        Boucle sur detect(): les tables sont construites une fois et partagées, mais le
+        coût reste celui de N appels (une tokenisation par texte). Fusionner le lot en
+        un seul flux de tokens imposerait de suivre les frontières de chaque texte,
+        plus cher en Python que ce qu'il économise.
+        """
+        detect = self.detect
+        return [detect(text) for text in texts]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+METRICS.PY - Métriques Prometheus du worker
+Description: Définit les métriques du scheduler et des spiders et l'exporteur HTTP.
+Les spiders tournent dans des sous-processus: en mode multiprocessus de
+prometheus_client (PROMETHEUS_MULTIPROC_DIR défini avant tout import), chaque
+processus écrit ses valeurs dans ce répertoire et l'exporteur du scheduler les agrège.
+Sans prometheus_client, toutes les métriques sont des no-op.
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, start_http_server
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9090"))
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+# Latences (secondes): des requêtes SQL rapides aux navigations Playwright lentes
+FAST_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+PAGE_BUCKETS = (.1, .25, .5, 1, 2, 4, 8, 15, 30, 60)
+JOB_BUCKETS = (30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+class _NoopMetric:
+    """Remplaçant silencieux quand prometheus_client est absent"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+
+def _counter(name, doc, labels=()):
+    return Counter(name, doc, labels) if PROMETHEUS_AVAILABLE else _NoopMetric()
+
+
+def _gauge(name, doc, labels=(), mode='livemax'):
+    return Gauge(name, doc, labels, multiprocess_mode=mode) if PROMETHEUS_AVAILABLE else _NoopMetric()
+
+
+def _histogram(name, doc, labels=(), buckets=FAST_BUCKETS):
+    return Histogram(name, doc, labels, buckets=buckets) if PROMETHEUS_AVAILABLE else _NoopMetric()
+
+
+# ---------------------------------------------------------------------------
+# Spiders (sous-processus)
+# ---------------------------------------------------------------------------
+
+SCRAPED_CONTACTS = _counter("scraper_scraped_contacts_total", "Total scraped contacts")
+PROXY_FAILURES = _counter("scraper_proxy_failures_total", "Total proxy failures", ["proxy_host"])
+ACTIVE_PROXIES = _gauge("scraper_active_proxies", "Number of active proxies")
+
+PAGES_FETCHED = _counter("scraper_pages_fetched_total", "Pages téléchargées", ["status_class"])
+PAGE_FETCH_SECONDS = _histogram("scraper_page_fetch_duration_seconds",
+                                "Latence de téléchargement d'une page", ["renderer"], PAGE_BUCKETS)
+EXTRACTION_SECONDS = _histogram("scraper_extraction_duration_seconds",
+                                "Temps d'extraction (texte, mots-clés, contacts) par page")
+PIPELINE_WRITE_SECONDS = _histogram("scraper_pipeline_write_duration_seconds",
+                                    "Temps d'écriture d'un contact en base", ["outcome"])
+PROXY_SELECTION_SECONDS = _histogram("scraper_proxy_selection_duration_seconds",
+                                     "Temps de sélection d'un proxy par requête")
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+JOBS_TOTAL = _counter("scraper_jobs_total", "Jobs terminés par statut", ["status"])
+JOBS_DURATION_SECONDS = _histogram("scraper_jobs_duration_seconds",
+                                   "Durée d'exécution des jobs", ["status"], JOB_BUCKETS)
+JOBS_RUNNING = _gauge("scraper_jobs_running", "Jobs en cours d'exécution")
+DB_QUERY_SECONDS = _histogram("scraper_database_query_duration_seconds",
+                              "Durée des requêtes SQL du scheduler", ["query_type"])
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Mesure la durée du bloc dans l'histogramme (labels optionnels)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric = histogram.labels(**labels) if labels else histogram
+        metric.observe(time.perf_counter() - start)
+
+
+def query_type(sql: str) -> str:
+    """Premier mot de la requête (select, update, insert...) pour le label query_type"""
+    word = (sql or '').lstrip().split(None, 1)
+    return word[0].lower() if word else 'unknown'
+
+
+def mark_process_dead(pid: int):
+    """À appeler quand un sous-processus spider se termine (gauges live*)"""
+    if PROMETHEUS_AVAILABLE and MULTIPROC_DIR:
+        try:
+            multiprocess.mark_process_dead(pid)
+        except Exception as e:
+            logger.debug(f"mark_process_dead({pid}) en erreur: {e}")
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> bool:
+    """
+    Démarre l'exporteur HTTP /metrics (thread de fond)
+
+    En mode multiprocessus, un registre dédié agrège les fichiers de tous les processus.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        logger.warning("prometheus_client absent: exporteur de métriques désactivé")
+        return False
+    try:
+        if MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            start_http_server(port, registry=registry)
+        else:
+            start_http_server(port)
+        logger.info(f"Exporteur Prometheus sur :{port}/metrics"
+                    f"{' (multiprocessus)' if MULTIPROC_DIR else ''}")
+        return True
+    except Exception as e:
+        logger.error(f"Impossible de démarrer l'exporteur Prometheus sur le port {port}: {e}")
+        return False
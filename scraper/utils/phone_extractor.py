@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PHONE_EXTRACTOR.PY - Extraction et normalisation des numéros de téléphone
+Description: Une seule passe d'une regex ancrée (début hors mot / date / nombre, fin sur
+un chiffre) relève les candidats avec leur position; un candidat invalide est revalidé
+sur ses sous-suites de groupes de chiffres (numéros collés au texte voisin); chaque candidat est normalisé en
+E.164 selon le plan de numérotation du pays du job (config/countries.json, section
+phone_plans): indicatif, préfixe national, longueur et premiers chiffres du numéro
+national. Les numéros internationaux (+CC / 00CC) sont validés par leur propre
+indicatif. Les positions triées permettent d'associer téléphones et emails par fusion
+(nearest_by_offset) au lieu de comparer chaque paire.
+"""
+
+import os
+import re
+import json
+import logging
+from typing import Dict, Hashable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Pays utilisé pour les numéros nationaux quand le job n'a pas de country_filter
+DEFAULT_PHONE_COUNTRY = os.getenv("PHONE_DEFAULT_COUNTRY", "France")
+
+# E.164: 15 chiffres au plus, indicatif compris
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+# Début: ni lettre/chiffre juste avant, ni séparateur de date ou de nombre précédé d'un
+# chiffre ("Tél:01..." reste valide, "1.234.567" non); groupes de chiffres séparés par
+# UN seul séparateur, pour que deux numéros voisins ("... 89 - 06 ...") restent distincts;
+# fin: un chiffre qui n'est suivi ni d'un mot, ni d'un autre nombre (dates, prix, ids)
+PHONE_PATTERN = re.compile(
+    r"(?<![\w+@/])(?<!\d[.,:-])\+?\(?\d[\d()]*(?:[ \u00a0.\-]\(?\d[\d()]*)*(?![\w@/%€$]|[.,-]\d)"
+)
+# Groupes d'un candidat, pour réessayer la validation sur des sous-suites
+DIGIT_GROUP_PATTERN = re.compile(r"\+?\(?\d[\d()]*")
+# Un numéro s'écrit en 8 groupes au plus ("+33 (0)1 23 45 67 89" en compte 7)
+MAX_GROUPS = 8
+NON_DIGITS = str.maketrans('', '', ' \u00a0().-+')
+
+PhonePlan = Dict[str, object]
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+def _load_plans() -> List[PhonePlan]:
+    """Plans de numérotation de config/countries.json (liste vide si absents)"""
+    for base in (os.getcwd(), PROJECT_ROOT):
+        path = os.path.join(base, 'config', 'countries.json')
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            plans = []
+            for name, plan in data.get('phone_plans', {}).items():
+                low, high = plan.get('nsn', [E164_MIN_DIGITS, E164_MAX_DIGITS])
+                plans.append({
+                    'name': name,
+                    'iso': plan.get('iso', ''),
+                    'code': str(plan['code']),
+                    'trunk': str(plan.get('trunk', '')),
+                    'trunk_optional': bool(plan.get('trunk_optional', False)),
+                    'nsn': (int(low), int(high)),
+                    'leading': str(plan.get('leading', '')),
+                })
+            logger.debug(f"{len(plans)} plan(s) de numérotation chargés depuis {path}")
+            return plans
+        except Exception as e:
+            logger.error(f"Erreur chargement des plans de numérotation ({path}): {e}")
+            return []
+    logger.warning("config/countries.json introuvable, normalisation internationale seule")
+    return []
+
+
+PHONE_PLANS = _load_plans()
+PLANS_BY_CODE: Dict[str, List[PhonePlan]] = {}
+for _plan in PHONE_PLANS:
+    PLANS_BY_CODE.setdefault(_plan['code'], []).append(_plan)
+
+
+def find_plan(country: Optional[str]) -> Optional[PhonePlan]:
+    """Plan d'un pays, par nom (countries.json) ou code ISO"""
+    if not country:
+        return None
+    key = country.strip().casefold()
+    for plan in PHONE_PLANS:
+        if key in (plan['name'].casefold(), plan['iso'].casefold()):
+            return plan
+    return None
+
+
+def _national_number(digits: str, plan: PhonePlan, international: bool) -> Optional[str]:
+    """Numéro national significatif (sans préfixe national) s'il respecte le plan"""
+    trunk = plan['trunk']
+    if trunk and digits.startswith(trunk):
+        digits = digits[len(trunk):]
+    elif trunk and not international and not plan['trunk_optional']:
+        return None
+    low, high = plan['nsn']
+    if not low <= len(digits) <= high:
+        return None
+    if plan['leading'] and digits[0] not in plan['leading']:
+        return None
+    return digits
+
+
+def normalize_phone(raw: str, plan: Optional[PhonePlan] = None) -> Optional[str]:
+    """
+    Normalise un numéro en E.164 (+33123456789)
+
+    Args:
+        raw: Numéro tel qu'écrit dans la page
+        plan: Plan du pays pour les numéros sans indicatif
+
+    Returns:
+        Numéro E.164 ou None s'il n'est pas valide
+    """
+    international = raw.lstrip('(').startswith(('+', '00'))
+    if international:
+        # Un "(0)" après l'indicatif est le préfixe national: ignoré
+        raw = raw.replace('(0)', ' ')
+    digits = raw.translate(NON_DIGITS)
+    if not digits.isdigit():
+        return None
+    if international and not raw.lstrip('(').startswith('+'):
+        digits = digits[2:]
+
+    if not international:
+        if not plan:
+            return None
+        nsn = _national_number(digits, plan, False)
+        return f"+{plan['code']}{nsn}" if nsn else None
+
+    for size in (1, 2, 3):
+        candidates = PLANS_BY_CODE.get(digits[:size])
+        if candidates:
+            for candidate in candidates:
+                nsn = _national_number(digits[size:], candidate, True)
+                if nsn:
+                    return f"+{candidate['code']}{nsn}"
+            return None
+    if E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return f"+{digits}"
+    return None
+
+
+class PhoneExtractor:
+    """
+    Extraction des téléphones d'une page pour le pays d'un job
+
+    Usage:
+        extractor = PhoneExtractor('France')
+        extractor.extract(text)      # [(position, '+33123456789'), ...] trié par position
+    """
+
+    def __init__(self, country: Optional[str] = None):
+        self.plan = find_plan(country or DEFAULT_PHONE_COUNTRY)
+        if country and not self.plan:
+            logger.info(f"Pas de plan de numérotation pour '{country}': numéros internationaux seuls")
+
+    def normalize(self, raw: str) -> Optional[str]:
+        return normalize_phone(raw, self.plan)
+
+    def extract(self, text: str) -> List[Tuple[int, str]]:
+        """Numéros valides (E.164) avec leur position, dans l'ordre du texte"""
+        if not text:
+            return []
+        found = []
+        for match in PHONE_PATTERN.finditer(text):
+            number = normalize_phone(match.group(), self.plan)
+            if number:
+                found.append((match.start(), number))
+            else:
+                found.extend(self._split_candidate(match))
+        return found
+
+    def _split_candidate(self, match: re.Match) -> List[Tuple[int, str]]:
+        """
+        Candidat invalide pris dans du texte voisin ("01 23 45 67 89 12 rue...",
+        deux numéros à la suite): plus longue sous-suite de groupes valide à partir
+        de chaque groupe, puis reprise après le numéro trouvé
+        """
+        candidate = match.group()
+        groups = [(g.start(), g.end()) for g in DIGIT_GROUP_PATTERN.finditer(candidate)]
+        found = []
+        if len(groups) < 2:
+            return found
+        i = 0
+        while i < len(groups):
+            for j in range(min(len(groups), i + MAX_GROUPS), i, -1):
+                number = normalize_phone(candidate[groups[i][0]:groups[j - 1][1]], self.plan)
+                if number:
+                    found.append((match.start() + groups[i][0], number))
+                    i = j
+                    break
+            else:
+                i += 1
+        return found
+
+
+def nearest_by_offset(anchors: List[Tuple[int, K]], candidates: List[Tuple[int, V]],
+                      radius: int) -> Dict[K, V]:
+    """
+    Associe à chaque ancre le candidat le plus proche dans le rayon
+
+    Les deux listes sont triées par position: un seul parcours de fusion, O(n + m).
+    """
+    nearest: Dict[K, V] = {}
+    j, count = 0, len(candidates)
+    for position, key in anchors:
+        while j + 1 < count and candidates[j + 1][0] <= position:
+            j += 1
+        best, best_distance = None, radius + 1
+        for k in (j, j + 1):
+            if k < count:
+                distance = abs(candidates[k][0] - position)
+                if distance < best_distance:
+                    best, best_distance = candidates[k][1], distance
+        if best is not None and key not in nearest:
+            nearest[key] = best
+    return nearest
@@ -1,19 +1,131 @@
 
+import os
 import time
-from typing import Dict, Any
-from .redis_coordination import get_redis_client, _ns
-from .circuit_breaker import is_open, record_failure
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from . import circuit_breaker as cb
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "db"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD"),
+    'connect_timeout': int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "30")),
+    'application_name': 'proxy_failover'
+}
+
+# Redis est la source de vérité; les colonnes circuit_breaker_* de proxies
+# sont une copie mise à jour en différé, par lots, pour le dashboard et les rapports.
+SYNC_INTERVAL_SECONDS = float(os.getenv("PROXY_CB_SYNC_SECONDS", "5"))
+
+def _key(proxy: Dict[str, Any]) -> str:
+    pid = proxy.get('id')
+    return f"proxy:{pid if pid is not None else proxy.get('host')}"
 
 def can_use(proxy: Dict[str, Any]) -> bool:
-    key = f"proxy:{proxy.get('id') or proxy.get('host')}"
-    return not is_open(key)
+    """Filtre de sélection: exclut les proxies dont le circuit est ouvert (ne consomme pas de sonde)"""
+    return not cb.is_open(_key(proxy))
+
+def acquire(proxy: Dict[str, Any], probe_budget: int = cb.DEFAULT_PROBE_BUDGET) -> bool:
+    """Réserve le proxy choisi; en half_open, consomme une sonde du budget"""
+    return cb.allow(_key(proxy), probe_budget=probe_budget)
 
 def report_result(proxy: Dict[str, Any], success: bool, max_failures: int, cooldown_seconds: int):
-    r = get_redis_client()
-    key = _ns(f"proxy:{proxy.get('id') or proxy.get('host')}:fails")
+    key = _key(proxy)
     if success:
-        r.delete(key)
+        cb.record_success(key)
     else:
-        n = r.incr(key)
-        r.expire(key, cooldown_seconds)
-        record_failure(f"proxy:{proxy.get('id') or proxy.get('host')}", n, max_failures, cooldown_seconds)
+        cb.record_failure(key, failure_threshold=max_failures, cooldown_seconds=cooldown_seconds)
+
+class _ProxyStateSyncer:
+    """Agrège les états du circuit breaker et les écrit dans proxies en un seul UPDATE"""
+
+    def __init__(self, interval: float = SYNC_INTERVAL_SECONDS):
+        self.interval = interval
+        self._pending: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def on_transition(self, key: str, state: str, info: Dict[str, Any]):
+        if not key.startswith("proxy:"):
+            return
+        try:
+            proxy_id = int(key.split(":", 1)[1])
+        except ValueError:
+            return  # proxy identifié par host, pas de ligne à synchroniser
+
+        last_failure = info.get('last_failure_ms')
+        open_until = info.get('open_until_ms')
+        row = (
+            proxy_id,
+            state,
+            info.get('failures'),
+            datetime.fromtimestamp(last_failure / 1000.0) if last_failure else None,
+            datetime.fromtimestamp(open_until / 1000.0) if open_until and state == cb.STATE_OPEN else None,
+        )
+        with self._lock:
+            self._pending[proxy_id] = row
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="proxy-cb-sync", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._pending = list(self._pending.values()), {}
+        if not rows:
+            return 0
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE proxies AS p SET
+                        circuit_breaker_status = v.status,
+                        circuit_breaker_failures = COALESCE(v.failures, p.circuit_breaker_failures),
+                        circuit_breaker_last_failure = COALESCE(v.last_failure, p.circuit_breaker_last_failure),
+                        circuit_breaker_next_attempt = v.next_attempt
+                    FROM (VALUES %s) AS v(id, status, failures, last_failure, next_attempt)
+                    WHERE p.id = v.id
+                """, rows, template="(%s::int, %s::text, %s::int, %s::timestamp, %s::timestamp)")
+            conn.commit()
+            logger.debug(f"États circuit breaker synchronisés pour {len(rows)} proxies")
+            return len(rows)
+        except Exception as e:
+            logger.warning(f"Synchronisation circuit breaker -> proxies échouée: {e}")
+            # Réinjecter sans écraser un état plus récent
+            with self._lock:
+                for row in rows:
+                    self._pending.setdefault(row[0], row)
+            return 0
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+_syncer = _ProxyStateSyncer()
+cb.register_listener(_syncer.on_transition)
+atexit.register(_syncer.flush)
+
+def flush_state_sync() -> int:
+    """Force l'écriture immédiate des états en attente (fermeture du spider)"""
+    return _syncer.flush()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PROXY_POOL.PY - Index en mémoire du pool de proxies
+Description: Cache le pool de proxies actifs et l'indexe par (pays, fournisseur, tag)
+avec jokers, pour qu'un job ne parcoure que son segment. Chaque segment garde son
+propre état de rotation; les filtres d'un job (queue.proxy_country_filter,
+queue.proxy_pool_tag) sont résolus une seule fois, à l'ouverture du spider.
+"""
+
+import os
+import time
+import random
+import bisect
+import logging
+import threading
+from itertools import product
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from .metrics import ACTIVE_PROXIES
+
+# Configuration logging
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "db"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD"),
+    'connect_timeout': int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "30")),
+    'application_name': 'proxy_pool'
+}
+
+# Durée de vie du cache du pool avant rechargement depuis la base
+POOL_REFRESH_SECONDS = float(os.getenv("PROXY_POOL_REFRESH_SECONDS", "60"))
+# Si le segment d'un job est vide, utiliser le pool complet plutôt que de ne pas proxifier
+SEGMENT_FALLBACK = os.getenv("PROXY_SEGMENT_FALLBACK", "true").lower() == "true"
+
+# (countries, provider, tag) ; None = pas de filtre
+SegmentKey = Tuple[Optional[Tuple[str, ...]], Optional[str], Optional[str]]
+
+def _norm(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _proxy_tags(proxy: Dict[str, Any]) -> List[str]:
+    """Tags d'un proxy: sticky_tag et sticky_group (un proxy peut appartenir aux deux)"""
+    tags = {_norm(proxy.get('sticky_tag')), _norm(proxy.get('sticky_group'))}
+    tags.discard(None)
+    return sorted(tags)
+
+def parse_country_filter(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """'fr, BE' -> ('BE', 'FR') ; vide -> None"""
+    if not value:
+        return None
+    countries = {c.strip().upper() for c in str(value).replace(';', ',').split(',') if c.strip()}
+    return tuple(sorted(countries)) or None
+
+class Segment:
+    """Sous-ensemble du pool avec son propre état de rotation"""
+
+    def __init__(self, proxies: List[Dict[str, Any]], weights: Optional[Dict[str, float]] = None):
+        self.proxies = proxies
+        # id -> proxy: résolution O(1) de l'affinité sticky
+        self.by_id: Dict[int, Dict[str, Any]] = {p['id']: p for p in proxies}
+        self._cursor = 0
+        self._lock = threading.Lock()
+        weights = weights or {}
+        default = float(weights.get("default", 1.0))
+        acc = 0.0
+        self._cumulative: List[float] = []
+        for p in proxies:
+            acc += float(weights.get(str(p.get('label') or p.get('host')), default))
+            self._cumulative.append(acc)
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def next(self, mode: str = "weighted_random") -> Optional[Dict[str, Any]]:
+        """Prochain candidat, en O(1) (O(log n) pour weighted_random)"""
+        if not self.proxies:
+            return None
+        if mode == "round_robin":
+            with self._lock:
+                proxy = self.proxies[self._cursor % len(self.proxies)]
+                self._cursor += 1
+            return proxy
+        if mode == "random":
+            return random.choice(self.proxies)
+        total = self._cumulative[-1]
+        if total <= 0:
+            return random.choice(self.proxies)
+        idx = bisect.bisect_left(self._cumulative, random.uniform(0, total))
+        return self.proxies[min(idx, len(self.proxies) - 1)]
+
+class ProxyPool:
+    """
+    Pool de proxies en cache, indexé par (pays, fournisseur, tag)
+
+    Chaque proxy est inscrit sous toutes les combinaisons de ses attributs et du joker
+    None: la recherche d'un segment est une lecture de dict, sans parcourir le pool.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]],
+                 refresh_seconds: float = POOL_REFRESH_SECONDS):
+        self._loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._loaded_at = 0.0
+        self._weights: Dict[str, float] = {}
+        self._index: Dict[Tuple[Optional[str], Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+        self._segments: Dict[SegmentKey, Segment] = {}
+        self._job_filters: Dict[int, SegmentKey] = {}
+
+    def _rebuild(self, proxies: List[Dict[str, Any]]):
+        index: Dict[Tuple[Optional[str], Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+        for proxy in proxies:
+            country = _norm(proxy.get('country_code'))
+            country = country.upper() if country else None
+            provider = _norm(proxy.get('provider'))
+            for key in product({None, country}, {None, provider}, {None, *_proxy_tags(proxy)}):
+                index.setdefault(key, []).append(proxy)
+        self._index = index
+        self._segments = {}
+        self._loaded_at = time.monotonic()
+        ACTIVE_PROXIES.set(len(proxies))
+        logger.debug(f"Index proxies reconstruit: {len(proxies)} proxies, {len(index)} clés")
+
+    def _ensure_fresh(self):
+        if time.monotonic() - self._loaded_at < self.refresh_seconds and self._index:
+            return
+        proxies = self._loader()
+        with self._lock:
+            self._rebuild(proxies)
+
+    def invalidate(self):
+        """Force le rechargement au prochain accès"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def set_weights(self, weights: Optional[Dict[str, float]]):
+        weights = dict(weights or {})
+        with self._lock:
+            if weights != self._weights:
+                self._weights = weights
+                self._segments = {}
+
+    def segment(self, countries: Optional[Tuple[str, ...]] = None, provider: Optional[str] = None,
+                tag: Optional[str] = None) -> Segment:
+        """Segment correspondant aux filtres (mis en cache jusqu'au prochain rechargement)"""
+        self._ensure_fresh()
+        key: SegmentKey = (countries, _norm(provider), _norm(tag))
+        with self._lock:
+            seg = self._segments.get(key)
+            if seg is None:
+                if countries:
+                    seen, proxies = set(), []
+                    for country in countries:
+                        for p in self._index.get((country, key[1], key[2]), []):
+                            if p['id'] not in seen:
+                                seen.add(p['id'])
+                                proxies.append(p)
+                else:
+                    proxies = list(self._index.get((None, key[1], key[2]), []))
+                seg = Segment(proxies, self._weights)
+                self._segments[key] = seg
+            return seg
+
+    def bind_job(self, job_id: Optional[int], countries: Optional[Tuple[str, ...]] = None,
+                 tag: Optional[str] = None):
+        """Associe explicitement des filtres à un job"""
+        if job_id is not None:
+            with self._lock:
+                self._job_filters[job_id] = (countries, None, _norm(tag))
+
+    def resolve_job(self, job_id: Optional[int]) -> SegmentKey:
+        """Filtres du job lus une seule fois dans queue"""
+        if job_id is None:
+            return (None, None, None)
+        with self._lock:
+            cached = self._job_filters.get(job_id)
+        if cached is not None:
+            return cached
+        filters = load_job_filters(job_id)
+        self.bind_job(job_id, *filters)
+        return self._job_filters[job_id]
+
+    def segment_for_job(self, job_id: Optional[int]) -> Segment:
+        countries, provider, tag = self.resolve_job(job_id)
+        seg = self.segment(countries, provider, tag)
+        if not seg and SEGMENT_FALLBACK and (countries or provider or tag):
+            logger.warning(f"Aucun proxy pour le job {job_id} (pays={countries}, tag={tag}), "
+                           f"repli sur le pool complet")
+            seg = self.segment()
+        return seg
+
+    def release_job(self, job_id: Optional[int]):
+        with self._lock:
+            self._job_filters.pop(job_id, None)
+
+def load_job_filters(job_id: int) -> Tuple[Optional[Tuple[str, ...]], Optional[str]]:
+    """Lit proxy_country_filter et proxy_pool_tag du job"""
+    conn = None
+    try:
+        if not DB_CONFIG['password']:
+            return (None, None)
+        conn = psycopg2.connect(**DB_CONFIG)
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT proxy_country_filter, proxy_pool_tag FROM queue WHERE id = %s", (job_id,))
+            row = cur.fetchone()
+        if not row:
+            return (None, None)
+        return (parse_country_filter(row.get('proxy_country_filter')), _norm(row.get('proxy_pool_tag')))
+    except Exception as e:
+        logger.warning(f"Impossible de lire les filtres proxy du job {job_id}: {e}")
+        return (None, None)
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
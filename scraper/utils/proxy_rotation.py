@@ -1,12 +1,33 @@
 
 import random, time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from .redis_coordination import get_redis_client, _ns
 
-def _sticky_key(job_id: Optional[int]) -> str:
-    return _ns(f"sticky:{job_id or 'global'}")
+def _sticky_key(job_id: Optional[int], domain: Optional[str] = None) -> str:
+    return _ns(f"sticky:{job_id or 'global'}:{(domain or '*').lower()}")
 
-def choose(proxies: List[Dict[str, Any]], mode: str = "weighted_random", weights: Optional[Dict[str,float]]=None, job_id: Optional[int]=None, sticky_ttl: int=300) -> Optional[Dict[str, Any]]:
+def sticky_get(job_id: Optional[int], domain: Optional[str], ttl: int) -> Optional[int]:
+    """ID du proxy associé à (job, domaine); le TTL est prolongé à chaque usage"""
+    r = get_redis_client()
+    pipe = r.pipeline(transaction=False)
+    key = _sticky_key(job_id, domain)
+    pipe.get(key)
+    pipe.expire(key, ttl)
+    value = pipe.execute()[0]
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def sticky_set(job_id: Optional[int], domain: Optional[str], proxy_id: int, ttl: int):
+    get_redis_client().set(_sticky_key(job_id, domain), str(proxy_id), ex=ttl)
+
+def choose(proxies: List[Dict[str, Any]], mode: str = "weighted_random", weights: Optional[Dict[str,float]]=None, job_id: Optional[int]=None, sticky_ttl: int=300, domain: Optional[str]=None,
+           by_id: Optional[Dict[int, Dict[str, Any]]]=None, exclude: Optional[Set[int]]=None) -> Optional[Dict[str, Any]]:
+    """
+    by_id: index id -> proxy de la liste (Segment.by_id) pour résoudre l'affinité sticky
+    sans parcourir la liste; exclude: ids écartés (circuit breaker) pour ce tirage
+    """
     if not proxies:
         return None
     weights = weights or {}
@@ -17,17 +38,21 @@ def choose(proxies: List[Dict[str, Any]], mode: str = "weighted_random", weights
     if mode == "random":
         return random.choice(proxies)
     if mode == "sticky_session":
-        r = get_redis_client()
-        key = _sticky_key(job_id)
-        idx = r.get(key)
-        if idx is not None:
-            try:
-                return proxies[int(idx) % len(proxies)]
-            except Exception:
-                pass
-        idx = random.randrange(len(proxies))
-        r.set(key, str(idx), ex=sticky_ttl)
-        return proxies[idx]
+        # Affinité (job, domaine) -> id de proxy: stable même si l'ordre de la liste change
+        proxy_id = sticky_get(job_id, domain, sticky_ttl)
+        if proxy_id is not None and proxy_id not in (exclude or ()):
+            if by_id is not None:
+                p = by_id.get(proxy_id)
+            else:
+                p = next((p for p in proxies if p['id'] == proxy_id), None)
+            if p is not None:
+                return p
+        candidates = [p for p in proxies if p['id'] not in exclude] if exclude else proxies
+        if not candidates:
+            return None
+        p = random.choice(candidates)
+        sticky_set(job_id, domain, p['id'], sticky_ttl)
+        return p
     # weighted_random default
     def w(p):
         # weight per label or host, else default 1.0
@@ -16,7 +16,8 @@ from pathlib import Path
 
 # Imports des modules proxy
 from .proxy_rotation import choose
-from .proxy_failover import can_use
+from .proxy_failover import acquire, report_result
+from .proxy_pool import ProxyPool
 from .redis_coordination import _ns
 
 # Configuration logging
@@ -64,7 +65,7 @@ def load_config() -> Dict[str, Any]:
     logger.debug(f"Configuration proxy finale: rotation_mode={default_config['rotation_mode']}")
     return default_config
 
-def get_db_connection() -> Optional[psycopg2.connection]:
+def get_db_connection() -> Optional["psycopg2.extensions.connection"]:
     """
     Obtient une connexion à la base de données avec gestion d'erreur robuste
     """
@@ -103,11 +104,10 @@ def fetch_active_proxies() -> List[Dict[str, Any]]:
                     last_success_at, last_failure_at, average_latency_ms,
                     circuit_breaker_status, circuit_breaker_failures,
                     circuit_breaker_last_failure, circuit_breaker_next_attempt,
-                    country_code, provider, label
+                    country_code, provider, label, sticky_group, sticky_tag
                 FROM proxies
                 WHERE active = true 
                   AND (cooldown_until IS NULL OR cooldown_until < NOW())
-                  AND (circuit_breaker_status != 'open' OR circuit_breaker_next_attempt < NOW())
                 ORDER BY 
                     CASE WHEN circuit_breaker_status = 'closed' THEN 1
                          WHEN circuit_breaker_status = 'half_open' THEN 2
@@ -141,66 +141,84 @@ def fetch_active_proxies() -> List[Dict[str, Any]]:
         logger.error(f"Erreur lors récupération proxies: {e}")
         return []
 
-def select_proxy(job_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+# Pool indexé par segment, rechargé depuis la base toutes les PROXY_POOL_REFRESH_SECONDS
+_pool = ProxyPool(fetch_active_proxies)
+
+def prepare_job(job_id: Optional[int]) -> int:
+    """
+    Résout une fois pour toutes les filtres proxy du job (à l'ouverture du spider)
+    
+    Returns:
+        Taille du segment de proxies retenu pour le job
+    """
+    try:
+        _pool.set_weights(load_config().get("weights", {}))
+        return len(_pool.segment_for_job(job_id))
+    except Exception as e:
+        logger.warning(f"Préparation du segment proxy du job {job_id} impossible: {e}")
+        return 0
+
+def release_job(job_id: Optional[int]):
+    """Oublie les filtres du job (fermeture du spider)"""
+    _pool.release_job(job_id)
+
+def select_proxy(job_id: Optional[int] = None, domain: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     Sélectionne un proxy pour un job donné avec failover automatique et logging détaillé
     
+    Seul le segment du job (pays / tag de pool) est parcouru; le circuit breaker
+    est consulté candidat par candidat au lieu de filtrer tout le pool.
+    
     Args:
-        job_id: ID du job (optionnel, pour sticky sessions)
+        job_id: ID du job (optionnel, pour filtres de segment et sticky sessions)
+        domain: Domaine cible (affinité sticky par couple job/domaine)
     
     Returns:
-        Dictionnaire du proxy sélectionné ou None
+        Dictionnaire du proxy sélectionné ou None. En mode sticky_session, le
+        dictionnaire porte 'sticky': True pour que l'appelant réutilise son contexte.
     """
     try:
         # Charger configuration avec variables d'environnement
         config = load_config()
+        _pool.set_weights(config.get("weights", {}))
         
-        # Récupérer proxies actifs
-        all_proxies = fetch_active_proxies()
-        if not all_proxies:
-            logger.warning("Aucun proxy actif disponible dans la base de données")
-            return None
-        
-        logger.debug(f"Évaluation de {len(all_proxies)} proxies pour sélection")
-        
-        # Filtrer proxies utilisables (circuit breaker, cooldown, etc.)
-        usable_proxies = []
-        for proxy in all_proxies:
-            try:
-                if can_use(proxy):
-                    usable_proxies.append(proxy)
-                    logger.debug(f"Proxy {proxy['id']} ({proxy['host']}:{proxy['port']}) utilisable")
-                else:
-                    logger.debug(f"Proxy {proxy['id']} ({proxy['host']}:{proxy['port']}) non utilisable "
-                               f"(circuit breaker ou failover)")
-            except Exception as e:
-                logger.warning(f"Erreur évaluation proxy {proxy.get('id', 'unknown')}: {e}")
-                continue
-        
-        if not usable_proxies:
-            logger.warning(f"Aucun proxy utilisable après filtrage failover. "
-                         f"Total évalués: {len(all_proxies)}")
-            
-            # Log des raisons pourquoi les proxies ne sont pas utilisables
-            for proxy in all_proxies[:5]:  # Log les 5 premiers pour debug
-                logger.debug(f"Proxy {proxy['id']}: cooldown_until={proxy.get('cooldown_until')}, "
-                           f"circuit_breaker_status={proxy.get('circuit_breaker_status')}, "
-                           f"consecutive_failures={proxy.get('consecutive_failures')}")
+        segment = _pool.segment_for_job(job_id)
+        if not segment:
+            logger.warning(f"Aucun proxy actif disponible pour le job {job_id}")
             return None
         
-        logger.debug(f"Proxies utilisables après filtrage: {len(usable_proxies)}")
-        
-        # Sélection selon la stratégie configurée
         rotation_mode = config.get("rotation_mode", "weighted_random")
-        logger.debug(f"Mode de rotation: {rotation_mode}")
-        
-        selected_proxy = choose(
-            proxies=usable_proxies,
-            mode=rotation_mode,
-            weights=config.get("weights", {}),
-            job_id=job_id,
-            sticky_ttl=config.get("sticky_ttl_seconds", 300)
-        )
+        logger.debug(f"Sélection dans un segment de {len(segment)} proxies (mode: {rotation_mode})")
+        
+        # Le circuit breaker (Redis) fait foi: un proxy ouvert, ou half_open sans
+        # sonde disponible, est écarté et on passe au candidat suivant du segment
+        selected_proxy = None
+        rejected = set()
+        for _ in range(2 * len(segment)):
+            if rotation_mode == "sticky_session":
+                proxy = choose(
+                    proxies=segment.proxies,
+                    by_id=segment.by_id,
+                    exclude=rejected,
+                    mode=rotation_mode,
+                    weights=config.get("weights", {}),
+                    job_id=job_id,
+                    sticky_ttl=config.get("sticky_ttl_seconds", 300),
+                    domain=domain
+                )
+            else:
+                proxy = segment.next(rotation_mode)
+            if proxy is None or len(rejected) >= len(segment):
+                break
+            if proxy['id'] in rejected:
+                continue
+            if acquire(proxy):
+                selected_proxy = proxy
+                if rotation_mode == "sticky_session":
+                    selected_proxy = dict(proxy, sticky=True)
+                break
+            logger.debug(f"Proxy {proxy['id']} refusé par le circuit breaker")
+            rejected.add(proxy['id'])
         
         if selected_proxy:
             # Log détaillé du proxy sélectionné
@@ -216,7 +234,8 @@ def select_proxy(job_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
                 logger.warning(f"Impossible de mettre à jour usage proxy {selected_proxy['id']}: {e}")
                 # Continue même si la mise à jour échoue
         else:
-            logger.warning("Aucun proxy sélectionné par l'algorithme de choix")
+            logger.warning(f"Aucun proxy utilisable dans le segment du job {job_id} "
+                           f"({len(rejected)} écartés par le circuit breaker)")
         
         return selected_proxy
         
@@ -224,6 +243,28 @@ def select_proxy(job_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
         logger.error(f"Erreur lors sélection proxy: {e}", exc_info=True)
         return None
 
+def mark_proxy_result(proxy_id: int, success: bool, error: Optional[str] = None):
+    """
+    Remonte le résultat d'une requête au circuit breaker du proxy
+    
+    Args:
+        proxy_id: ID du proxy utilisé
+        success: True si la requête a abouti
+        error: Message d'erreur éventuel (log uniquement)
+    """
+    config = load_config()
+    try:
+        report_result(
+            {'id': proxy_id},
+            success=success,
+            max_failures=config.get("circuit_breaker_failures", 5),
+            cooldown_seconds=config.get("circuit_breaker_cooldown_seconds", 600)
+        )
+        if not success:
+            logger.debug(f"Échec proxy {proxy_id} enregistré: {error}")
+    except Exception as e:
+        logger.warning(f"Impossible d'enregistrer le résultat du proxy {proxy_id}: {e}")
+
 def update_proxy_usage(proxy_id: int):
     """Met à jour les statistiques d'usage d'un proxy avec gestion d'erreur robuste"""
     try:
@@ -1,58 +1,231 @@
-import requests
-import concurrent.futures
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PROXY_WARMUP.PY - Warm-up et sonde de santé des proxies
+Description: Sonde tous les proxies actifs en parallèle (asyncio/aiohttp, concurrence
+bornée), mesure séparément connexion / TTFB / temps total et écrit les résultats
+dans proxies en un seul UPDATE par lots.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from urllib.parse import quote
+from typing import List, Dict, Any, Optional
+
+import aiohttp
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+# Configuration logging
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "db"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD"),
+    'connect_timeout': int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "30")),
+    'application_name': 'proxy_warmup'
+}
+
+# Cibles de sonde, séparées par des virgules (peut pointer vers un serveur HTTP local en test)
+DEFAULT_PROBE_URLS = [
+    u.strip() for u in os.getenv(
+        "PROXY_PROBE_URLS", "http://httpbin.org/ip,https://www.google.com/generate_204"
+    ).split(",") if u.strip()
+]
+DEFAULT_CONCURRENCY = int(os.getenv("PROXY_PROBE_CONCURRENCY", "50"))
+DEFAULT_TIMEOUT = float(os.getenv("PROXY_PROBE_TIMEOUT", "10"))
+
+# aiohttp ne gère nativement que les proxies HTTP(S)
+SUPPORTED_SCHEMES = {"http", "https"}
+
+def build_proxy_url(proxy: Dict[str, Any]) -> str:
+    """Construit l'URL du proxy avec identifiants encodés"""
+    auth = ""
+    if proxy.get('username'):
+        auth = f"{quote(str(proxy['username']), safe='')}:{quote(str(proxy.get('password') or ''), safe='')}@"
+    return f"{proxy.get('scheme') or 'http'}://{auth}{proxy['host']}:{proxy['port']}"
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """Horodate le début de requête, la fin de connexion et la réception des en-têtes"""
+    async def on_request_start(session, ctx, params):
+        ctx.trace_request_ctx.setdefault('start', time.perf_counter())
+
+    async def on_connection_create_end(session, ctx, params):
+        ctx.trace_request_ctx['connected'] = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        # Déclenché dès réception des en-têtes, avant lecture du corps
+        ctx.trace_request_ctx['headers'] = time.perf_counter()
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+def _avg(values: List[float]) -> Optional[int]:
+    return int(round(sum(values) / len(values))) if values else None
 
 class ProxyWarmer:
-    def __init__(self):
-        self.warm_urls = [
-            "http://httpbin.org/ip",
-            "http://httpbin.org/headers", 
-            "http://httpbin.org/user-agent",
-            "https://www.google.com",
-            "https://httpstat.us/200"
-        ]
-    
-    def warm_proxy(self, proxy_config):
-        """Réchauffe un proxy avec des requêtes de test"""
-        proxy_url = f"{proxy_config['scheme']}://"
-        if proxy_config.get('username'):
-            proxy_url += f"{proxy_config['username']}:{proxy_config['password']}@"
-        proxy_url += f"{proxy_config['host']}:{proxy_config['port']}"
-        
-        proxies = {'http': proxy_url, 'https': proxy_url}
-        success_count = 0
-        total_time = 0
-        
-        for url in self.warm_urls:
+    """
+    Sonde de santé des proxies
+
+    Chaque couple (proxy, URL cible) est une tâche asyncio; un sémaphore borne le nombre
+    de sondes simultanées. Les connexions ne sont pas réutilisées pour que le temps de
+    connexion soit mesuré à chaque sonde.
+    """
+
+    def __init__(self, probe_urls: Optional[List[str]] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.probe_urls = list(probe_urls or DEFAULT_PROBE_URLS)
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = float(timeout)
+
+    async def _probe_once(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                          proxy_url: str, url: str) -> Dict[str, Any]:
+        marks: Dict[str, float] = {}
+        async with sem:
             try:
-                start = time.time()
-                response = requests.get(url, proxies=proxies, timeout=10)
-                duration = time.time() - start
-                
-                if response.status_code == 200:
-                    success_count += 1
-                    total_time += duration
-                    
-                time.sleep(random.uniform(1, 3))  # Délai naturel
-                
-            except Exception:
-                pass
-        
-        # Mettre à jour les stats
-        if success_count > 0:
-            avg_time = (total_time / success_count) * 1000
-            success_rate = success_count / len(self.warm_urls)
-            
-            execute_query("""
-                UPDATE proxies SET 
-                    response_time_ms = %s,
-                    success_rate = %s,
-                    last_test_at = NOW()
-                WHERE id = %s
-            """, (avg_time, success_rate, proxy_config['id']))
-    
-    def warm_all_proxies(self):
-        """Réchauffe tous les proxies actifs en parallèle"""
-        proxies = execute_query("SELECT * FROM proxies WHERE active = true")
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            executor.map(self.warm_proxy, proxies)
\ No newline at end of file
+                async with session.get(url, proxy=proxy_url, trace_request_ctx=marks) as response:
+                    await response.read()
+                    end = time.perf_counter()
+                    start = marks.get('start', end)
+                    return {
+                        'ok': 200 <= response.status < 400,
+                        'status_code': response.status,
+                        'connect_ms': (marks['connected'] - start) * 1000 if 'connected' in marks else None,
+                        'ttfb_ms': (marks['headers'] - start) * 1000 if 'headers' in marks else None,
+                        'total_ms': (end - start) * 1000,
+                        'error': None if response.status < 400 else f"HTTP {response.status}",
+                    }
+            except asyncio.TimeoutError:
+                return {'ok': False, 'timeout': True, 'error': f"timeout après {self.timeout}s"}
+            except Exception as e:
+                return {'ok': False, 'error': f"{type(e).__name__}: {e}"[:500]}
+
+    async def _probe_proxy(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                           proxy: Dict[str, Any]) -> Dict[str, Any]:
+        proxy_url = build_proxy_url(proxy)
+        probes = await asyncio.gather(*(self._probe_once(session, sem, proxy_url, url)
+                                        for url in self.probe_urls))
+        ok = [p for p in probes if p['ok']]
+        failed = [p for p in probes if not p['ok']]
+
+        if ok:
+            status = 'success'
+        elif failed and all(p.get('timeout') for p in failed):
+            status = 'timeout'
+        else:
+            status = 'failed'
+
+        return {
+            'id': proxy['id'],
+            'status': status,
+            'success_rate': len(ok) / len(probes) if probes else 0.0,
+            'connect_ms': _avg([p['connect_ms'] for p in ok if p.get('connect_ms') is not None]),
+            'ttfb_ms': _avg([p['ttfb_ms'] for p in ok if p.get('ttfb_ms') is not None]),
+            'total_ms': _avg([p['total_ms'] for p in ok]),
+            'last_error': failed[-1]['error'] if failed else None,
+        }
+
+    async def probe_all(self, proxies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sonde une liste de proxies et retourne un résultat par proxy"""
+        candidates = []
+        for proxy in proxies:
+            if (proxy.get('scheme') or 'http') in SUPPORTED_SCHEMES:
+                candidates.append(proxy)
+            else:
+                logger.debug(f"Proxy {proxy.get('id')} ignoré: schéma {proxy.get('scheme')} non supporté par la sonde")
+        if not candidates or not self.probe_urls:
+            return []
+
+        sem = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, force_close=True)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         trace_configs=[_trace_config()]) as session:
+            return await asyncio.gather(*(self._probe_proxy(session, sem, p) for p in candidates))
+
+    def save_results(self, results: List[Dict[str, Any]]) -> int:
+        """Écrit tous les résultats dans proxies en un seul UPDATE"""
+        if not results:
+            return 0
+        rows = [(r['id'], r['status'], r['success_rate'], r['connect_ms'], r['ttfb_ms'],
+                 r['total_ms'], r['last_error']) for r in results]
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    UPDATE proxies AS p SET
+                        last_test_status = v.status,
+                        last_test_at = NOW(),
+                        success_rate = v.success_rate,
+                        connect_time_ms = COALESCE(v.connect_ms, p.connect_time_ms),
+                        ttfb_ms = COALESCE(v.ttfb_ms, p.ttfb_ms),
+                        response_time_ms = COALESCE(v.total_ms, p.response_time_ms),
+                        average_latency_ms = COALESCE(v.total_ms, p.average_latency_ms),
+                        last_error = COALESCE(v.last_error, p.last_error),
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v(id, status, success_rate, connect_ms, ttfb_ms, total_ms, last_error)
+                    WHERE p.id = v.id
+                """, rows, template="(%s::int, %s::text, %s::float, %s::int, %s::int, %s::int, %s::text)",
+                    page_size=max(len(rows), 1))
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Erreur écriture résultats de sonde proxies: {e}")
+            return 0
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def fetch_active_proxies(self) -> List[Dict[str, Any]]:
+        conn = None
+        try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT id, scheme, host, port, username, password FROM proxies WHERE active = true")
+                return [dict(r) for r in cur.fetchall()]
+        except Exception as e:
+            logger.error(f"Erreur récupération proxies actifs: {e}")
+            return []
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def warm_proxy(self, proxy_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Sonde un seul proxy et enregistre son résultat"""
+        results = asyncio.run(self.probe_all([proxy_config]))
+        self.save_results(results)
+        return results[0] if results else None
+
+    def warm_all_proxies(self) -> Dict[str, Any]:
+        """Sonde tous les proxies actifs en parallèle et retourne un résumé"""
+        started = time.perf_counter()
+        proxies = self.fetch_active_proxies()
+        results = asyncio.run(self.probe_all(proxies))
+        updated = self.save_results(results)
+        summary = {
+            'probed': len(results),
+            'healthy': sum(1 for r in results if r['status'] == 'success'),
+            'updated': updated,
+            'duration_s': round(time.perf_counter() - started, 2),
+        }
+        logger.info(f"Warm-up proxies: {summary}")
+        return summary
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ProxyWarmer().warm_all_proxies()
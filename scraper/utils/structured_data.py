@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+STRUCTURED_DATA.PY - Contacts des données structurées (JSON-LD, microdata, hCard)
+Description: Les annuaires professionnels décrivent souvent leurs membres en
+schema.org Person / Organization. Une lecture par page de ces blocs donne nom, email,
+téléphone et organisation sans heuristique de voisinage. Chaque format n'est analysé
+que si son marqueur figure dans le HTML (application/ld+json, itemscope, vcard/h-card).
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import unquote
+
+from scrapy.http import Response
+
+from .email_decoder import EMAIL_FULL_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Types schema.org traités comme une personne; les autres types porteurs d'un email
+# (Organization, LegalService, LocalBusiness, ContactPoint...) comme une organisation
+PERSON_TYPES = {'person', 'attorney', 'physician'}
+# Propriétés reliant une personne à son organisation, ou une organisation à ses membres
+ORG_LINKS = ('worksFor', 'affiliation', 'memberOf', 'parentOrganization')
+MEMBER_LINKS = ('employee', 'employees', 'member', 'members', 'founder', 'contactPoint', '@graph')
+
+HCARD_CLASSES = {
+    'name': ('fn', 'p-name'),
+    'email': ('email', 'u-email'),
+    'phone': ('tel', 'p-tel'),
+    'org': ('org', 'p-org'),
+}
+
+
+def _class_xpath(*classes: str) -> str:
+    return ' or '.join(f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in classes)
+
+
+def _clean_email(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    value = unquote(value.strip())
+    if value.lower().startswith('mailto:'):
+        value = value[7:].split('?', 1)[0]
+    return value if EMAIL_FULL_PATTERN.fullmatch(value) else None
+
+
+def _clean_phone(value: Any, normalize_phone: Optional[Callable[[str], Optional[str]]]) -> Optional[str]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.lower().startswith('tel:'):
+        value = unquote(value[4:])
+    if normalize_phone:
+        return normalize_phone(value) or value
+    return value
+
+
+def _text(value: Any) -> Optional[str]:
+    """Nom schema.org: chaîne, ou objet dont on prend le name"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name')
+    if isinstance(value, str) and value.strip():
+        return ' '.join(value.split())
+    return None
+
+
+def _types(node: Dict) -> set:
+    value = node.get('@type', ())
+    if isinstance(value, str):
+        value = (value,)
+    return {str(t).rsplit('/', 1)[-1].lower() for t in value}
+
+
+def _contact(name, org, email, phone) -> Dict[str, Optional[str]]:
+    return {'name': name, 'org': org, 'email': email, 'phone': phone}
+
+
+# ---------------------------------------------------------------------------
+# JSON-LD
+# ---------------------------------------------------------------------------
+
+def _walk_jsonld(node: Any, org: Optional[str], normalize_phone) -> Iterator[Dict]:
+    """Parcours récursif: chaque objet avec un email devient un contact"""
+    if isinstance(node, list):
+        for child in node:
+            yield from _walk_jsonld(child, org, normalize_phone)
+        return
+    if not isinstance(node, dict):
+        return
+
+    is_person = bool(_types(node) & PERSON_TYPES)
+    name = _text(node.get('name')) if is_person else None
+    if is_person:
+        own_org = next((o for o in (_text(node.get(link)) for link in ORG_LINKS) if o), org)
+    elif node.get('@type'):
+        own_org = _text(node.get('name')) or org
+    else:
+        own_org = org
+
+    emails = node.get('email')
+    for email in (emails if isinstance(emails, list) else [emails]):
+        email = _clean_email(email)
+        if email:
+            telephone = node.get('telephone')
+            if isinstance(telephone, list):
+                telephone = telephone[0] if telephone else None
+            yield _contact(name, own_org, email, _clean_phone(telephone, normalize_phone))
+
+    for link in MEMBER_LINKS + ORG_LINKS:
+        if link in node:
+            yield from _walk_jsonld(node[link], own_org, normalize_phone)
+
+
+def extract_jsonld(response: Response, normalize_phone=None) -> List[Dict]:
+    contacts = []
+    for block in response.xpath('//script[@type="application/ld+json"]/text()').getall():
+        try:
+            data = json.loads(block, strict=False)
+        except ValueError as e:
+            logger.debug(f"JSON-LD invalide sur {response.url}: {e}")
+            continue
+        contacts.extend(_walk_jsonld(data, None, normalize_phone))
+    return contacts
+
+
+# ---------------------------------------------------------------------------
+# Microdata
+# ---------------------------------------------------------------------------
+
+def _itemprop_value(prop) -> Optional[str]:
+    for attribute in ('content', 'href', 'value'):
+        value = prop.attrib.get(attribute)
+        if value:
+            return value
+    return ' '.join(' '.join(prop.xpath('.//text()').getall()).split()) or None
+
+
+def extract_microdata(response: Response, normalize_phone=None) -> List[Dict]:
+    contacts = []
+    for scope in response.xpath('//*[@itemscope][@itemtype]'):
+        # Propriétés du scope lui-même (pas celles d'un itemscope imbriqué)
+        props: Dict[str, str] = {}
+        for prop in scope.xpath('.//*[@itemprop]'):
+            owner = prop.xpath('ancestor::*[@itemscope][1]')
+            if not owner or owner[0].root is not scope.root:
+                continue
+            value = _itemprop_value(prop)
+            for key in prop.attrib['itemprop'].split():
+                props.setdefault(key, value)
+
+        email = _clean_email(props.get('email'))
+        if not email:
+            continue
+        is_person = scope.attrib['itemtype'].rsplit('/', 1)[-1].lower() in PERSON_TYPES
+        org = None
+        if is_person:
+            nested = scope.xpath('.//*[@itemprop="worksFor" or @itemprop="affiliation"]'
+                                 '//*[@itemprop="name"]/text()').get()
+            org = _text(nested or props.get('worksFor') or props.get('affiliation'))
+        else:
+            org = _text(props.get('name'))
+        contacts.append(_contact(
+            _text(props.get('name')) if is_person else None,
+            org,
+            email,
+            _clean_phone(props.get('telephone'), normalize_phone),
+        ))
+    return contacts
+
+
+# ---------------------------------------------------------------------------
+# hCard (microformats v1 "vcard" et v2 "h-card")
+# ---------------------------------------------------------------------------
+
+def extract_hcard(response: Response, normalize_phone=None) -> List[Dict]:
+    contacts = []
+    for card in response.xpath(f'//*[{_class_xpath("vcard", "h-card")}]'):
+        values: Dict[str, Optional[str]] = {}
+        for field, classes in HCARD_CLASSES.items():
+            element = card.xpath(f'.//*[{_class_xpath(*classes)}]')
+            if not element:
+                continue
+            element = element[0]
+            href = element.attrib.get('href', '')
+            if field in ('email', 'phone') and href.lower().startswith(('mailto:', 'tel:')):
+                values[field] = href
+            else:
+                values[field] = ' '.join(' '.join(element.xpath('.//text()').getall()).split()) or None
+
+        email = _clean_email(values.get('email'))
+        if email:
+            contacts.append(_contact(
+                _text(values.get('name')),
+                _text(values.get('org')),
+                email,
+                _clean_phone(values.get('phone'), normalize_phone),
+            ))
+    return contacts
+
+
+def extract_structured_contacts(response: Response, page_html: str,
+                                normalize_phone: Optional[Callable[[str], Optional[str]]] = None
+                                ) -> List[Dict[str, Optional[str]]]:
+    """
+    Contacts décrits en données structurées, dédoublonnés par email
+
+    Args:
+        response: Réponse Scrapy (sélecteurs)
+        page_html: HTML brut, pour tester la présence de chaque format avant analyse
+        normalize_phone: Normalisation des téléphones (E.164 du pays du job)
+
+    Returns:
+        [{'name', 'org', 'email', 'phone'}, ...]; un champ absent vaut None et le
+        premier format qui le renseigne l'emporte
+    """
+    extractors = (
+        ('application/ld+json', extract_jsonld),
+        ('itemscope', extract_microdata),
+        ('vcard', extract_hcard),
+        ('h-card', extract_hcard),
+    )
+    merged: Dict[str, Dict[str, Optional[str]]] = {}
+    done = set()
+    for marker, extractor in extractors:
+        if extractor in done or marker not in page_html:
+            continue
+        done.add(extractor)
+        try:
+            found = extractor(response, normalize_phone)
+        except Exception as e:
+            logger.warning(f"Données structurées illisibles ({extractor.__name__}) sur {response.url}: {e}")
+            continue
+        for contact in found:
+            current = merged.setdefault(contact['email'].lower(), contact)
+            for key, value in contact.items():
+                if value and not current.get(key):
+                    current[key] = value
+    return list(merged.values())
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Extension Scrapy des benchmarks
+
+Ajoutée par run_crawl_benchmark.py via -s EXTENSIONS: relève la latence de
+téléchargement de chaque réponse (meta download_latency) et écrit, à la fermeture du
+spider, ces latences et les stats du crawler dans le fichier BENCH_RESULT_FILE.
+"""
+
+import json
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyRecorder:
+
+    def __init__(self, crawler, result_file: str):
+        self.crawler = crawler
+        self.result_file = result_file
+        self.latencies = []
+        self.statuses = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        result_file = crawler.settings.get("BENCH_RESULT_FILE")
+        if not result_file:
+            raise NotConfigured
+        ext = cls(crawler, result_file)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            self.latencies.append(round(float(latency), 6))
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+
+    def spider_closed(self, spider, reason):
+        stats = {k: (v.isoformat() if hasattr(v, 'isoformat') else v)
+                 for k, v in self.crawler.stats.get_stats().items()}
+        with open(self.result_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'finish_reason': reason,
+                'latencies': self.latencies,
+                'statuses': self.statuses,
+                'stats': stats,
+            }, f)
+        logger.info(f"Résultats du benchmark écrits dans {self.result_file}")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MICRO_BENCHMARKS.PY - Micro-benchmarks de l'extraction, de la validation et des URLs
+Description: Chronomètre les fonctions chaudes du spider et du pipeline sur un corpus
+de pages HTML: fichiers *.html de --corpus (pages réelles sauvegardées, l'URL d'origine
+peut être donnée par <link rel="canonical">), sinon pages générées par le site
+synthétique. Entrées dérivées du corpus avec une graine fixe, GC désactivé pendant la
+mesure, médiane sur --rounds passes. --baseline signale les régressions au-delà du seuil.
+
+    python tests/benchmarks/micro_benchmarks.py --corpus ~/pages --output micro.json
+    python tests/benchmarks/micro_benchmarks.py --baseline micro.json --filter phone
+"""
+
+import os
+import re
+import gc
+import sys
+import glob
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import platform
+import statistics
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from scrapy.http import HtmlResponse
+
+from scraper.spiders.single_url import SingleUrlSpider
+from scraper.pipelines import validate_email, clean_text_field
+from scraper.utils.filters import page_lang_from_text
+from scraper.utils.url_normalizer import normalize
+from synthetic_site import SyntheticSite, SiteConfig
+from run_crawl_benchmark import git_version
+
+DEFAULT_CORPUS_DIR = os.path.join(BENCH_DIR, 'corpus')
+KEYWORDS = ['avocat', 'immigration', 'visa', 'lawyer', 'contact']
+CANONICAL_PATTERN = re.compile(r'<link[^>]+rel=["\']canonical["\'][^>]+href=["\']([^"\']+)', re.I)
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def load_corpus(corpus_dir: str, synthetic_pages: int, seed: int) -> Tuple[List[HtmlResponse], str]:
+    """Pages du répertoire corpus, ou pages synthétiques si le répertoire est vide"""
+    files = sorted(glob.glob(os.path.join(corpus_dir, '*.htm*')))
+    responses = []
+    if files:
+        for path in files:
+            with open(path, 'rb') as f:
+                body = f.read()
+            match = CANONICAL_PATTERN.search(body[:20000].decode('utf-8', 'ignore'))
+            url = match.group(1) if match else f"https://{os.path.splitext(os.path.basename(path))[0]}.fr/"
+            responses.append(HtmlResponse(url=url, body=body, encoding='utf-8'))
+        return responses, f"files:{corpus_dir}"
+
+    site = SyntheticSite(SiteConfig(depth=3, fanout=6, page_kb=30, emails_per_page=3.0, seed=seed))
+    rng = random.Random(seed)
+    for _ in range(synthetic_pages):
+        node = tuple(rng.randrange(6) for _ in range(rng.randint(0, 3)))
+        path = '/n/' + '/'.join(map(str, node)) if node else '/'
+        responses.append(HtmlResponse(url=f"https://cabinet-bench.fr{path}",
+                                      body=site._render_page(node), encoding='utf-8'))
+    return responses, f"synthetic:seed={seed}"
+
+
+def corpus_digest(responses: List[HtmlResponse]) -> str:
+    digest = hashlib.sha256()
+    for response in responses:
+        digest.update(response.body)
+    return digest.hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def build_benchmarks(responses: List[HtmlResponse], seed: int) -> Dict[str, Tuple[Callable, int]]:
+    """{nom: (fonction d'une passe sur le corpus, nombre d'éléments traités par passe)}"""
+    rng = random.Random(seed)
+    spider = SingleUrlSpider(url=responses[0].url, custom_keywords=json.dumps(KEYWORDS))
+
+    texts = [spider._extract_page_text(r) for r in responses]
+    analyses = [spider.matches_custom_keywords(t) for t in texts]
+    matching = [(r, t, a) for r, t, a in zip(responses, texts, analyses) if a['matches']] \
+        or list(zip(responses, texts, analyses))
+
+    emails = [e for t in texts for e in spider.EMAIL_PATTERN.findall(t)]
+    emails += [f"{rng.choice(['noreply', 'jean.dupont', 'x'])}@{rng.choice(['site', 'test', 'a'])}."
+               f"{rng.choice(['fr', 'com', 'c'])}" for _ in range(max(50, len(emails) // 4))]
+    rng.shuffle(emails)
+    fields = [t[rng.randrange(max(1, len(t) - 300)):][:rng.choice([20, 80, 300])] for t in texts]
+    fields += ['', '   ', 'Jean\tDupont\n']
+
+    urls = [r.urljoin(u) for r in responses for u in r.xpath('//a/@href').getall()] \
+        or [r.url for r in responses]
+    urls += [u.upper().replace('HTTPS://', 'https://') + '?b=2&a=1' for u in urls[:len(urls) // 3]]
+    rng.shuffle(urls)
+
+    def per_item(fn, items):
+        def run():
+            for item in items:
+                fn(item)
+        return run, len(items)
+
+    def contacts():
+        for response, text, analysis in matching:
+            spider._extract_contacts_from_page(response, text, analysis)
+
+    return {
+        'spider.extract_page_text': per_item(spider._extract_page_text, responses),
+        'spider.matches_custom_keywords': per_item(spider.matches_custom_keywords, texts),
+        'spider.extract_contacts_from_page': (contacts, len(matching)),
+        'phone_extractor.extract': per_item(spider.phone_extractor.extract, texts),
+        'spider.detect_language': per_item(spider._detect_language, texts),
+        'pipelines.validate_email': per_item(validate_email, emails),
+        'pipelines.clean_text_field': per_item(clean_text_field, fields),
+        'filters.page_lang_from_text': per_item(page_lang_from_text, texts),
+        'url_normalizer.normalize': per_item(normalize, urls),
+    }
+
+
+def measure(fn: Callable, rounds: int, warmup: int = 2) -> List[float]:
+    """Durées (s) de `rounds` passes, GC désactivé comme timeit"""
+    for _ in range(warmup):
+        fn()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return timings
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Compare les médianes à la référence; retourne les benchmarks en régression"""
+    regressions = []
+    print(f"\n{'benchmark':<36}{'réf. ms':>10}{'ms':>10}{'écart':>10}")
+    for name, result in results.items():
+        old = baseline.get(name, {}).get('median_ms')
+        if not old:
+            continue
+        delta = (result['median_ms'] - old) / old
+        flag = ''
+        if delta > max_regression:
+            regressions.append(name)
+            flag = '  <- régression'
+        print(f"{name:<36}{old:>10.3f}{result['median_ms']:>10.3f}{delta:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks extraction / validation / URLs")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS_DIR, help="Répertoire de pages *.html")
+    parser.add_argument('--synthetic-pages', type=int, default=60,
+                        help="Taille du corpus généré si --corpus est vide")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--filter', help="Ne lance que les benchmarks dont le nom contient ce texte")
+    parser.add_argument('--output', help="Fichier JSON de résultats")
+    parser.add_argument('--baseline', help="Résultats JSON de référence à comparer")
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help="Ralentissement toléré de la médiane avant code de sortie 1 (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    # Les fonctions mesurées journalisent par contact: pas d'E/S de log dans la mesure
+    logging.basicConfig(level=logging.WARNING)
+    logging.disable(logging.INFO)
+    random.seed(args.seed)
+
+    responses, source = load_corpus(args.corpus, args.synthetic_pages, args.seed)
+    digest = corpus_digest(responses)
+    print(f"Corpus: {len(responses)} pages ({source}, sha256 {digest})")
+
+    results = {}
+    for name, (fn, items) in build_benchmarks(responses, args.seed).items():
+        if args.filter and args.filter not in name:
+            continue
+        timings = measure(fn, args.rounds)
+        median = statistics.median(timings)
+        results[name] = {
+            'items': items,
+            'rounds': args.rounds,
+            'median_ms': round(median * 1000, 4),
+            'min_ms': round(min(timings) * 1000, 4),
+            'mean_ms': round(statistics.mean(timings) * 1000, 4),
+            'stdev_ms': round(statistics.stdev(timings) * 1000, 4) if len(timings) > 1 else 0.0,
+            'per_item_us': round(median / max(items, 1) * 1e6, 3),
+        }
+        print(f"{name:<36}{results[name]['median_ms']:>10.3f} ms  "
+              f"{results[name]['per_item_us']:>10.3f} µs/élément  ({items} éléments)")
+
+    report_data = {
+        'benchmark': 'micro_extraction',
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'corpus': {'source': source, 'pages': len(responses), 'sha256': digest, 'seed': args.seed},
+        'results': results,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report_data, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus', {}).get('sha256') != digest:
+            print("Attention: corpus différent de celui de la référence, comparaison indicative")
+        regressions = compare(results, baseline.get('results', {}), args.max_regression)
+        if regressions:
+            print(f"Régression au-delà de {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
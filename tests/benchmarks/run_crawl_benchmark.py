@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RUN_CRAWL_BENCHMARK.PY - Benchmark hors ligne du spider single_url
+Description: Démarre le site synthétique local (synthetic_site.py), crée un job de
+benchmark dans la base, lance `scrapy crawl single_url` contre le site avec la
+configuration du projet (Postgres et Redis locaux, sans Playwright ni proxies) et
+mesure pages/s, contacts/s, latence p50/p95 des pages et pic de mémoire RSS.
+Le résultat JSON (--output) sert de référence pour les versions suivantes (--baseline).
+
+    python tests/benchmarks/run_crawl_benchmark.py --depth 3 --fanout 5 --runs 3 \\
+        --output benchmarks/crawl_$(git rev-parse --short HEAD).json \\
+        --baseline benchmarks/crawl_main.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib.util
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, '..', '..'))
+
+# Services locaux par défaut (surcharge possible par l'environnement)
+os.environ.setdefault("POSTGRES_HOST", "localhost")
+os.environ.setdefault("REDIS_HOST", "localhost")
+
+import psutil
+import psycopg2
+
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, BENCH_DIR)
+from synthetic_site import SyntheticSite, add_site_arguments, site_config_from_args
+
+DB_CONFIG = {
+    'host': os.getenv("POSTGRES_HOST", "localhost"),
+    'port': int(os.getenv("POSTGRES_PORT", "5432")),
+    'dbname': os.getenv("POSTGRES_DB", "scraper_pro"),
+    'user': os.getenv("POSTGRES_USER", "scraper_admin"),
+    'password': os.getenv("POSTGRES_PASSWORD", "scraper_admin"),
+    'connect_timeout': 10,
+    'application_name': 'crawl_benchmark'
+}
+
+# Métriques comparées à la référence: True si une valeur plus haute est meilleure
+TRACKED_METRICS = {
+    'pages_per_sec': True,
+    'contacts_per_sec': True,
+    'latency_p50_ms': False,
+    'latency_p95_ms': False,
+    'peak_rss_mb': False,
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile au rang le plus proche (None si aucune valeur)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def git_version() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Job de benchmark en base
+# ---------------------------------------------------------------------------
+
+def create_job(url: str, keywords: List[str], max_pages: int) -> int:
+    with psycopg2.connect(**DB_CONFIG) as conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO queue (url, custom_keywords, match_mode, min_matches, use_js,
+                               max_pages_per_domain, status, created_by, created_at)
+            VALUES (%s, %s, 'any', 1, false, %s, 'in_progress', 'benchmark', NOW())
+            RETURNING id
+        """, (url, json.dumps(keywords), max_pages))
+        return cur.fetchone()[0]
+
+
+def cleanup_job(job_id: int):
+    """Supprime les contacts, erreurs et le job créés par le benchmark"""
+    with psycopg2.connect(**DB_CONFIG) as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM contacts WHERE query_id = %s", (job_id,))
+        cur.execute("DELETE FROM error_events WHERE job_id = %s", (job_id,))
+        cur.execute("DELETE FROM queue WHERE id = %s", (job_id,))
+    try:
+        from scraper.utils.job_stats import job_stats_key
+        from scraper.utils.redis_coordination import get_redis_client
+        get_redis_client().delete(job_stats_key(job_id))
+    except Exception:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Exécution du spider
+# ---------------------------------------------------------------------------
+
+def build_command(url: str, job_id: int, args: argparse.Namespace, result_file: str) -> List[str]:
+    extensions = {"scraper.extensions.RedisStatsBridge": 500, "bench_extension.LatencyRecorder": 900}
+    middlewares = {"scraper.middlewares.RotatingProxyMiddleware": 543} if args.proxy_middleware else {}
+    # allowed_domains contient host:port, que OffsiteMiddleware ignore: le filtre
+    # same-domain du spider (_should_follow_link) suffit pour le site local
+    # (middleware de téléchargement depuis Scrapy 2.11.2, de spider avant 2.13)
+    spider_middlewares = {}
+    if importlib.util.find_spec("scrapy.downloadermiddlewares.offsite"):
+        middlewares["scrapy.downloadermiddlewares.offsite.OffsiteMiddleware"] = None
+    if importlib.util.find_spec("scrapy.spidermiddlewares.offsite"):
+        spider_middlewares["scrapy.spidermiddlewares.offsite.OffsiteMiddleware"] = None
+    return [
+        sys.executable, '-m', 'scrapy', 'crawl', 'single_url',
+        '-a', f"url={url}",
+        '-a', f"query_id={job_id}",
+        '-a', f"custom_keywords={json.dumps(args.keywords)}",
+        '-a', "match_mode=any",
+        '-a', "use_js=False",
+        '-a', f"max_pages_per_domain={args.max_pages}",
+        # Téléchargement HTTP natif de Scrapy: le site est statique et local
+        '-s', "DOWNLOAD_HANDLERS={}",
+        '-s', f"DOWNLOADER_MIDDLEWARES={json.dumps(middlewares)}",
+        '-s', f"SPIDER_MIDDLEWARES={json.dumps(spider_middlewares)}",
+        '-s', f"EXTENSIONS={json.dumps(extensions)}",
+        '-s', f"BENCH_RESULT_FILE={result_file}",
+        '-s', f"CONCURRENT_REQUESTS={args.concurrency}",
+        '-s', f"CONCURRENT_REQUESTS_PER_DOMAIN={args.concurrency}",
+        '-s', f"DOWNLOAD_DELAY={args.download_delay}",
+        '-s', "STATS_BRIDGE_INTERVAL=1",
+        '-s', f"LOG_LEVEL={args.log_level}",
+    ]
+
+
+def run_once(url: str, job_id: int, args: argparse.Namespace, log_path: str) -> Dict:
+    """Un crawl complet; pic RSS échantillonné sur le processus et ses enfants"""
+    fd, result_file = tempfile.mkstemp(prefix='bench_', suffix='.json')
+    os.close(fd)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (PROJECT_ROOT, BENCH_DIR, env.get('PYTHONPATH')) if p)
+    env['SCRAPY_SETTINGS_MODULE'] = 'scraper.settings'
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+    peak_rss = 0
+    started = time.perf_counter()
+    with open(log_path, 'a', encoding='utf-8') as log:
+        process = subprocess.Popen(build_command(url, job_id, args, result_file),
+                                   cwd=os.path.join(PROJECT_ROOT, 'scraper'), env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        proc = psutil.Process(process.pid)
+        try:
+            while process.poll() is None:
+                try:
+                    rss = proc.memory_info().rss + sum(
+                        child.memory_info().rss for child in proc.children(recursive=True))
+                    peak_rss = max(peak_rss, rss)
+                except psutil.Error:
+                    pass
+                if time.perf_counter() - started > args.timeout:
+                    process.terminate()
+                    process.wait(timeout=30)
+                    break
+                time.sleep(0.05)
+        finally:
+            if process.poll() is None:
+                process.kill()
+    wall = time.perf_counter() - started
+
+    try:
+        with open(result_file, encoding='utf-8') as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        raise RuntimeError(f"Le crawl n'a pas produit de résultats (code {process.returncode}), voir {log_path}")
+    finally:
+        os.unlink(result_file)
+
+    stats = raw['stats']
+    elapsed = float(stats.get('elapsed_time_seconds') or wall)
+    pages = int(stats.get('downloader/response_status_count/200', 0))
+    contacts = int(stats.get('contacts/saved', 0))
+    latencies_ms = [lat * 1000 for lat in raw['latencies']]
+    return {
+        'returncode': process.returncode,
+        'finish_reason': raw['finish_reason'],
+        'wall_seconds': round(wall, 3),
+        'crawl_seconds': round(elapsed, 3),
+        'pages': pages,
+        'responses': int(stats.get('response_received_count', 0)),
+        'items': int(stats.get('item_scraped_count', 0)),
+        'contacts_saved': contacts,
+        'retries': int(stats.get('retry/count', 0)),
+        'statuses': raw['statuses'],
+        'pages_per_sec': round(pages / elapsed, 3) if elapsed else None,
+        'contacts_per_sec': round(contacts / elapsed, 3) if elapsed else None,
+        'latency_p50_ms': round(percentile(latencies_ms, 50), 2) if latencies_ms else None,
+        'latency_p95_ms': round(percentile(latencies_ms, 95), 2) if latencies_ms else None,
+        'peak_rss_mb': round(peak_rss / 1024 / 1024, 1),
+    }
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    """Médiane de chaque métrique suivie sur les exécutions"""
+    summary = {}
+    for metric in TRACKED_METRICS:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        summary[metric] = round(statistics.median(values), 3) if values else None
+    return summary
+
+
+def compare(summary: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Affiche l'écart à la référence; retourne les métriques en régression"""
+    regressions = []
+    print(f"\n{'métrique':<18}{'référence':>12}{'actuel':>12}{'écart':>10}")
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        old, new = baseline.get(metric), summary.get(metric)
+        if not old or new is None:
+            continue
+        delta = (new - old) / old
+        worse = -delta if higher_is_better else delta
+        flag = ''
+        if worse > max_regression:
+            regressions.append(metric)
+            flag = '  <- régression'
+        print(f"{metric:<18}{old:>12}{new:>12}{delta:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du spider single_url")
+    add_site_arguments(parser)
+    crawl = parser.add_argument_group("crawl")
+    crawl.add_argument('--runs', type=int, default=1, help="Nombre d'exécutions (médiane)")
+    crawl.add_argument('--concurrency', type=int, default=16)
+    crawl.add_argument('--download-delay', type=float, default=0.0)
+    crawl.add_argument('--max-pages', type=int, default=None,
+                       help="max_pages_per_domain du spider (défaut: toutes les pages du site)")
+    crawl.add_argument('--keywords', nargs='+', default=['avocat', 'immigration', 'visa'])
+    crawl.add_argument('--proxy-middleware', action='store_true',
+                       help="Garde RotatingProxyMiddleware (sélection de proxy incluse dans la mesure)")
+    crawl.add_argument('--timeout', type=float, default=600.0, help="Durée max d'un crawl (s)")
+    crawl.add_argument('--log-level', default='WARNING')
+    crawl.add_argument('--log-file', default=os.path.join(tempfile.gettempdir(), 'crawl_benchmark.log'))
+    crawl.add_argument('--keep-data', action='store_true', help="Ne pas supprimer job et contacts")
+    report = parser.add_argument_group("rapport")
+    report.add_argument('--output', help="Fichier JSON de résultats")
+    report.add_argument('--baseline', help="Résultats JSON de référence à comparer")
+    report.add_argument('--max-regression', type=float, default=0.10,
+                        help="Dégradation tolérée avant code de sortie 1 (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    site_config = site_config_from_args(args)
+    site_config.keywords = tuple(args.keywords)
+    if args.max_pages is None:
+        args.max_pages = site_config.total_pages
+
+    site = SyntheticSite(site_config)
+    url = site.start()
+    print(f"Site synthétique: {url} ({site_config.total_pages} pages), log: {args.log_file}")
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            # Même travail à chaque run: les pages limitées renvoient de nouveau un 429
+            site.reset_hits()
+            before = site.stats()
+            job_id = create_job(url, args.keywords, args.max_pages)
+            try:
+                result = run_once(url, job_id, args, args.log_file)
+            finally:
+                if not args.keep_data:
+                    cleanup_job(job_id)
+            result['job_id'] = job_id
+            result['rate_limited'] = site.stats()['rate_limited'] - before['rate_limited']
+            runs.append(result)
+            print(f"run {i + 1}/{args.runs}: {result['pages']} pages, {result['contacts_saved']} contacts "
+                  f"en {result['crawl_seconds']}s - {result['pages_per_sec']} pages/s, "
+                  f"p95 {result['latency_p95_ms']}ms, RSS {result['peak_rss_mb']}MB")
+    finally:
+        server_stats = site.stats()
+        site.stop()
+
+    try:
+        import scrapy
+        scrapy_version = scrapy.__version__
+    except ImportError:
+        scrapy_version = None
+
+    report_data = {
+        'benchmark': 'crawl_single_url',
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'scrapy': scrapy_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'site': site_config.to_dict(),
+        'crawl': {
+            'concurrency': args.concurrency,
+            'download_delay': args.download_delay,
+            'max_pages': args.max_pages,
+            'keywords': args.keywords,
+            'proxy_middleware': args.proxy_middleware,
+        },
+        'server': server_stats,
+        'runs': runs,
+        'summary': summarize(runs),
+    }
+
+    print(json.dumps(report_data['summary'], indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report_data, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('summary', {})
+        regressions = compare(report_data['summary'], baseline, args.max_regression)
+        if regressions:
+            print(f"Régression au-delà de {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SYNTHETIC_SITE.PY - Site web synthétique local pour les benchmarks
+Description: Arborescence de pages HTML déterministe (graine) servie par http.server:
+profondeur et nombre de liens par page, taille des pages, densité d'emails, part de
+pages lentes et de réponses 429 (la première requête d'une page limitée reçoit un 429
+avec Retry-After, les suivantes passent). Utilisé par run_crawl_benchmark.py, ou seul:
+
+    python tests/benchmarks/synthetic_site.py --port 8765 --depth 3 --fanout 5
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass, asdict, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+FIRST_NAMES = ['Jean', 'Marie', 'Pierre', 'Sophie', 'Lucas', 'Camille', 'Thomas', 'Julie',
+               'Nicolas', 'Claire', 'Antoine', 'Laura', 'David', 'Emma', 'Paul', 'Sarah']
+LAST_NAMES = ['Martin', 'Bernard', 'Dubois', 'Durand', 'Leroy', 'Moreau', 'Simon', 'Laurent',
+              'Lefebvre', 'Michel', 'Garcia', 'Roux', 'Fournier', 'Girard', 'Bonnet', 'Mercier']
+FIRMS = ['cabinet-martin', 'juris-conseil', 'avocats-associes', 'lex-partners', 'droit-etrangers']
+FILLER = ('le cabinet accompagne les particuliers et les entreprises dans leurs démarches '
+          'administratives avec une équipe expérimentée pour tous les dossiers de séjour '
+          'the firm advises clients on residence permits and work authorisations with '
+          'dedicated lawyers in each office for this kind of request and that procedure').split()
+LINK_LABELS = ['Contact', 'About', 'Équipe', 'Services', 'Actualités', 'Bureaux', 'Tarifs']
+
+
+@dataclass
+class SiteConfig:
+    """Forme du site généré (toutes les pages se déduisent de la graine)"""
+    depth: int = 3
+    fanout: int = 5
+    page_kb: int = 20
+    emails_per_page: float = 2.0
+    slow_ratio: float = 0.05
+    slow_delay: float = 1.0
+    rate_limit_ratio: float = 0.02
+    seed: int = 42
+    keywords: Tuple[str, ...] = field(default=('avocat', 'immigration', 'visa'))
+
+    @property
+    def total_pages(self) -> int:
+        return sum(self.fanout ** d for d in range(self.depth + 1))
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['keywords'] = list(self.keywords)
+        data['total_pages'] = self.total_pages
+        return data
+
+
+class SyntheticSite:
+    """
+    Serveur HTTP du site synthétique (thread de fond, port éphémère par défaut)
+
+    Usage:
+        site = SyntheticSite(SiteConfig(depth=2))
+        base_url = site.start()
+        ...
+        site.stop()
+    """
+
+    def __init__(self, config: SiteConfig = None, host: str = '127.0.0.1', port: int = 0):
+        self.config = config or SiteConfig()
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self.counters = {'requests': 0, 'pages': 0, 'not_found': 0, 'rate_limited': 0, 'slow': 0}
+        self._render = lru_cache(maxsize=None)(self._render_page)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    # ------------------------------------------------------------------
+    # Contenu
+    # ------------------------------------------------------------------
+
+    def _rng(self, path: str) -> random.Random:
+        return random.Random(f"{self.config.seed}:{path}")
+
+    @staticmethod
+    def _node(path: str) -> Optional[Tuple[int, ...]]:
+        """'/' -> (), '/n/0/3' -> (0, 3); None si le chemin n'existe pas"""
+        path = path.split('?', 1)[0].rstrip('/')
+        if path == '':
+            return ()
+        parts = path.split('/')[1:]
+        if parts[0] != 'n':
+            return None
+        try:
+            return tuple(int(p) for p in parts[1:])
+        except ValueError:
+            return None
+
+    def _valid(self, node: Tuple[int, ...]) -> bool:
+        return len(node) <= self.config.depth and all(0 <= i < self.config.fanout for i in node)
+
+    def _render_page(self, node: Tuple[int, ...]) -> bytes:
+        cfg = self.config
+        path = '/n/' + '/'.join(map(str, node)) if node else '/'
+        rng = self._rng(path)
+        page_id = '-'.join(map(str, node)) or 'root'
+
+        blocks = [f"<p>{' '.join(rng.choice(FILLER) for _ in range(40))} "
+                  f"{' '.join(rng.sample(list(cfg.keywords), k=min(2, len(cfg.keywords))))}.</p>"]
+
+        n_emails = int(cfg.emails_per_page) + (rng.random() < cfg.emails_per_page % 1)
+        for i in range(n_emails):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            email = f"{first.lower()}.{last.lower()}.{page_id}.{i}@{rng.choice(FIRMS)}.fr"
+            phone = f"+33 1 {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}"
+            blocks.append(f"<p>Contact: M. {first} {last} - avocat - {email} - tél. {phone}</p>")
+
+        links = []
+        if len(node) < cfg.depth:
+            for i in range(cfg.fanout):
+                child = '/n/' + '/'.join(map(str, node + (i,)))
+                links.append(f'<li><a href="{child}">{LINK_LABELS[i % len(LINK_LABELS)]} {i}</a></li>')
+        if node:
+            parent = '/n/' + '/'.join(map(str, node[:-1])) if len(node) > 1 else '/'
+            links.append(f'<li><a href="{parent}">Retour</a></li>')
+
+        head = (f"<!DOCTYPE html><html lang=\"fr\"><head><meta charset=\"utf-8\">"
+                f"<title>Cabinet {page_id} - {' '.join(cfg.keywords)}</title>"
+                f"<meta name=\"description\" content=\"Page {page_id} du site de benchmark\">"
+                f"</head><body><nav><ul>{''.join(links)}</ul></nav><main>")
+        html = head + ''.join(blocks)
+
+        # Remplissage jusqu'à la taille cible
+        target = cfg.page_kb * 1024
+        filler = []
+        size = len(html.encode('utf-8'))
+        while size < target:
+            paragraph = f"<p>{' '.join(rng.choice(FILLER) for _ in range(60))}</p>"
+            filler.append(paragraph)
+            size += len(paragraph.encode('utf-8'))
+        return (html + ''.join(filler) + "</main></body></html>").encode('utf-8')
+
+    def respond(self, path: str) -> Tuple[int, bytes, Dict[str, str], float]:
+        """(statut, corps, en-têtes, délai à appliquer) pour un chemin demandé"""
+        node = self._node(path)
+        with self._lock:
+            self.counters['requests'] += 1
+            if node is None or not self._valid(node):
+                self.counters['not_found'] += 1
+                return 404, b"not found", {}, 0.0
+            hits = self._hits[path] = self._hits.get(path, 0) + 1
+
+        rng = self._rng(path + '#behaviour')
+        limited = rng.random() < self.config.rate_limit_ratio
+        slow = rng.random() < self.config.slow_ratio
+        if limited and hits == 1:
+            with self._lock:
+                self.counters['rate_limited'] += 1
+            return 429, b"too many requests", {'Retry-After': '1'}, 0.0
+
+        with self._lock:
+            self.counters['pages'] += 1
+            if slow:
+                self.counters['slow'] += 1
+        return 200, self._render(node), {'Content-Type': 'text/html; charset=utf-8'}, \
+            self.config.slow_delay if slow else 0.0
+
+    # ------------------------------------------------------------------
+    # Serveur
+    # ------------------------------------------------------------------
+
+    def start(self) -> str:
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status, body, headers, delay = site.respond(self.path)
+                if delay:
+                    time.sleep(delay)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="synthetic-site", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def reset_hits(self):
+        """Oublie les pages déjà servies: chaque run repasse par les mêmes 429"""
+        with self._lock:
+            self._hits.clear()
+
+
+def add_site_arguments(parser: argparse.ArgumentParser):
+    """Options de forme du site, partagées avec run_crawl_benchmark.py"""
+    defaults = SiteConfig()
+    group = parser.add_argument_group("site synthétique")
+    group.add_argument('--depth', type=int, default=defaults.depth)
+    group.add_argument('--fanout', type=int, default=defaults.fanout)
+    group.add_argument('--page-kb', type=int, default=defaults.page_kb)
+    group.add_argument('--emails-per-page', type=float, default=defaults.emails_per_page)
+    group.add_argument('--slow-ratio', type=float, default=defaults.slow_ratio)
+    group.add_argument('--slow-delay', type=float, default=defaults.slow_delay)
+    group.add_argument('--rate-limit-ratio', type=float, default=defaults.rate_limit_ratio)
+    group.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def site_config_from_args(args: argparse.Namespace) -> SiteConfig:
+    return SiteConfig(
+        depth=args.depth, fanout=args.fanout, page_kb=args.page_kb,
+        emails_per_page=args.emails_per_page, slow_ratio=args.slow_ratio,
+        slow_delay=args.slow_delay, rate_limit_ratio=args.rate_limit_ratio, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Site synthétique local pour benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    site = SyntheticSite(site_config_from_args(args), host=args.host, port=args.port)
+    print(f"Site synthétique sur {site.start()} ({site.config.total_pages} pages) - Ctrl+C pour arrêter")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+        print(site.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())